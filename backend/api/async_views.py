@@ -0,0 +1,262 @@
+"""Асинхронные варианты самых нагруженных GET-эндпоинтов.
+
+Подключаются в api/urls.py при ASYNC_READ_VIEWS (ASGI-режим). Ответы
+совпадают с синхронными представлениями (это проверяет
+api/tests/test_async_views.py): аутентификация, размер страницы и
+ошибки берутся у классов DRF. Запросы на запись передаются синхронным
+представлениям.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAcceptable, NotAuthenticated,
+                                       NotFound, ParseError)
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.estimates import estimated_count
+from recipes.models import Ingredient, Recipe, Tag
+from .filters import RecipeFilter
+from .pagination import (CustomUserPagination, EstimatedCountPagination,
+                         KeysetPagination, recipes_limit)
+from .serializers import (IngredientSerializer, RecipeSerializer,
+                          SubscriptionShowSerializer, TagSerializer)
+from .sparse import defer_omitted, requested_fields
+from .views import (IngredientListView, RecipeViewSet, TagListCreateView,
+                    UserViewSet)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Рендереры DRF, кроме browsable API: формат ответа выбирается по Accept,
+# как у синхронных представлений.
+RENDERERS = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+             if renderer.format != 'api']
+negotiation = DefaultContentNegotiation()
+
+
+def respond(request, data, status=200):
+    """Ответ в формате из Accept (по умолчанию - первый рендерер)."""
+    if not isinstance(request, Request):
+        request = Request(request)
+    try:
+        renderer, media_type = negotiation.select_renderer(request, RENDERERS)
+    except NotAcceptable:
+        renderer, media_type = RENDERERS[0], RENDERERS[0].media_type
+    content = renderer.render(data, media_type, {'request': request})
+    if renderer.charset:
+        media_type = f'{media_type}; charset={renderer.charset}'
+    return HttpResponse(content, content_type=media_type, status=status)
+
+
+def read_or_sync(async_view, sync_view):
+    """GET обслуживает async_view, остальные методы - sync_view."""
+
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await async_view(request, *args, **kwargs)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    return view
+
+
+def error_response(drf_request, error):
+    """Ответ об ошибке, как его сформировал бы APIView."""
+    response = respond(drf_request, {'detail': str(error.detail)},
+                       status=error.status_code)
+    if isinstance(error, (AuthenticationFailed, NotAuthenticated)):
+        header = drf_request.authenticators[0].authenticate_header(
+            drf_request)
+        if header:
+            response['WWW-Authenticate'] = header
+        else:
+            response.status_code = 403
+    return response
+
+
+async def authenticate(request):
+    """Аутентификация DRF (сессия, токен) вне APIView.
+
+    Возвращает DRF-запрос и готовый ответ об ошибке, если она была.
+    """
+    drf_request = Request(request, authenticators=[
+        auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        request.user = await sync_to_async(lambda: drf_request.user)()
+    except APIException as error:
+        return drf_request, error_response(drf_request, error)
+    return drf_request, None
+
+
+async def paginate(request, queryset, pagination_class, estimate=False):
+    """Тот же ответ, что у pagination_class, на асинхронном ORM.
+
+    Размер страницы, ?page=last и текст ошибки берутся у самого
+    пагинатора DRF. estimate=True - как EstimatedCountPagination: оценка
+    числа строк и count_approximate в ответе. Неверная страница -
+    NotFound.
+    """
+    paginator = pagination_class()
+    page_size = paginator.get_page_size(request)
+    if estimate:
+        count, approximate = await sync_to_async(estimated_count)(queryset)
+    else:
+        count, approximate = await queryset.acount(), False
+    page_number = request.query_params.get(paginator.page_query_param, 1)
+    if page_number in paginator.last_page_strings:
+        page = math.ceil(max(count, 1) / page_size)
+    else:
+        try:
+            page = int(page_number)
+        except ValueError:
+            page = 0
+    invalid = NotFound(paginator.invalid_page_message.format(
+        page_number=page_number, message='Invalid page.'))
+    if page < 1 or (
+            not approximate and (page - 1) * page_size >= max(count, 1)):
+        raise invalid
+    offset = (page - 1) * page_size
+    # При оценке лишняя строка показывает, есть ли следующая страница.
+    limit = offset + page_size + 1 if approximate else offset + page_size
+    items = [item async for item in queryset[offset:limit]]
+    has_next = (len(items) > page_size if approximate
+                else offset + page_size < count)
+    items = items[:page_size]
+    if not items and page > 1:
+        raise invalid
+    url = request.build_absolute_uri()
+    query_param = paginator.page_query_param
+    next_url = (replace_query_param(url, query_param, page + 1)
+                if has_next else None)
+    previous_url = None
+    if page == 2:
+        previous_url = remove_query_param(url, query_param)
+    elif page > 2:
+        previous_url = replace_query_param(url, query_param, page - 1)
+    result = {'count': count}
+    if estimate:
+        result['count_approximate'] = approximate
+    result.update(next=next_url, previous=previous_url)
+    return items, result
+
+
+async def recipe_list(request):
+    drf_request, error = await authenticate(request)
+    if error:
+        return error
+    try:
+        fields = requested_fields(drf_request, RecipeSerializer.Meta.fields)
+    except ParseError as error:
+        return error_response(drf_request, error)
+    queryset = Recipe.objects.with_related(fields).with_user_flags(
+        request.user, fields)
+    # Варианты и валидация фильтра по тегам могут обратиться к БД.
+    filterset = await sync_to_async(RecipeFilter)(
+        request.GET, queryset=queryset, request=drf_request)
+    is_valid = await sync_to_async(filterset.is_valid)()
+    if not is_valid:
+        error = translate_validation(filterset.errors)
+        return respond(drf_request, error.detail, status=400)
+    queryset = await sync_to_async(lambda: filterset.qs)()
+    queryset = defer_omitted(queryset, RecipeSerializer.Meta.columns, fields)
+    if KeysetPagination.cursor_query_param in request.GET:
+        paginator = KeysetPagination()
+        try:
+            rows = paginator.get_page(queryset, request.GET)
+        except NotFound as error:
+            return respond(drf_request, {'detail': error.detail},
+                           status=404)
+        recipes = paginator.finish_page(
+            [recipe async for recipe in rows], request.build_absolute_uri())
+        data = RecipeSerializer(recipes, many=True,
+                                context={'request': drf_request}).data
+        return respond(drf_request,
+                       paginator.get_paginated_response_data(data))
+    try:
+        recipes, page = await paginate(
+            drf_request, queryset, EstimatedCountPagination, estimate=True)
+    except NotFound as error:
+        return error_response(drf_request, error)
+    data = RecipeSerializer(recipes, many=True,
+                            context={'request': drf_request}).data
+    return respond(drf_request, {**page, 'results': data})
+
+
+async def recipe_detail(request, pk):
+    drf_request, error = await authenticate(request)
+    if error:
+        return error
+    try:
+        fields = requested_fields(drf_request, RecipeSerializer.Meta.fields)
+    except ParseError as error:
+        return error_response(drf_request, error)
+    queryset = defer_omitted(
+        Recipe.objects.with_related(fields).with_user_flags(
+            request.user, fields),
+        RecipeSerializer.Meta.columns, fields)
+    try:
+        recipe = await queryset.aget(pk=pk)
+    except Recipe.DoesNotExist:
+        return respond(drf_request,
+                       {'detail': 'No Recipe matches the given query.'},
+                       status=404)
+    data = RecipeSerializer(recipe, context={'request': drf_request}).data
+    return respond(drf_request, data)
+
+
+async def ingredient_list(request):
+    queryset = Ingredient.objects.all()
+    name = request.GET.get('name')
+    if name:
+        queryset = queryset.filter(name__startswith=name)
+    data = IngredientSerializer(
+        [ingredient async for ingredient in queryset], many=True).data
+    return respond(request, data)
+
+
+async def tag_list(request):
+    data = TagSerializer([tag async for tag in Tag.objects.all()],
+                         many=True).data
+    return respond(request, data)
+
+
+async def subscriptions(request):
+    drf_request, error = await authenticate(request)
+    if error:
+        return error
+    if not request.user.is_authenticated:
+        return error_response(drf_request, NotAuthenticated())
+    try:
+        fields = requested_fields(drf_request,
+                                  SubscriptionShowSerializer.Meta.fields)
+        queryset = UserViewSet.subscriptions_queryset(
+            request.user, recipes_limit(drf_request.query_params), fields)
+        authors, page = await paginate(drf_request, queryset,
+                                       CustomUserPagination)
+    except (NotFound, ParseError) as error:
+        return error_response(drf_request, error)
+    data = SubscriptionShowSerializer(
+        authors, many=True, context={'request': drf_request}).data
+    return respond(drf_request, {**page, 'results': data})
+
+
+recipe_list_view = read_or_sync(
+    recipe_list,
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+recipe_detail_view = read_or_sync(
+    recipe_detail,
+    RecipeViewSet.as_view({'get': 'retrieve', 'put': 'update',
+                           'patch': 'partial_update',
+                           'delete': 'destroy'}))
+ingredient_list_view = read_or_sync(ingredient_list,
+                                    IngredientListView.as_view())
+tag_list_view = read_or_sync(tag_list, TagListCreateView.as_view())
+subscriptions_view = read_or_sync(
+    subscriptions,
+    UserViewSet.as_view({'get': 'subscriptions'}))
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from monitoring.metrics import cache_result
+from users.models import User
+
+
+# Не попадают в снимок пользователя в кэше.
+SECRET_FIELDS = ('password',)
+
+
+def token_cache_key(key):
+    return f'auth-token:{key}'
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Сбрасывает закэшированный токен пользователя."""
+    cache = caches[settings.AUTH_TOKEN_CACHE]
+    key = cache.get(user_cache_key(user_id))
+    if key is not None:
+        cache.delete_many([token_cache_key(key), user_cache_key(user_id)])
+
+
+def invalidate_token(key):
+    caches[settings.AUTH_TOKEN_CACHE].delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без обращения к БД на каждом запросе.
+
+    Снимок пользователя (без хэша пароля) хранится в общем кэше
+    AUTH_TOKEN_CACHE и сбрасывается сигналами из api/signals.py при выходе,
+    удалении токена и любом сохранении пользователя (смена пароля,
+    деактивация). Изменения в обход сигналов (queryset.update) снимок
+    переживает не дольше AUTH_TOKEN_CACHE_TTL. Без REDIS_URL кэш отключён.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[settings.AUTH_TOKEN_CACHE]
+        snapshot = cache.get(token_cache_key(key))
+        cache_result('auth_token', snapshot is not None)
+        if snapshot is not None:
+            db, field_names, values = snapshot
+            user = User.from_db(db, field_names, values)
+            token = self.get_model()(key=key, user=user)
+            token._state.adding = False
+            return user, token
+
+        user, token = super().authenticate_credentials(key)
+        field_names = [field.attname for field in User._meta.concrete_fields
+                       if field.attname not in SECRET_FIELDS]
+        snapshot = (
+            user._state.db,
+            field_names,
+            [getattr(user, name) for name in field_names],
+        )
+        cache.set_many({token_cache_key(key): snapshot,
+                        user_cache_key(user.pk): key})
+        return user, token
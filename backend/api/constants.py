@@ -14,4 +14,4 @@ UNIQUE_FIELDS = {
     'unique': 'Пользователь с таким ником уже существует.',
 }
 MAX_PAS = 100
-MAX_MEASURENENT_UNUT = 20
+MAX_MEASUREMENT_UNIT = 20
@@ -1,27 +1,27 @@
 import django_filters
 import django_filters as filters
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.db.models import Case, FloatField, Value, When
+from rest_framework.filters import SearchFilter
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes import tagmask
+from recipes.pantry import index as pantry_index
 
 
-class TagsMultipleChoiceField(
-        filters.fields.MultipleChoiceField):
-    def validate(self, value):
-        if self.required and not value:
-            raise ValidationError(
-                self.error_messages['required'],
-                code='required')
-        for val in value:
-            if val in self.choices and not self.valid_value(val):
-                raise ValidationError(
-                    self.error_messages['invalid_choice'],
-                    code='invalid_choice',
-                    params={'value': val},)
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
-class TagsFilter(filters.AllValuesMultipleFilter):
-    field_class = TagsMultipleChoiceField
+class UserSearchFilter(SearchFilter):
+    """Поиск пользователей по началу слова или, при USER_SEARCH='trigram',
+    по подстроке. Оба варианта покрыты индексами на Postgres
+    (users/migrations/0002_user_search_indexes.py)."""
+
+    def get_search_fields(self, view, request):
+        prefix = '' if settings.USER_SEARCH == 'trigram' else '^'
+        return [prefix + field
+                for field in super().get_search_fields(view, request)]
 
 
 class IngredientFilter(filters.FilterSet):
@@ -32,19 +32,57 @@ class IngredientFilter(filters.FilterSet):
         fields = ('name',)
 
 
+# Варианты ?ordering= для рецептов. Под каждый есть индекс с id в конце
+# (Recipe.Meta.indexes), так что и страницы, и keyset-курсоры
+# (api.pagination.KeysetPagination) читаются диапазоном по индексу.
+RECIPE_ORDERINGS = {
+    'newest': ('Сначала новые', ('-created_at', '-id')),
+    'name': ('По названию', ('name', 'id')),
+    'cooking_time': ('По времени приготовления', ('cooking_time', 'id')),
+    'popularity': ('По популярности', ('-favorites_count', '-id')),
+    'trending': ('В тренде', ('-trending_score', '-id')),
+}
+
+
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-        to_field_name='slug',
+    # Слаги проверяются по кэшу справочника, фильтр - по маске тегов.
+    tags = django_filters.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in tagmask.slug_bits()],
+        method='filter_tags',
     )
     is_in_shopping_cart = django_filters.CharFilter(
         method='filter_is_in_shopping_cart')
     is_favorited = django_filters.CharFilter(method='filter_is_favorited')
+    # «Что можно приготовить»: ингредиенты, которые есть, и аллергены.
+    have_ingredients = NumberInFilter(method='filter_have_ingredients')
+    exclude_ingredients = NumberInFilter(
+        method='filter_exclude_ingredients')
+    min_coverage = django_filters.NumberFilter(method='filter_min_coverage')
+    cooking_time_min = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte')
+    cooking_time_max = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
+    ordering = django_filters.ChoiceFilter(
+        choices=[(name, label)
+                 for name, (label, _) in RECIPE_ORDERINGS.items()],
+        method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'have_ingredients', 'exclude_ingredients', 'min_coverage',
+                  'cooking_time_min', 'cooking_time_max', 'ordering')
+
+    def __init__(self, data=None, *args, **kwargs):
+        # Варианты tags строятся по кэшу справочника: незнакомый слаг
+        # перечитывает его до проверки формы.
+        if data is not None:
+            tagmask.slug_bits(data.getlist('tags'))
+        super().__init__(data, *args, **kwargs)
+
+    def filter_tags(self, queryset, name, value):
+        aliases, condition = tagmask.has_any(value)
+        return queryset.alias(**aliases).filter(condition)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -65,3 +103,74 @@ class RecipeFilter(django_filters.FilterSet):
         if value:
             return queryset.filter(id__in=shopping_cart_recipes)
         return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        have = self.form.cleaned_data.get('have_ingredients')
+        if not have:
+            return queryset
+        return self.filter_pantry(queryset, have)
+
+    def filter_have_ingredients(self, queryset, name, value):
+        # Применяется в filter_queryset после остальных фильтров.
+        return queryset
+
+    def filter_pantry(self, queryset, have):
+        """Рецепты по убыванию доли ингредиентов, которые уже есть.
+
+        PANTRY_MAX_RESULTS ограничивает рецепты, прошедшие остальные
+        фильтры: совпадения из индекса проверяются по БД пачками в
+        порядке покрытия, пока не наберётся нужное число.
+        """
+        matches = pantry_index.search(
+            [int(ingredient_id) for ingredient_id in have],
+            exclude=[int(ingredient_id) for ingredient_id in
+                     self.form.cleaned_data.get('exclude_ingredients') or []],
+            min_coverage=float(
+                self.form.cleaned_data.get('min_coverage') or 0),
+        )
+        limit = settings.PANTRY_MAX_RESULTS
+        selected = []
+        for start in range(0, len(matches), limit):
+            chunk = matches[start:start + limit]
+            passed = set(queryset.order_by().filter(
+                id__in=[recipe_id for recipe_id, _ in chunk]
+            ).values_list('id', flat=True))
+            selected.extend(
+                match for match in chunk if match[0] in passed)
+            if len(selected) >= limit:
+                break
+        if not selected:
+            return queryset.none()
+        # По одному WHEN на значение покрытия, а не на рецепт: различных
+        # долей немного, и размер запроса не растёт с числом совпадений.
+        by_score = {}
+        for recipe_id, score in selected[:limit]:
+            by_score.setdefault(score, []).append(recipe_id)
+        coverage = Case(
+            *[When(id__in=recipe_ids, then=Value(score))
+              for score, recipe_ids in by_score.items()],
+            output_field=FloatField(),
+        )
+        queryset = queryset.filter(
+            id__in=[recipe_id for recipe_id, _ in selected[:limit]]
+        ).annotate(coverage=coverage)
+        if self.form.cleaned_data.get('ordering'):
+            return queryset
+        return queryset.order_by('-coverage', 'id')
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if self.form.cleaned_data.get('have_ingredients'):
+            # Уже учтено в поиске по индексу.
+            return queryset
+        return queryset.exclude(
+            recipeingredient__ingredient_id__in=[
+                int(ingredient_id) for ingredient_id in value])
+
+    def filter_min_coverage(self, queryset, name, value):
+        # Используется вместе с have_ingredients.
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        _, ordering = RECIPE_ORDERINGS[value]
+        return queryset.order_by(*ordering)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory
+
+from api import async_views
+from api.views import IngredientListView, RecipeViewSet, TagListCreateView
+
+ENDPOINTS = {
+    'recipes': ('/api/recipes/',
+                RecipeViewSet.as_view({'get': 'list'}),
+                async_views.recipe_list),
+    'ingredients': ('/api/ingredients/',
+                    IngredientListView.as_view(),
+                    async_views.ingredient_list),
+    'tags': ('/api/tags/',
+             TagListCreateView.as_view(),
+             async_views.tag_list),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность синхронных и асинхронных '
+            'GET-эндпоинтов при медленных запросах к БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoint', choices=ENDPOINTS)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Количество одновременных запросов')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Число синхронных воркеров')
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help='Искусственная задержка каждого SQL, с')
+
+    def slow_down(self, delay):
+        def wrapper(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def on_connect(sender, connection, **kwargs):
+            connection.execute_wrappers.append(wrapper)
+
+        connection_created.connect(on_connect, weak=False)
+        connection.close()
+
+    def run_sync(self, path, view, requests, workers):
+        def call(_):
+            request = RequestFactory().get(path)
+            request.user = AnonymousUser()
+            response = view(request)
+            response.render()
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            statuses = list(executor.map(call, range(requests)))
+        return time.perf_counter() - started, statuses
+
+    def run_async(self, path, view, requests):
+        async def call():
+            # Как ASGIHandler: у каждого запроса свой поток для ORM.
+            async with ThreadSensitiveContext():
+                request = AsyncRequestFactory().get(path)
+                response = await view(request)
+                return response.status_code
+
+        async def main():
+            return await asyncio.gather(*(call() for _ in range(requests)))
+
+        started = time.perf_counter()
+        statuses = asyncio.run(main())
+        return time.perf_counter() - started, statuses
+
+    def handle(self, *args, **options):
+        path, sync_view, async_view = ENDPOINTS[options['endpoint']]
+        requests = options['requests']
+        self.slow_down(options['delay'])
+
+        sync_time, sync_statuses = self.run_sync(
+            path, sync_view, requests, options['workers'])
+        async_time, async_statuses = self.run_async(
+            path, async_view, requests)
+
+        self.stdout.write(
+            f'sync ({options["workers"]} воркеров): '
+            f'{requests / sync_time:.1f} запросов/с, '
+            f'статусы {sorted(set(sync_statuses))}')
+        self.stdout.write(
+            f'async: {requests / async_time:.1f} запросов/с, '
+            f'статусы {sorted(set(async_statuses))}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {sync_time / async_time:.2f}x'))
@@ -0,0 +1,89 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: холодный старт воркера, при
+# необходимости прогрев, затем по два запроса на каждый путь.
+BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from foodgram.wsgi import application
+loaded = time.perf_counter()
+if sys.argv[1] == 'warm':
+    from foodgram.warmup import warm
+    warm()
+ready = time.perf_counter()
+from django.http.request import validate_host
+from django.conf import settings
+from django.test import RequestFactory
+host = next((host for host in ('localhost', '127.0.0.1')
+             if validate_host(host, settings.ALLOWED_HOSTS)), 'localhost')
+requests = {}
+for path in sys.argv[2:]:
+    timings = []
+    for _ in range(2):
+        environ = RequestFactory(HTTP_HOST=host).get(path).environ
+        status = []
+        request_started = time.perf_counter()
+        response = application(environ, lambda code, headers: status.append(
+            int(code.split()[0])))
+        b''.join(response)
+        response.close()
+        timings.append(((time.perf_counter() - request_started) * 1000,
+                        status[0]))
+    requests[path] = timings
+print(json.dumps({'load': (loaded - started) * 1000,
+                  'warmup': (ready - loaded) * 1000,
+                  'requests': requests}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает старт воркера без прогрева и с прогревом '
+            '(foodgram/warmup.py): загрузка, прогрев, первый и второй '
+            'запрос')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            default=['/api/recipes/', '/api/tags/',
+                                     '/api/ingredients/?name=а'])
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Запусков процесса на каждый режим')
+
+    def boot(self, mode, paths):
+        result = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT, mode, *paths],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        first_requests = {}
+        for mode, label in (('cold', 'Без прогрева'), ('warm', 'С прогревом')):
+            runs = [self.boot(mode, paths) for _ in range(options['runs'])]
+            load = statistics.median(run['load'] for run in runs)
+            warmup = statistics.median(run['warmup'] for run in runs)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{label}: загрузка {load:.1f} мс, прогрев {warmup:.1f} мс'))
+            for path in paths:
+                first, second = (
+                    statistics.median(run['requests'][path][number][0]
+                                      for run in runs)
+                    for number in (0, 1))
+                statuses = {status for run in runs
+                            for _, status in run['requests'][path]}
+                self.stdout.write(
+                    f'  {path}: первый запрос {first:.1f} мс, '
+                    f'второй {second:.1f} мс, статусы {sorted(statuses)}')
+            first_requests[mode] = statistics.median(
+                run['requests'][paths[0]][0][0] for run in runs)
+        # При WARM_START прогрев выполняется один раз в мастере до fork.
+        self.stdout.write(self.style.SUCCESS(
+            f'Первый запрос воркера: {first_requests["cold"]:.1f} мс -> '
+            f'{first_requests["warm"]:.1f} мс'))
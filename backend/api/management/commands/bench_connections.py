@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость запроса с новым соединением и с '
+            'переиспользуемым (persistent/pool)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество имитируемых запросов')
+        parser.add_argument('--database', default='default',
+                            help='Алиас базы данных')
+
+    def run(self, connection, requests, reconnect):
+        connection.close()
+        started = time.perf_counter()
+        for _ in range(requests):
+            if reconnect:
+                # Так ведёт себя Django без CONN_MAX_AGE в конце запроса.
+                # При включённом пуле соединение возвращается в пул.
+                connection.close()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        return (time.perf_counter() - started) * 1000 / requests
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        requests = options['requests']
+        pooled = bool(connection.settings_dict['OPTIONS'].get('pool'))
+
+        reconnect_ms = self.run(connection, requests, reconnect=True)
+        reuse_ms = self.run(connection, requests, reconnect=False)
+
+        label = 'из пула' if pooled else 'новое соединение'
+        self.stdout.write(
+            f'{connection.vendor}: {label} на запрос - '
+            f'{reconnect_ms:.3f} мс/запрос')
+        self.stdout.write(
+            f'{connection.vendor}: постоянное соединение - '
+            f'{reuse_ms:.3f} мс/запрос')
+        self.stdout.write(self.style.SUCCESS(
+            f'Накладные расходы на соединение: '
+            f'{reconnect_ms - reuse_ms:.3f} мс/запрос'))
@@ -0,0 +1,76 @@
+import json
+import time
+from io import BytesIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import MessagePackParser, ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.views import IngredientListView, RecipeViewSet
+
+RENDERERS = {
+    'json (DRF)': JSONRenderer(),
+    'json (orjson)': ORJSONRenderer(),
+    'msgpack': MessagePackRenderer(),
+}
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что ORJSONRenderer и MessagePackRenderer отдают те '
+            'же данные, что JSONRenderer, и сравнивает скорость рендеринга '
+            'списка рецептов и ингредиентов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100,
+                            help='Рецептов на странице списка')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Повторов рендеринга')
+
+    def endpoints(self, limit):
+        factory = APIRequestFactory()
+        views = {
+            'recipes': (RecipeViewSet.as_view({'get': 'list'}),
+                        f'/api/recipes/?limit={limit}'),
+            'ingredients': (IngredientListView.as_view(),
+                            '/api/ingredients/'),
+        }
+        for name, (view, path) in views.items():
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            yield name, view(request).data
+
+    def check_parity(self, name, data):
+        reference = JSONRenderer().render(data)
+        expected = json.loads(reference)
+        if ORJSONRenderer().render(data) != reference:
+            raise CommandError(f'{name}: ORJSONRenderer отличается от '
+                               'JSONRenderer')
+        packed = MessagePackRenderer().render(data)
+        checks = [
+            ('MessagePackRenderer', MessagePackParser().parse(
+                BytesIO(packed))),
+            ('ORJSONParser', ORJSONParser().parse(BytesIO(reference))),
+        ]
+        for label, parsed in checks:
+            if parsed != expected:
+                raise CommandError(f'{name}: {label} отличается от JSON')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for name, data in self.endpoints(options['limit']):
+            self.check_parity(name, data)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: данные совпадают'))
+            baseline = None
+            for label, renderer in RENDERERS.items():
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    content = renderer.render(data)
+                elapsed = (time.perf_counter() - started) * 1000 / repeat
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f'  {label:14} {elapsed:8.3f} мс  '
+                    f'x{baseline / elapsed:5.1f}  {len(content)} байт')
@@ -0,0 +1,87 @@
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Импорты при старте воркера: приложение и URLconf (его загружает первый
+# запрос).
+BOOT_SCRIPT = ('import foodgram.wsgi; '
+               'from django.urls import get_resolver; '
+               'get_resolver().url_patterns')
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse(report):
+    """[(модуль, собственное мкс, суммарное мкс, цепочка импорта)].
+
+    python -X importtime печатает модуль после всех его зависимостей,
+    поэтому импортировавший модуль - ближайшая следующая строка с
+    меньшим отступом.
+    """
+    rows = [(match[4], int(match[1]), int(match[2]), len(match[3]))
+            for match in map(LINE.match, report.splitlines()) if match]
+    modules = []
+    for number, (name, own, total, depth) in enumerate(rows):
+        chain = [name]
+        for parent, _, _, parent_depth in rows[number + 1:]:
+            if parent_depth < depth:
+                chain.append(parent)
+                depth = parent_depth
+        modules.append((name, own, total, chain))
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Отчёт python -X importtime о старте приложения: самые '
+            'дорогие модули и пакеты, проверка BOOT_LAZY_MODULES')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15)
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        modules = parse(result.stderr)
+        top = options['top']
+
+        packages = defaultdict(int)
+        for name, own, _, _ in modules:
+            packages[name.split('.')[0]] += own
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Всего: {sum(packages.values()) / 1000:.1f} мс, '
+            f'модулей: {len(modules)}. Пакеты (собственное время):'))
+        packages = sorted(packages.items(), key=lambda item: -item[1])
+        for package, own in packages[:top]:
+            self.stdout.write(f'  {own / 1000:8.1f} мс  {package}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Модули проекта (с зависимостями):'))
+        local = [module for module in modules
+                 if module[0].split('.')[0] in self.project_packages()]
+        local.sort(key=lambda module: -module[2])
+        for name, _, total, _ in local[:top]:
+            self.stdout.write(f'  {total / 1000:8.1f} мс  {name}')
+
+        eager = [module for module in modules
+                 if module[0] in settings.BOOT_LAZY_MODULES]
+        for name, _, total, chain in eager:
+            self.stderr.write(self.style.ERROR(
+                f'{name} ({total / 1000:.1f} мс) импортируется при старте: '
+                + ' <- '.join(chain)))
+        if eager:
+            raise CommandError('Модули из BOOT_LAZY_MODULES загружаются '
+                               'при старте, импортируйте их лениво.')
+        self.stdout.write(self.style.SUCCESS(
+            'Модули из BOOT_LAZY_MODULES при старте не загружаются.'))
+
+    @staticmethod
+    def project_packages():
+        return {path.name for path in settings.BASE_DIR.iterdir()
+                if (path / '__init__.py').exists()}
@@ -1,13 +1,184 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.estimates import EstimatedCountPaginator
 from .constants import MAX_PER_PAGE, PER_PAGE
 
 
+def recipes_limit(params):
+    """?recipes_limit= подписок: None или неотрицательное целое."""
+    value = params.get('recipes_limit')
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise ParseError(
+            'recipes_limit должен быть неотрицательным целым числом.')
+    return limit
+
+
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
 
 
+class EstimatedCountPagination(LimitPageNumberPagination):
+    """LimitPageNumberPagination без COUNT(*) по большим наборам.
+
+    count_approximate в ответе - true, если count - оценка планировщика
+    (см. foodgram/estimates.py); next при этом всё равно точный.
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_approximate': self.page.paginator.approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_approximate'] = {
+            'type': 'boolean', 'example': False}
+        return response_schema
+
+
 class CustomUserPagination(PageNumberPagination):
     page_size = PER_PAGE
     page_size_query_param = 'limit'
     max_page_size = MAX_PER_PAGE
+
+
+class KeysetPagination(BasePagination):
+    """Keyset-пагинация по текущей сортировке набора.
+
+    Курсор - значения полей сортировки последней строки страницы;
+    следующая страница начинается строго после них, поэтому глубина
+    страницы не влияет на стоимость запроса. Первая страница - ?cursor=.
+    Ответ: {'next': ..., 'results': [...]}, как у ленты подписок.
+    """
+
+    page_size = LimitPageNumberPagination.page_size
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PER_PAGE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, params):
+        try:
+            page_size = int(params.get(self.page_size_query_param,
+                                       self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def get_ordering(queryset):
+        """Поля сортировки набора с id в конце для однозначности."""
+        ordering = list(queryset.query.order_by
+                        or queryset.model._meta.ordering)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
+
+    @staticmethod
+    def ordering_field(queryset, name):
+        """Поле модели или аннотации, по которому идёт сортировка."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, cursor, queryset, ordering):
+        """Значения курсора, приведённые к типам полей сортировки.
+
+        Подделанный курсор или курсор от другой ?ordering= - 404, как и
+        курсор, который не удалось раскодировать.
+        """
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            result = []
+            for field, value in zip(ordering, values):
+                value = self.ordering_field(
+                    queryset, field.lstrip('-')).to_python(value)
+                # Сравнение с NULL в фильтре невозможно.
+                if value is None:
+                    raise ValueError
+                result.append(value)
+            return result
+        except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_cursor(item, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(item, field.lstrip('-'))
+            values.append(value.isoformat()
+                          if hasattr(value, 'isoformat') else value)
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def after(ordering, values):
+        """Условие «строго после values» в порядке ordering."""
+        conditions = []
+        for position, field in enumerate(ordering):
+            lookups = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:position], values)
+            }
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            lookups[f'{field.lstrip("-")}__{lookup}'] = values[position]
+            conditions.append(Q(**lookups))
+        return reduce(lambda left, right: left | right, conditions)
+
+    def get_page(self, queryset, params):
+        """Набор строк страницы (на одну больше - признак продолжения)."""
+        ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*ordering)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(
+                self.after(ordering,
+                           self.decode_cursor(cursor, queryset, ordering)))
+        self.ordering = ordering
+        self.limit = self.get_page_size(params)
+        return queryset[:self.limit + 1]
+
+    def finish_page(self, items, url):
+        """Страница и ссылка на следующую по строкам из get_page."""
+        items = list(items)
+        self.next = None
+        if len(items) > self.limit:
+            items = items[:self.limit]
+            self.next = replace_query_param(
+                url, self.cursor_query_param,
+                self.encode_cursor(items[-1], self.ordering))
+        return items
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(
+            self.get_page(queryset, request.query_params),
+            request.build_absolute_uri())
+
+    def get_paginated_response_data(self, data):
+        return {'next': self.next, 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_response_data(data))
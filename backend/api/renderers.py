@@ -0,0 +1,61 @@
+import re
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# JSONRenderer экранирует U+2028/U+2029, чтобы ответ можно было встроить
+# в JavaScript; orjson оставляет их как есть.
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'),
+                   (b'\xe2\x80\xa9', b'\\u2029'))
+# Числа, которые orjson пишет иначе, чем repr(float): 1e16 вместо 1e+16,
+# 0.00001 вместо 1e-05. Такой ответ рендерит JSONRenderer; редкое
+# совпадение внутри строки только замедляет ответ, но не меняет его.
+FLOAT_MISMATCH = re.compile(rb'[:,\[]-?(?:\d+(?:\.\d+)?e|0\.0000)')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson: тот же компактный вывод, в разы быстрее.
+
+    Типы, которых orjson не знает (Decimal, ленивые строки, даты -
+    для совпадения формата), передаются кодировщику DRF. С параметром
+    indent в Accept и для чисел, которые orjson записал бы иначе,
+    работает обычный JSONRenderer.
+    """
+
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type,
+                           renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        content = orjson.dumps(data, default=self.encoder_class().default,
+                               option=self.options)
+        if FLOAT_MISMATCH.search(content):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in content:
+                content = content.replace(raw, escaped)
+        return content
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack (Accept: application/msgpack или ?format=msgpack).
+
+    Значения те же, что в JSON: типы вне JSON приводятся кодировщиком DRF.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder_class().default)
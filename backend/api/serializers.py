@@ -1,21 +1,29 @@
+import time
 import uuid
 from base64 import b64decode
 
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from rest_framework.validators import UniqueTogetherValidator
 from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework.serializers import (
     CharField,
     ImageField,
     ModelSerializer,
-    ReadOnlyField,
     SerializerMethodField,
     ValidationError
 )
+from jobs.models import Job
+from monitoring.metrics import IMAGE_PROCESSING, IMAGE_SIZE
+from recipes import catalogue, tagmask
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.signals import recipe_ingredients_changed
+from .pagination import recipes_limit
+from .sparse import SparseFieldsMixin
 from users.models import Subscription, User
 
 
@@ -34,12 +42,17 @@ class UserRecipesSerializer(ModelSerializer):
 
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
+        started = time.perf_counter()
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             unique_filename = f'{uuid.uuid4()}.{ext}'
             data = ContentFile(b64decode(imgstr), name=unique_filename)
-        return super().to_internal_value(data)
+        value = super().to_internal_value(data)
+        IMAGE_PROCESSING.labels(self.field_name).observe(
+            time.perf_counter() - started)
+        IMAGE_SIZE.labels(self.field_name).observe(value.size)
+        return value
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -71,7 +84,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserRecipesSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(many=True,
@@ -85,14 +98,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'author', 'tags', 'ingredients', 'image', 'name',
             'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
         ]
+        # Колонки, которые не загружаются без своего поля (api/sparse.py).
+        columns = {'image': 'image', 'name': 'name', 'text': 'text',
+                   'cooking_time': 'cooking_time'}
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return obj.is_favorited.filter(user=user).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return obj.is_in_shopping_cart.filter(user=user).exists()
@@ -111,9 +131,15 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
+    """Создание и изменение рецепта.
+
+    Теги и ингредиенты проверяются по кэшу справочников
+    (recipes/catalogue.py), а ответ строится из уже проверенных объектов:
+    запись рецепта не перечитывает его из БД.
+    """
+
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all())
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(required=True)
     cooking_time = serializers.IntegerField(
         validators=[
@@ -139,15 +165,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'Ingredients field cannot be empty.')
 
         ingredient_ids = [ingredient['id'] for ingredient in value]
-        if not Ingredient.objects.filter(
-                id__in=ingredient_ids).count() == len(ingredient_ids):
-            raise serializers.ValidationError(
-                'One or more ingredients do not exist.')
-
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ingredients field contains duplicate ingredients.')
 
+        known = catalogue.ingredients.resolve(ingredient_ids)
+        if len(known) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'One or more ingredients do not exist.')
+
+        for ingredient in value:
+            ingredient['ingredient'] = known[ingredient['id']]
         return value
 
     def validate_tags(self, value):
@@ -156,47 +184,137 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if len(value) != len(set(value)):
             raise serializers.ValidationError(
                 'Tags field contains duplicate tags.')
-        return value
+        known = catalogue.tags.resolve(value)
+        for tag_id in value:
+            if tag_id not in known:
+                raise serializers.ValidationError(
+                    serializers.PrimaryKeyRelatedField.default_error_messages[
+                        'does_not_exist'].format(pk_value=tag_id))
+        return [known[tag_id] for tag_id in value]
 
     def validate_image(self, value):
         if not value:
             raise serializers.ValidationError('Image field cannot be empty.')
         return value
 
+    def validate(self, data):
+        # Теги и ингредиенты обязательны и в PATCH (docs/openapi-schema.yml).
+        missing = {field: self.fields[field].error_messages['required']
+                   for field in ('ingredients', 'tags') if field not in data}
+        if missing:
+            raise serializers.ValidationError(missing)
+        return data
+
     def update_ingredients(self, ingredients, recipe):
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        self.create_ingredients(ingredients, recipe)
+        """Применяет к рецепту только разницу в ингредиентах.
+
+        Возвращает итоговые строки RecipeIngredient и множества
+        добавленных, удалённых и изменённых id ингредиентов.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in recipe.recipeingredient_set.all()
+        }
+        incoming = {item['id']: item for item in ingredients}
+        added = incoming.keys() - existing.keys()
+        removed = existing.keys() - incoming.keys()
+        changed = []
+        for ingredient_id in existing.keys() & incoming.keys():
+            amount = incoming[ingredient_id].get('amount')
+            if existing[ingredient_id].amount != amount:
+                existing[ingredient_id].amount = amount
+                changed.append(existing[ingredient_id])
+
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        created = self.create_ingredients(
+            [incoming[ingredient_id] for ingredient_id in added], recipe)
+        rows = created + [item for ingredient_id, item in existing.items()
+                          if ingredient_id not in removed]
+        for item in rows:
+            item.ingredient = incoming[item.ingredient_id]['ingredient']
+        return (rows, added, removed,
+                {item.ingredient_id for item in changed})
 
     def create_ingredients(self, ingredients, recipe):
         recipe_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient_data.get("id"),
+                ingredient=ingredient_data['ingredient'],
                 amount=ingredient_data.get("amount")
             ) for ingredient_data in ingredients
         ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
-
+        return RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+    def save(self, **kwargs):
+        # Копия справочника в процессе могла пережить удаление тега или
+        # ингредиента: внешний ключ на него отклоняется при записи (или при
+        # фиксации транзакции) - это ошибка данных запроса, а не сервера.
+        try:
+            return super().save(**kwargs)
+        except IntegrityError:
+            catalogue.invalidate()
+            raise serializers.ValidationError(
+                'One or more tags or ingredients do not exist.')
+
+    @staticmethod
+    def cache_relations(recipe, tags=None, recipe_ingredients=None):
+        """Кладёт связи рецепта в кэш prefetch_related."""
+        if not hasattr(recipe, '_prefetched_objects_cache'):
+            recipe._prefetched_objects_cache = {}
+        relations = (
+            ('tags', tags),
+            ('recipeingredient_set', sorted(
+                recipe_ingredients or [], key=lambda item: -item.id)
+             if recipe_ingredients is not None else None),
+        )
+        for name, objects in relations:
+            if objects is None:
+                continue
+            queryset = getattr(recipe, name).all()
+            queryset._result_cache = list(objects)
+            queryset._prefetch_done = True
+            recipe._prefetched_objects_cache[name] = queryset
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients(ingredients, recipe)
+        recipe = Recipe.objects.create(**validated_data,
+                                       tags_mask=tagmask.mask(tags))
+        # bulk_create не отправляет m2m_changed: маска тегов уже записана,
+        # а похожие рецепты пересчитываются по recipe_ingredients_changed.
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        ])
+        recipe_ingredients = self.create_ingredients(ingredients, recipe)
+        recipe_ingredients_changed.send(
+            sender=Recipe, recipe=recipe,
+            added={item['id'] for item in ingredients},
+            removed=set(), changed=set())
+        self.cache_relations(recipe, tags, recipe_ingredients)
+        # Новый рецепт ещё никто не добавлял в избранное и покупки.
+        recipe.favorited = recipe.in_shopping_cart = False
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time)
-        instance.image = validated_data.get('image', instance.image)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         instance.save()
         instance.tags.set(tags)
-        self.update_ingredients(ingredients, instance)
-
+        recipe_ingredients, added, removed, changed = (
+            self.update_ingredients(ingredients, instance))
+        if added or removed or changed:
+            recipe_ingredients_changed.send(
+                sender=Recipe, recipe=instance,
+                added=added, removed=removed, changed=changed)
+        self.cache_relations(instance, tags, recipe_ingredients)
         return instance
 
     def to_representation(self, instance):
@@ -291,7 +409,7 @@ class UserCreateSerializer(UserCreateSerializer):
         return serializer.data
 
 
-class UserSerializer(UserSerializer):
+class UserSerializer(SparseFieldsMixin, UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
     avatar = Base64ImageField(read_only=True)
 
@@ -306,10 +424,16 @@ class UserSerializer(UserSerializer):
             'is_subscribed',
             'avatar',
         )
+        columns = {'email': 'email', 'username': 'username',
+                   'first_name': 'first_name', 'last_name': 'last_name',
+                   'avatar': 'avatar'}
 
     def get_is_subscribed(self, object):
+        if hasattr(object, 'subscribed'):
+            return object.subscribed
         request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
+        if (request is None or request.user.is_anonymous
+                or request.user.pk == object.pk):
             return False
         return object.following.filter(follower=request.user).exists()
 
@@ -337,7 +461,7 @@ class SubscriptionRecipeShortSerializer(ModelSerializer):
 class SubscriptionShowSerializer(UserSerializer):
 
     recipes = SerializerMethodField()
-    recipes_count = ReadOnlyField(source='recipes.count')
+    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -354,15 +478,21 @@ class SubscriptionShowSerializer(UserSerializer):
         )
 
     def get_recipes(self, object):
-        recipes_limit = self.context['request'].query_params.get(
-            'recipes_limit', None)
-        author_recipes = object.recipes.all()
-        if recipes_limit is not None:
-            author_recipes = object.recipes.all()[:int(recipes_limit)]
+        author_recipes = getattr(object, 'prefetched_recipes', None)
+        if author_recipes is None:
+            limit = recipes_limit(self.context['request'].query_params)
+            author_recipes = object.recipes.all()
+            if limit is not None:
+                author_recipes = author_recipes[:limit]
         return SubscriptionRecipeShortSerializer(
             author_recipes, many=True
         ).data
 
+    def get_recipes_count(self, object):
+        if hasattr(object, 'recipes_total'):
+            return object.recipes_total
+        return object.recipes.count()
+
 
 class SubscriptionSerializer(ModelSerializer):
 
@@ -388,3 +518,23 @@ class SubscriptionSerializer(ModelSerializer):
     def to_representation(self, instance):
         return SubscriptionShowSerializer(instance.author,
                                           context=self.context).data
+
+
+class JobSerializer(ModelSerializer):
+    """Состояние фоновой задачи; url - адрес для опроса, download -
+    адрес готового файла, если задача его выгрузила."""
+
+    url = serializers.HyperlinkedIdentityField(view_name='job-detail')
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'result',
+                  'created_at', 'finished_at', 'url', 'download')
+
+    def get_download(self, job):
+        if (job.status != Job.DONE or not isinstance(job.result, dict)
+                or 'file' not in job.result):
+            return None
+        return reverse('job-download', kwargs={'pk': job.pk},
+                       request=self.context.get('request'))
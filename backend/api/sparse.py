@@ -0,0 +1,68 @@
+"""Выборочные поля ответа: ?fields=id,name и ?omit=text.
+
+Поля убираются из сериализатора, а представления по тем же параметрам
+не загружают связи, аннотации и колонки, которые в ответ не попадут.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def split(value):
+    return {name.strip() for name in (value or '').split(',')
+            if name.strip()}
+
+
+def requested_fields(request, available):
+    """Поля ответа из available по ?fields= и ?omit=; None - все поля.
+
+    Параметры действуют только на чтение: ответ на запись строится уже
+    после сохранения, и ошибка в ?fields= не должна выдавать
+    зафиксированную запись за неудачную.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields = split(params.get(FIELDS_PARAM))
+    omit = split(params.get(OMIT_PARAM))
+    if not fields and not omit:
+        return None
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        raise ParseError('Неизвестные поля: ' + ', '.join(sorted(unknown)))
+    return (fields or set(available)) - omit
+
+
+def defer_omitted(queryset, columns, fields):
+    """Откладывает загрузку колонок columns ({поле ответа: колонка}),
+    которых нет в fields.
+
+    Колонки сортировки загружаются всегда: по ним строится курсор
+    keyset-пагинации. Вызывать после фильтров, когда сортировка известна.
+    """
+    if fields is None:
+        return queryset
+    ordering = {field.lstrip('-') for field in
+                queryset.query.order_by or queryset.model._meta.ordering}
+    deferred = [column for field, column in columns.items()
+                if field not in fields and column not in ordering]
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля из ?fields= без ?omit=.
+
+    Сериализаторы с данными для записи не урезаются: иначе поля
+    пропали бы из validated_data. Ответы на запись тоже не урезаются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'data' in kwargs:
+            return
+        fields = requested_fields(self.context.get('request'), self.fields)
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
@@ -0,0 +1,91 @@
+"""Server-sent events: новые и изменённые рецепты авторов из подписок.
+
+GET /api/recipes/feed/stream/ подключается только под ASGI. Клиент держит
+соединение открытым и получает события recipe_created и recipe_updated,
+а также subscribed/unsubscribed при изменении подписок. Событие resync
+значит, что часть событий потеряна и ленту стоит перечитать через
+/api/recipes/feed/. Раз в EVENTS_HEARTBEAT секунд приходит пинг, чтобы
+прокси не закрывали простаивающее соединение.
+"""
+import orjson
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotAuthenticated
+
+from foodgram import events
+from recipes.feed import author_topic, follower_topic
+from users.models import Subscription
+from .async_views import authenticate, error_response, respond
+
+# Через сколько клиенту переподключаться после обрыва, мс.
+RETRY_MS = 5000
+
+
+def encode(name, data):
+    return (b'event: ' + name.encode() + b'\ndata: ' + orjson.dumps(data)
+            + b'\n\n')
+
+
+class FeedStream:
+    """Тело ответа: асинхронный итератор по событиям подписчика.
+
+    close() Django вызывает по окончании ответа, в том числе после
+    обрыва соединения клиентом.
+    """
+
+    def __init__(self, user_id, author_ids):
+        self.subscriber = events.subscribe(
+            [follower_topic(user_id), *map(author_topic, author_ids)])
+        self.started = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.started:
+            self.started = True
+            return f'retry: {RETRY_MS}\n\n'.encode()
+        event = await self.subscriber.get(settings.EVENTS_HEARTBEAT)
+        if event is None:
+            return b': ping\n\n'
+        if event is events.RESYNC:
+            return encode('resync', {})
+        if event['type'] == 'subscribed':
+            events.hub.add_topics(self.subscriber,
+                                  [author_topic(event['author'])])
+        elif event['type'] == 'unsubscribed':
+            events.hub.remove_topics(self.subscriber,
+                                     [author_topic(event['author'])])
+        return encode(event['type'], event)
+
+    def close(self):
+        events.unsubscribe(self.subscriber)
+
+
+@require_GET
+async def feed_stream(request):
+    drf_request, error = await authenticate(request)
+    if error:
+        return error
+    if not request.user.is_authenticated:
+        return error_response(drf_request, NotAuthenticated())
+    author_ids = [
+        author_id async for author_id in
+        Subscription.objects.filter(follower=request.user)
+        .values_list('following_id', flat=True)]
+    # Между проверкой и подпиской нет await: лимит не превышается.
+    if len(events.hub.subscribers) >= settings.EVENTS_MAX_STREAMS:
+        response = respond(
+            drf_request,
+            {'detail': 'Слишком много открытых потоков, повторите позже.'},
+            status=503)
+        response['Retry-After'] = RETRY_MS // 1000
+        return response
+    response = StreamingHttpResponse(
+        FeedStream(request.user.pk, author_ids),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Иначе nginx буферизует ответ и события приходят пачками.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,93 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase
+
+from api import async_views
+from api.views import RecipeViewSet, UserViewSet
+from users.models import Subscription
+from .utils import (auth_header, make_ingredient, make_recipe, make_tag,
+                    make_user)
+
+RECIPE_LIST = RecipeViewSet.as_view({'get': 'list'})
+RECIPE_DETAIL = RecipeViewSet.as_view({'get': 'retrieve'})
+SUBSCRIPTIONS = UserViewSet.as_view({'get': 'subscriptions'},
+                                    **UserViewSet.subscriptions.kwargs)
+
+
+class AsyncParityTests(TestCase):
+    """Асинхронные GET отвечают так же, как синхронные представления."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = make_user('reader')
+        tag = make_tag('soup')
+        salt = make_ingredient('Соль')
+        for number in range(3):
+            author = make_user(f'author{number}')
+            Subscription.objects.create(follower=cls.reader,
+                                        following=author)
+            for position in range(number + 2):
+                make_recipe(author, f'Рецепт {number}-{position}',
+                            tags=[tag] if position % 2 else [],
+                            ingredients=[(salt, position + 1)],
+                            cooking_time=position + 1)
+
+    def assertSameResponse(self, sync_view, async_view, query='',
+                           path='/api/recipes/', kwargs=None, **headers):
+        factory = RequestFactory()
+        url = f'{path}?{query}' if query else path
+        expected = sync_view(factory.get(url, **headers), **kwargs or {})
+        expected.render()
+        actual = async_to_sync(async_view)(factory.get(url, **headers),
+                                           **kwargs or {})
+        self.assertEqual(actual.status_code, expected.status_code, query)
+        self.assertEqual(json.loads(actual.content),
+                         json.loads(expected.content), query)
+        return actual
+
+    def test_recipe_list(self):
+        for query in ('', 'page=2', 'page=last', 'limit=4&page=last',
+                      'page=99', 'page=abc', 'limit=0', 'limit=abc',
+                      'tags=soup', 'tags=bogus', 'cooking_time_max=2',
+                      'ordering=name&limit=3', 'fields=id,name',
+                      'fields=bogus', 'cursor=&limit=2', 'cursor=broken'):
+            self.assertSameResponse(RECIPE_LIST, async_views.recipe_list,
+                                    query)
+
+    def test_recipe_list_as_user(self):
+        self.assertSameResponse(RECIPE_LIST, async_views.recipe_list,
+                                'is_favorited=1', **auth_header(self.reader))
+
+    def test_bad_token(self):
+        response = self.assertSameResponse(
+            RECIPE_LIST, async_views.recipe_list,
+            HTTP_AUTHORIZATION='Token bogus')
+        self.assertEqual(response.status_code, 401)
+
+    def test_recipe_detail(self):
+        recipe_id = make_recipe(self.reader).pk
+        for pk in (recipe_id, recipe_id + 1000):
+            self.assertSameResponse(
+                RECIPE_DETAIL, async_views.recipe_detail,
+                path=f'/api/recipes/{pk}/', kwargs={'pk': pk})
+
+    def test_subscriptions(self):
+        headers = auth_header(self.reader)
+        for query in ('', 'limit=2', 'limit=2&page=last', 'page=5',
+                      'recipes_limit=1', 'recipes_limit=0',
+                      'recipes_limit=abc', 'recipes_limit=-1',
+                      'fields=username,recipes_count'):
+            self.assertSameResponse(
+                SUBSCRIPTIONS, async_views.subscriptions, query,
+                path='/api/users/subscriptions/', **headers)
+
+    def test_subscriptions_anonymous(self):
+        self.assertSameResponse(SUBSCRIPTIONS, async_views.subscriptions,
+                                path='/api/users/subscriptions/')
+
+    def test_bad_recipes_limit_is_400(self):
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 'abc'},
+                                   **auth_header(self.reader))
+        self.assertEqual(response.status_code, 400)
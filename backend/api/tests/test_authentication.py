@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+from users.models import User
+
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tests',
+        'KEY_PREFIX': 'auth',
+    },
+}
+
+
+@override_settings(CACHES=SHARED_CACHE)
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com', username='cook', first_name='C',
+            last_name='K', password='secret-pass-1')
+
+    def setUp(self):
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.auth.authenticate_credentials(self.token.key)
+
+    def test_hit_skips_database(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, 'cook@example.com')
+        self.assertEqual(token.key, self.token.key)
+
+    def test_snapshot_has_no_password(self):
+        self.authenticate()
+        user, _ = self.authenticate()
+        self.assertNotIn('password', user.__dict__)
+
+    def test_unknown_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('0' * 40)
+
+    def test_deleted_token(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivated_user(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_changed_user_is_reloaded(self):
+        self.authenticate()
+        self.user.first_name = 'New'
+        self.user.save()
+        user, _ = self.authenticate()
+        self.assertEqual(user.first_name, 'New')
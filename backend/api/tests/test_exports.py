@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from jobs import queue
+from jobs.models import Job
+from recipes.models import ShoppingCart
+from .utils import (TempMediaMixin, auth_header, make_ingredient,
+                    make_recipe, make_user)
+
+
+class ShoppingCartExportTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('cook')
+        recipe = make_recipe(
+            cls.user, ingredients=[(make_ingredient('Соль'), 5)])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def export(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?async=1',
+            **auth_header(self.user))
+        self.assertEqual(response.status_code, 202)
+        job, = queue.claim('worker')
+        self.assertTrue(queue.execute(job))
+        return self.client.get(response.json()['url'],
+                               **auth_header(self.user)).json()
+
+    def test_owner_downloads_export(self):
+        job = self.export()
+        self.assertEqual(job['status'], Job.DONE)
+        response = self.client.get(job['download'],
+                                   **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content).decode(),
+                         'Соль — 5\n')
+        self.assertIn('shopping_cart.txt', response['Content-Disposition'])
+
+    def test_export_not_public(self):
+        job = self.export()
+        self.assertNotIn('/media/', job['download'])
+        self.assertEqual(self.client.get(job['download']).status_code, 401)
+        other = auth_header(make_user('stranger'))
+        self.assertEqual(
+            self.client.get(job['download'], **other).status_code, 404)
+
+    def test_export_deleted_after_ttl(self):
+        with self.settings(EXPORTS_TTL=600):
+            job = self.export()
+        cleanup = Job.objects.get(name='recipes.delete_export')
+        self.assertGreater((cleanup.run_at - cleanup.created_at)
+                           .total_seconds(), 590)
+        Job.objects.filter(pk=cleanup.pk).update(run_at=cleanup.created_at)
+        cleanup, = queue.claim('worker')
+        self.assertTrue(queue.execute(cleanup))
+        response = self.client.get(job['download'],
+                                   **auth_header(self.user))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,67 @@
+from django.test import TestCase
+
+from .utils import make_recipe, make_user
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = make_user('cook')
+        # Одинаковые значения сортировки: порядок держится на id.
+        cls.recipes = [
+            make_recipe(author, f'Рецепт {number % 3}',
+                        cooking_time=number % 4 + 1)
+            for number in range(9)]
+
+    def walk(self, query):
+        url, ids, pages = f'/api/recipes/?cursor=&limit=2&{query}', [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(set(body), {'next', 'results'})
+            ids += [recipe['id'] for recipe in body['results']]
+            url = body['next']
+            pages += 1
+        return ids, pages
+
+    def offset_ids(self, query):
+        response = self.client.get(f'/api/recipes/?limit=100&{query}')
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_pages_match_offset_order(self):
+        for ordering in ('newest', 'name', 'cooking_time', 'popularity',
+                         'trending'):
+            with self.subTest(ordering=ordering):
+                ids, pages = self.walk(f'ordering={ordering}')
+                self.assertEqual(ids, self.offset_ids(f'ordering={ordering}'))
+                self.assertEqual(pages, 5)
+
+    def test_new_rows_do_not_shift_pages(self):
+        first = self.client.get('/api/recipes/?cursor=&limit=3').json()
+        make_recipe(self.recipes[0].author, 'Новый')
+        second = self.client.get(first['next']).json()
+        expected = self.offset_ids('')[4:7]
+        self.assertEqual([recipe['id'] for recipe in second['results']],
+                         expected)
+
+    def test_deleted_cursor_row(self):
+        first = self.client.get(
+            '/api/recipes/?cursor=&limit=3&ordering=name').json()
+        ordered = self.offset_ids('ordering=name')
+        type(self.recipes[0]).objects.filter(pk=ordered[2]).delete()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([recipe['id'] for recipe in second['results']],
+                         ordered[3:6])
+
+    def test_bad_cursor(self):
+        first = self.client.get(
+            '/api/recipes/?cursor=&limit=2&ordering=name').json()
+        cursor = first['next'].split('cursor=')[1].split('&')[0]
+        for query in ('cursor=broken', 'cursor=WzFd',
+                      f'cursor={cursor}&ordering=cooking_time'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.client.get(f'/api/recipes/?{query}').status_code,
+                    404)
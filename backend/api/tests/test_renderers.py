@@ -0,0 +1,127 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+from uuid import UUID
+
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import MessagePackParser, ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from recipes.models import Tag
+
+MSGPACK = 'application/msgpack'
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """ORJSONRenderer отдаёт те же байты, что JSONRenderer DRF."""
+
+    def assertSameAsDRF(self, data, accepted_media_type=None):
+        self.assertEqual(
+            ORJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type))
+
+    def test_plain_values(self):
+        self.assertSameAsDRF({
+            'id': 1, 'name': 'Борщ', 'ratio': 0.25, 'empty': None,
+            'flags': [True, False], 'nested': {'tags': [], 'text': 'a"b\\'},
+        })
+
+    def test_float_formatting(self):
+        self.assertSameAsDRF({'values': [1e16, -2.5e20, 1.5e-05, 1e-07,
+                                         0.0001, 123.456, 1e15]})
+
+    def test_float_like_text(self):
+        self.assertSameAsDRF({'text': 'Вариант 2e-3, доля 0.00001'})
+
+    def test_non_string_keys(self):
+        self.assertSameAsDRF({1: 'a', 2: ['b']})
+
+    def test_decimal(self):
+        self.assertSameAsDRF({'amount': Decimal('1.50'),
+                              'big': Decimal('12345678901234567890.1')})
+
+    def test_dates_and_times(self):
+        self.assertSameAsDRF({
+            'naive': datetime(2025, 9, 14, 12, 30, 15, 123456),
+            'aware': datetime(2025, 9, 14, 12, 30, tzinfo=timezone.utc),
+            'offset': datetime(2025, 9, 14, 12, 30, tzinfo=timezone(
+                timedelta(hours=3))),
+            'date': date(2025, 9, 14),
+            'time': time(7, 5, 3, 250000),
+            'duration': timedelta(minutes=90),
+        })
+
+    def test_lazy_strings_and_uuid(self):
+        self.assertSameAsDRF({
+            'label': gettext_lazy('Рецепт'),
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+        })
+
+    def test_line_separators(self):
+        self.assertSameAsDRF({'text': 'строка\u2028абзац\u2029конец'})
+
+    def test_indent_in_accept(self):
+        self.assertSameAsDRF({'id': 1, 'tags': [1, 2]},
+                             'application/json; indent=4')
+
+    def test_none(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parser_reads_rendered_json(self):
+        data = {'amount': Decimal('1.50'), 'text': 'a\u2028b',
+                'at': datetime(2025, 9, 14, 12, 30, tzinfo=timezone.utc)}
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(ORJSONParser().parse(BytesIO(rendered)),
+                         json.loads(rendered))
+
+
+class MessagePackTests(SimpleTestCase):
+    """MessagePack несёт те же значения, что и JSON."""
+
+    def test_round_trip(self):
+        data = {
+            'id': 1, 'name': 'Борщ', 'empty': None, 'ratio': 0.25,
+            'amount': Decimal('1.50'),
+            'at': datetime(2025, 9, 14, 12, 30, tzinfo=timezone.utc),
+            'label': gettext_lazy('Рецепт'),
+            'items': [{'id': 2, 'amount': 3}],
+        }
+        packed = MessagePackRenderer().render(data)
+        self.assertEqual(MessagePackParser().parse(BytesIO(packed)),
+                         json.loads(JSONRenderer().render(data)))
+
+    def test_broken_body(self):
+        from rest_framework.exceptions import ParseError
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(BytesIO(b'\xc1'))
+
+
+class NegotiationTests(TestCase):
+    """Формат ответа выбирается по Accept и ?format=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Tag.objects.create(name='Обед\u2028', slug='lunch')
+
+    def test_json_by_default(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content,
+                         JSONRenderer().render(response.data))
+
+    def test_msgpack(self):
+        expected = self.client.get('/api/tags/').json()
+        for kwargs in ({'HTTP_ACCEPT': MSGPACK}, {'data': {'format':
+                                                           'msgpack'}}):
+            with self.subTest(**kwargs):
+                response = self.client.get('/api/tags/', **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], MSGPACK)
+                self.assertEqual(
+                    MessagePackParser().parse(BytesIO(response.content)),
+                    expected)
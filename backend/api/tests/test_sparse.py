@@ -0,0 +1,37 @@
+from django.test import TestCase
+
+from recipes.models import Recipe
+from .utils import (PNG, TempMediaMixin, auth_header, make_ingredient,
+                    make_recipe, make_tag, make_user)
+
+
+class SparseFieldsTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('author')
+        cls.tag = make_tag('lunch')
+        cls.ingredient = make_ingredient('Соль')
+        cls.recipe = make_recipe(cls.user, tags=[cls.tag],
+                                 ingredients=[(cls.ingredient, 5)])
+
+    def test_fields_and_omit_on_read(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/?fields=id,name,text&omit=text')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'id', 'name'})
+
+    def test_unknown_field_on_read(self):
+        response = self.client.get('/api/recipes/?fields=bogus')
+        self.assertEqual(response.status_code, 400)
+
+    def test_write_ignores_sparse_params(self):
+        response = self.client.post(
+            '/api/recipes/?fields=bogus',
+            {'name': 'Новый', 'text': 'Текст', 'cooking_time': 5,
+             'image': PNG, 'tags': [self.tag.pk],
+             'ingredients': [{'id': self.ingredient.pk, 'amount': 2}]},
+            content_type='application/json', **auth_header(self.user))
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('ingredients', response.json())
+        self.assertTrue(Recipe.objects.filter(name='Новый').exists())
@@ -0,0 +1,69 @@
+"""Общие данные для тестов API и приложений."""
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+# Прозрачный PNG 1x1 в формате поля image.
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+       'AAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+
+
+def make_user(username, **fields):
+    fields.setdefault('email', f'{username}@example.com')
+    fields.setdefault('first_name', username)
+    fields.setdefault('last_name', username)
+    return User.objects.create_user(username=username, password='pass-1234',
+                                    **fields)
+
+
+def auth_header(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+
+def make_tag(slug):
+    return Tag.objects.create(name=slug.title(), slug=slug)
+
+
+def make_ingredient(name, unit='г'):
+    return Ingredient.objects.create(name=name, measurement_unit=unit)
+
+
+def make_recipe(author, name='Рецепт', tags=(), ingredients=(), **fields):
+    """Рецепт напрямую через ORM; ingredients - [(ингредиент, количество)].
+    """
+    fields.setdefault('text', 'Описание')
+    fields.setdefault('cooking_time', 10)
+    fields.setdefault('image', 'recipes/images/test.png')
+    recipe = Recipe.objects.create(author=author, name=name, **fields)
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        [RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+         for ingredient, amount in ingredients])
+    return recipe
+
+
+class TempMediaMixin:
+    """MEDIA_ROOT и EXPORTS_ROOT во временном каталоге на время класса
+    тестов."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            EXPORTS_ROOT=os.path.join(cls.media_root, 'exports'))
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientDetailView, IngredientListView, RecipeViewSet,
-                    TagListCreateView, TagRetrieveView, UserViewSet)
+from .views import (IngredientDetailView, IngredientListView,
+                    InstrumentationView, JobDownloadView, JobView,
+                    RecipeViewSet, TagListCreateView, TagRetrieveView,
+                    UserViewSet)
 
 router = DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipe')
@@ -31,9 +34,35 @@ recipe_urlpatterns = [
     path('recipes/<int:pk>/get-link/',
          RecipeViewSet.as_view({'get': 'get_link'}),
          name='recipe-get-link'),
+    path('jobs/<int:pk>/', JobView.as_view(), name='job-detail'),
+    path('jobs/<int:pk>/download/', JobDownloadView.as_view(),
+         name='job-download'),
+    path('instrumentation/', InstrumentationView.as_view(),
+         name='instrumentation'),
 ]
 
 
 urlpatterns = [
     path('', include(router.urls)),
 ] + auth_urlpatterns + recipe_urlpatterns
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    # Должны идти раньше маршрутов роутера, которые они заменяют.
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list_view),
+        path('recipes/<int:pk>/', async_views.recipe_detail_view),
+        path('ingredients/', async_views.ingredient_list_view),
+        path('tags/', async_views.tag_list_view),
+        path('users/subscriptions/', async_views.subscriptions_view),
+    ] + urlpatterns
+
+if settings.SERVER_MODE == 'asgi':
+    from .streams import feed_stream
+
+    # Поток держит соединение открытым - только для ASGI-воркеров.
+    urlpatterns += [
+        path('recipes/feed/stream/', feed_stream,
+             name='recipe-feed-stream'),
+    ]
@@ -1,14 +1,16 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
 from rest_framework import generics, permissions, status
 from rest_framework.viewsets import ModelViewSet
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
-from django.db.models import Sum
+from django.db.models import Count, Exists, OuterRef, Prefetch, Value
 from rest_framework.decorators import action
-from rest_framework.exceptions import ParseError
-from rest_framework.filters import SearchFilter
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
@@ -17,16 +19,28 @@ from rest_framework.status import (
     HTTP_401_UNAUTHORIZED
 )
 
+from foodgram.instrumentation import collect
+from foodgram.middleware import pin_to_primary
+from jobs.models import Job
+from jobs.queue import enqueue, jobs
+from recipes.feed import read as read_feed
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPageNumberPagination, CustomUserPagination
+from recipes.similarity import similar_recipes
+from recipes.tasks import exports_storage, shopping_list
+from .constants import MAX_PER_PAGE
+from .filters import IngredientFilter, RecipeFilter, UserSearchFilter
+from .pagination import (CustomUserPagination, EstimatedCountPagination,
+                         KeysetPagination, recipes_limit)
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
+from .serializers import (IngredientSerializer, JobSerializer,
+                          RecipeCreateSerializer,
                           RecipeSerializer, TagSerializer, AvatarSerializer,
+                          SubscriptionRecipeShortSerializer,
                           SubscriptionSerializer,
                           SubscriptionShowSerializer,
-                          UserSerializer, RecipeIngredient,
+                          UserSerializer,
                           UserCreateSerializer)
+from .sparse import defer_omitted, requested_fields
 from users.models import Subscription, User
 
 
@@ -62,10 +76,36 @@ class RecipeViewSet(ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     filterset_class = RecipeFilter
-    pagination_class = LimitPageNumberPagination
+    pagination_class = EstimatedCountPagination
     permission_classes = (IsAuthorOrReadOnly,
                           permissions.IsAuthenticatedOrReadOnly)
 
+    def response_fields(self):
+        """Поля ответа по ?fields= и ?omit= (только для чтения)."""
+        return requested_fields(self.request, RecipeSerializer.Meta.fields)
+
+    def get_queryset(self):
+        fields = self.response_fields()
+        return Recipe.objects.with_related(fields).with_user_flags(
+            self.request.user, fields)
+
+    def filter_queryset(self, queryset):
+        # Колонки откладываются после фильтров: сортировка уже известна.
+        return defer_omitted(super().filter_queryset(queryset),
+                             RecipeSerializer.Meta.columns,
+                             self.response_fields())
+
+    @property
+    def paginator(self):
+        # С ?cursor= список отдаётся keyset-страницами.
+        if not hasattr(self, '_paginator'):
+            if (KeysetPagination.cursor_query_param
+                    in self.request.query_params):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
@@ -98,19 +138,19 @@ class RecipeViewSet(ModelViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__is_in_shopping_cart__user=request.user)
-            .values('ingredient__name')
-            .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
-        )
+        run_async = request.query_params.get('async')
+        if (settings.SHOPPING_CART_ASYNC if run_async is None
+                else run_async in ('1', 'true')):
+            # Большой список собирает воркер, клиент опрашивает url задачи.
+            pin_to_primary(request)
+            job = enqueue('recipes.export_shopping_cart', user=request.user,
+                          user_id=request.user.id)
+            return Response(
+                JobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_202_ACCEPTED)
 
-        lines = [
-            f"{item['ingredient__name']} — {item['total_amount']}\n"
-            for item in ingredients
-        ]
-        response = HttpResponse(''.join(lines), content_type='text/plain')
+        response = HttpResponse(shopping_list(request.user.id),
+                                content_type='text/plain')
         response['Content-Disposition'] = (
             'attachment; filename="shopping_cart.txt"'
         )
@@ -141,6 +181,47 @@ class RecipeViewSet(ModelViewSet):
             cart_item.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые сначала.
+
+        Keyset-пагинация: следующая страница - ?before=<id последнего>.
+        """
+        try:
+            before = request.query_params.get('before')
+            before = int(before) if before else None
+            limit = int(request.query_params.get(
+                'limit', self.pagination_class.page_size))
+        except ValueError:
+            raise ParseError('Параметры before и limit должны быть числами')
+        if limit < 1:
+            raise ParseError('Параметр limit должен быть больше нуля')
+        limit = min(limit, MAX_PER_PAGE)
+
+        recipe_ids = read_feed(request.user.id, before, limit)
+        recipes = defer_omitted(
+            self.get_queryset().filter(id__in=recipe_ids).order_by('-id'),
+            RecipeSerializer.Meta.columns, self.response_fields())
+        serializer = RecipeSerializer(recipes, many=True,
+                                      context={'request': request})
+        next_url = None
+        if len(recipe_ids) == limit:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', recipe_ids[-1])
+        return Response({'next': next_url, 'results': serializer.data})
+
+    @action(detail=True, methods=['get'],
+            permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """Похожие рецепты из предрассчитанной таблицы соседей."""
+        recipes = list(similar_recipes(pk))
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = SubscriptionRecipeShortSerializer(
+            recipes, many=True, context={'request': request})
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'],
             permission_classes=[permissions.IsAuthenticated])
     def get_link(self, request, pk=None):
@@ -192,10 +273,33 @@ class UserViewSet(UserViewSet):
     permission_classes = (AllowAny,)
     pagination_class = CustomUserPagination
     lookup_field = 'id'
-    filter_backends = (SearchFilter,)
-    search_fields = ('username',)
+    filter_backends = (UserSearchFilter,)
+    search_fields = ('username', 'first_name', 'last_name')
     http_method_names = ('get', 'post', 'put', 'delete')
 
+    def response_fields(self, serializer_class=UserSerializer):
+        """Поля ответа по ?fields= и ?omit= (только для чтения)."""
+        return requested_fields(self.request,
+                                serializer_class.Meta.fields)
+
+    def get_queryset(self):
+        # is_subscribed для всей страницы - одним подзапросом.
+        queryset = super().get_queryset()
+        fields = self.response_fields()
+        if fields is not None and 'is_subscribed' not in fields:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(subscribed=Value(False))
+        return queryset.annotate(subscribed=Exists(
+            Subscription.objects.filter(follower=user,
+                                        following=OuterRef('pk'))))
+
+    def filter_queryset(self, queryset):
+        return defer_omitted(super().filter_queryset(queryset),
+                             UserSerializer.Meta.columns,
+                             self.response_fields())
+
     @action(
         detail=False,
         methods=['get', 'patch'],
@@ -257,6 +361,29 @@ class UserViewSet(UserViewSet):
         except Subscription.DoesNotExist:
             raise ParseError('Объект не найден')
 
+    @staticmethod
+    def subscriptions_queryset(user, recipes_limit=None, fields=None):
+        """Авторы, на которых подписан user, со всем нужным для
+        SubscriptionShowSerializer: без запросов на каждого автора.
+
+        recipes_limit - уже проверенное число (pagination.recipes_limit),
+        fields - поля ответа (None - все).
+        """
+        queryset = (User.objects.filter(following__follower=user)
+                    .annotate(subscribed=Value(True)).order_by('username'))
+        if fields is None or 'recipes_count' in fields:
+            queryset = queryset.annotate(
+                recipes_total=Count('recipes', distinct=True))
+        if fields is None or 'recipes' in fields:
+            # Краткой карточке рецепта не нужен, например, text.
+            recipes = Recipe.objects.only(
+                'id', 'name', 'image', 'cooking_time', 'author')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipes', queryset=recipes, to_attr='prefetched_recipes'))
+        return defer_omitted(queryset, UserSerializer.Meta.columns, fields)
+
     @action(
         detail=False,
         methods=['get'],
@@ -265,7 +392,9 @@ class UserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(following__follower=request.user)
+        authors = self.subscriptions_queryset(
+            request.user, recipes_limit(request.query_params),
+            self.response_fields(SubscriptionShowSerializer))
         paginator = CustomUserPagination()
         result_pages = paginator.paginate_queryset(
             queryset=authors, request=request
@@ -324,3 +453,43 @@ class UserRegistrationView(generics.CreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data,
                         status=HTTP_201_CREATED, headers=headers)
+
+
+class InstrumentationView(APIView):
+    """Служебная статистика процесса (пулы соединений и т.п.)."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(collect())
+
+
+class JobView(generics.RetrieveAPIView):
+    """Состояние фоновой задачи текущего пользователя.
+
+    Читается с primary, как и вся очередь: статус меняет воркер, а
+    закрепление клиента после постановки задачи длится лишь
+    REPLICA_PIN_SECONDS.
+    """
+
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return jobs().filter(user=self.request.user)
+
+
+class JobDownloadView(JobView):
+    """Файл, выгруженный задачей, - только владельцу задачи и только
+    до удаления выгрузки (EXPORTS_TTL).
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        result = job.result if isinstance(job.result, dict) else {}
+        storage = exports_storage()
+        name = result.get('file')
+        if job.status != Job.DONE or not name or not storage.exists(name):
+            raise NotFound('Файл не найден или уже удалён.')
+        return FileResponse(storage.open(name, 'rb'), as_attachment=True,
+                            filename=result.get('filename'))
@@ -0,0 +1,30 @@
+from django.db import connections
+
+
+def pool_stats():
+    """Статистика psycopg-пулов текущего процесса.
+
+    Пул не создаётся ради статистики: берём только уже открытые пулы.
+    """
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            continue
+        pool = type(connection)._connection_pools.get(alias)
+        if pool is None:
+            continue
+        raw = pool.get_stats()
+        stats[alias] = {
+            'size': raw.get('pool_size', 0),
+            'available': raw.get('pool_available', 0),
+            'checked_out': (raw.get('pool_size', 0)
+                            - raw.get('pool_available', 0)),
+            'waiting': raw.get('requests_waiting', 0),
+            'waits': raw.get('requests_queued', 0),
+            'wait_ms': raw.get('requests_wait_ms', 0),
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connections_lost': raw.get('connections_lost', 0),
+        }
+    return stats
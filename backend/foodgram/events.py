@@ -0,0 +1,211 @@
+"""Публикация событий для открытых потоков (server-sent events).
+
+Потоки подписываются на темы в hub своего процесса, а publish() отдаёт
+событие бэкенду из EVENTS_BACKEND:
+
+- MemoryBackend - только внутри процесса (один воркер, тесты);
+- SocketBackend - всем процессам машины через unix-сокеты (датаграммы)
+  в EVENTS_SOCKET_DIR: у каждого процесса с потоками свой сокет.
+
+Доставка «не больше одного раза»: событие для переполненной очереди или
+сокета отбрасывается, а поток получает отметку resync.
+"""
+import asyncio
+import atexit
+import os
+import socket
+import threading
+from functools import cache as memoize
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Отметка в очереди: события были потеряны, клиенту нужно перечитать ленту.
+RESYNC = object()
+MAX_DATAGRAM = 65536
+
+
+class Subscriber:
+    """Очередь событий одного потока; живёт в цикле событий потока."""
+
+    def __init__(self, topics, maxsize):
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Кладёт событие в очередь (из любого потока)."""
+        try:
+            self.loop.call_soon_threadsafe(self.put, event)
+        except RuntimeError:
+            # Цикл уже закрыт: поток завершился.
+            pass
+
+    def put(self, event):
+        if self.overflowed:
+            hub.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: вместо накопленного - одна
+            # отметка resync, новые события до её отправки не копятся.
+            hub.dropped += self.queue.qsize() + 1
+            hub.overflows += 1
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    async def get(self, timeout):
+        """Следующее событие, RESYNC или None по истечении timeout."""
+        if self.overflowed:
+            self.overflowed = False
+            return RESYNC
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """Темы и подписчики текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.topics = {}
+        self.subscribers = set()
+        self.dropped = 0
+        self.overflows = 0
+
+    def subscribe(self, topics):
+        subscriber = Subscriber(topics, settings.EVENTS_QUEUE_SIZE)
+        backend().start(subscriber.loop)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            for topic in subscriber.topics:
+                self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            self.remove_topics(subscriber, set(subscriber.topics))
+
+    def add_topics(self, subscriber, topics):
+        with self.lock:
+            for topic in topics:
+                subscriber.topics.add(topic)
+                self.topics.setdefault(topic, set()).add(subscriber)
+
+    def remove_topics(self, subscriber, topics):
+        with self.lock:
+            for topic in topics:
+                subscriber.topics.discard(topic)
+                subscribers = self.topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self.topics[topic]
+
+    def dispatch(self, topic, event):
+        """Раздаёт событие подписчикам темы в этом процессе."""
+        with self.lock:
+            subscribers = list(self.topics.get(topic, ()))
+        for subscriber in subscribers:
+            subscriber.deliver(event)
+
+
+class MemoryBackend:
+    """События не выходят за пределы процесса."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self, loop):
+        pass
+
+    def publish(self, topic, event):
+        self.hub.dispatch(topic, event)
+
+
+class SocketBackend:
+    """События всем процессам машины через unix-сокеты в каталоге."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.directory = Path(settings.EVENTS_SOCKET_DIR)
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sender.setblocking(False)
+        self.receiver = None
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def start(self, loop):
+        """Слушает сокет процесса в цикле loop (при первом потоке)."""
+        with self.lock:
+            if self.receiver is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self.directory / f'{os.getpid()}.sock'
+                path.unlink(missing_ok=True)
+                self.receiver = socket.socket(socket.AF_UNIX,
+                                              socket.SOCK_DGRAM)
+                self.receiver.bind(str(path))
+                self.receiver.setblocking(False)
+                atexit.register(path.unlink, missing_ok=True)
+            if loop is not self.loop:
+                loop.add_reader(self.receiver.fileno(), self.receive)
+                self.loop = loop
+
+    def receive(self):
+        while True:
+            try:
+                data = self.receiver.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            topic, event = orjson.loads(data)
+            self.hub.dispatch(topic, event)
+
+    def publish(self, topic, event):
+        data = orjson.dumps([topic, event])
+        for path in self.directory.glob('*.sock'):
+            try:
+                self.sender.sendto(data, str(path))
+            except BlockingIOError:
+                # Буфер сокета процесса полон - событие теряется.
+                self.hub.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Сокет завершившегося процесса.
+                path.unlink(missing_ok=True)
+
+
+hub = Hub()
+
+
+@memoize
+def backend():
+    return import_string(settings.EVENTS_BACKEND)(hub)
+
+
+def publish(topic, event):
+    backend().publish(topic, event)
+
+
+def subscribe(topics):
+    return hub.subscribe(topics)
+
+
+def unsubscribe(subscriber):
+    hub.unsubscribe(subscriber)
+
+
+def stats():
+    return {
+        'backend': settings.EVENTS_BACKEND.rsplit('.', 1)[-1],
+        'streams': len(hub.subscribers),
+        'topics': len(hub.topics),
+        'dropped': hub.dropped,
+        'overflows': hub.overflows,
+    }
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def collect():
+    """Собирает статистику со всех источников из INSTRUMENTATION_COLLECTORS.
+
+    Источник - функция без аргументов, возвращающая словарь. Ошибка одного
+    источника не должна ломать остальные, поэтому она попадает в отчёт.
+    """
+    stats = {}
+    for name, path in settings.INSTRUMENTATION_COLLECTORS.items():
+        try:
+            stats[name] = import_string(path)()
+        except Exception as error:
+            stats[name] = {'error': str(error)}
+    return stats
@@ -0,0 +1,197 @@
+"""Ограничение конкурентности и сброс нагрузки по классам маршрутов.
+
+Запрос относится к классу (дешёвое чтение, дорогое чтение, запись, см.
+classify) и проходит два фильтра:
+
+* корзина токенов клиента в общем кэше (LIMITER_CLASSES[...]['rate'] и
+  'burst') - при её опустошении ответ 429;
+* лимит одновременных запросов класса в процессе с короткой очередью
+  ожидания - при переполнении ответ 503. Лимит подстраивается по
+  задержкам (AIMD): растёт на 1/limit после быстрого запроса и
+  уменьшается в BACKOFF_RATIO раз после медленного.
+
+Оба ответа несут Retry-After.
+"""
+import asyncio
+import math
+import re
+import threading
+import time
+from functools import cache as memoize
+
+from django.conf import settings
+from django.core.cache import cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+BACKOFF_RATIO = 0.9
+# Вес нового замера в скользящем среднем задержки (для статистики).
+LATENCY_SMOOTHING = 0.1
+
+
+class RouteLimiter:
+
+    def __init__(self, name, limit=None, min_limit=1, max_limit=None,
+                 queue=0, queue_timeout=1.0, target_latency=None,
+                 rate=None, burst=None):
+        self.name = name
+        self.limit = float(limit) if limit else None
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.rate = rate
+        self.burst = burst or rate
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.latency = None
+
+    def free(self):
+        return self.limit is None or self.in_flight < max(1, int(self.limit))
+
+    def acquire(self):
+        """Занимает место; ждёт в очереди не дольше queue_timeout."""
+        with self.condition:
+            if self.free():
+                self.in_flight += 1
+                return True
+            if self.queued >= self.queue:
+                self.rejected += 1
+                return False
+            self.queued += 1
+            try:
+                admitted = self.condition.wait_for(
+                    self.free, timeout=self.queue_timeout)
+            finally:
+                self.queued -= 1
+            if admitted:
+                self.in_flight += 1
+            else:
+                self.rejected += 1
+            return admitted
+
+    async def aacquire(self):
+        with self.condition:
+            if self.free():
+                self.in_flight += 1
+                return True
+            if self.queued >= self.queue:
+                self.rejected += 1
+                return False
+            self.queued += 1
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+                with self.condition:
+                    if self.free():
+                        self.in_flight += 1
+                        return True
+        finally:
+            with self.condition:
+                self.queued -= 1
+        with self.condition:
+            self.rejected += 1
+        return False
+
+    def release(self, latency):
+        with self.condition:
+            self.in_flight -= 1
+            self.adjust(latency)
+            self.condition.notify()
+
+    def adjust(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        if self.limit is None or self.target_latency is None:
+            return
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.queue_timeout))
+
+    def bucket_key(self, client):
+        return f'limiter:{self.name}:{client}'
+
+    def refill(self, state):
+        """(токены, через сколько секунд появится следующий) и новое
+        состояние корзины."""
+        now = time.time()
+        tokens, updated = state or (self.burst, now)
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate, (tokens, now)
+        return 0, (tokens - 1, now)
+
+    def bucket_timeout(self):
+        return math.ceil(self.burst / self.rate) + 1
+
+    def take_token(self, client):
+        """0, если токен есть, иначе секунды до следующего токена.
+
+        Чтение и запись корзины не атомарны: при гонке клиент может
+        получить лишний токен, что для сброса нагрузки допустимо.
+        """
+        if not self.rate or not client:
+            return 0
+        key = self.bucket_key(client)
+        wait, state = self.refill(cache.get(key))
+        cache.set(key, state, self.bucket_timeout())
+        if wait:
+            self.throttled += 1
+        return wait
+
+    async def atake_token(self, client):
+        if not self.rate or not client:
+            return 0
+        key = self.bucket_key(client)
+        wait, state = self.refill(await cache.aget(key))
+        await cache.aset(key, state, self.bucket_timeout())
+        if wait:
+            self.throttled += 1
+        return wait
+
+    def stats(self):
+        return {
+            'limit': self.limit and round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'throttled': self.throttled,
+            'latency_ms': self.latency and round(self.latency * 1000, 1),
+        }
+
+
+@memoize
+def limiters():
+    return {name: RouteLimiter(name, **options)
+            for name, options in settings.LIMITER_CLASSES.items()}
+
+
+@memoize
+def expensive_paths():
+    return [re.compile(pattern)
+            for pattern in settings.LIMITER_EXPENSIVE_PATHS]
+
+
+def classify(request):
+    if request.method not in SAFE_METHODS:
+        return 'write'
+    if any(pattern.match(request.path) for pattern in expensive_paths()):
+        return 'expensive'
+    page = request.GET.get('page', '')
+    if page.isdigit() and int(page) > settings.LIMITER_DEEP_PAGE:
+        return 'expensive'
+    return 'cheap'
+
+
+def stats():
+    return {name: limiter.stats() for name, limiter in limiters().items()}
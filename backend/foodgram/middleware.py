@@ -0,0 +1,252 @@
+import hashlib
+import ipaddress
+import math
+import time
+from functools import cache as memoize
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject, empty
+
+from .limiter import classify, limiters
+from .routers import use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Отметка на HttpRequest: безопасный по методу запрос записал в БД.
+WROTE_ATTR = 'wrote_to_primary'
+# Сколько секунд лимитер помнит, чей это проверенный токен или сессия.
+VERIFIED_CLIENT_TTL = 300
+
+
+def pin_to_primary(request):
+    """Для GET, который пишет в БД (например, ставит задачу в очередь).
+
+    Остаток запроса читает с primary, а клиент закрепляется за primary,
+    как после POST. request - HttpRequest или Request DRF.
+    """
+    use_primary.set(True)
+    setattr(getattr(request, '_request', request), WROTE_ATTR, True)
+
+
+@memoize
+def trusted_networks(proxies):
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def client_address(request):
+    """Адрес клиента: X-Real-IP только от доверенного прокси."""
+    address = request.META.get('REMOTE_ADDR')
+    forwarded = request.META.get('HTTP_X_REAL_IP')
+    if not forwarded or not address:
+        return address
+    try:
+        remote = ipaddress.ip_address(address)
+    except ValueError:
+        return address
+    networks = trusted_networks(tuple(settings.LIMITER_TRUSTED_PROXIES))
+    if any(remote in network for network in networks):
+        return forwarded
+    return address
+
+
+def credentials_digest(request):
+    """sha1 заголовка Authorization или cookie сессии; None у анонима."""
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return hashlib.sha1(credentials.encode()).hexdigest()
+
+
+class PrimaryPinningMiddleware:
+    """Обеспечивает read-your-writes при чтении с реплик.
+
+    Запросы на запись целиком идут на primary, как и GET, который сам
+    пишет в БД (pin_to_primary). После успешной записи
+    клиент на REPLICA_PIN_SECONDS закрепляется за primary: через cookie
+    или через метку в кэше (REPLICA_PIN_STORE = 'cache'), ключом которой
+    служит заголовок Authorization или cookie сессии.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = self.marker_key(request)
+        marked = bool(key) and self.uses_cache() and cache.get(key)
+        token = use_primary.set(self.needs_primary(request, marked))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if self.remember_write(request, response) and key:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = self.marker_key(request)
+        marked = bool(key) and self.uses_cache() and await cache.aget(key)
+        token = use_primary.set(self.needs_primary(request, marked))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if self.remember_write(request, response) and key:
+            await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    @staticmethod
+    def uses_cache():
+        return (bool(settings.DATABASE_REPLICAS)
+                and settings.REPLICA_PIN_STORE == 'cache')
+
+    @staticmethod
+    def marker_key(request):
+        digest = credentials_digest(request)
+        if not digest:
+            return None
+        return f'replica-pin:{digest}'
+
+    @staticmethod
+    def needs_primary(request, marked):
+        if request.method not in SAFE_METHODS:
+            return True
+        if not settings.DATABASE_REPLICAS:
+            return False
+        return bool(marked) or settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+    def remember_write(self, request, response):
+        """Ставит cookie-метку; возвращает True, если нужна метка в кэше."""
+        if ((request.method in SAFE_METHODS
+                and not getattr(request, WROTE_ATTR, False))
+                or not settings.DATABASE_REPLICAS
+                or response.status_code >= 400):
+            return False
+        if self.uses_cache():
+            return True
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, '1',
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+        return False
+
+
+class ConcurrencyLimitMiddleware:
+    """Сбрасывает нагрузку по классам маршрутов (см. foodgram/limiter.py).
+
+    Лишние запросы получают 429 или 503 с Retry-After сразу, а не
+    занимают воркеры, пока дорогие запросы не отпустят их.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.LIMITER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        limiter = limiters()[classify(request)]
+        wait = limiter.take_token(self.client_key(request))
+        if wait:
+            return self.throttled(wait)
+        if not limiter.acquire():
+            return self.overloaded(limiter)
+        started = time.monotonic()
+        try:
+            response = self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - started)
+        verified = self.verified_client(request)
+        if verified:
+            cache.set(*verified, VERIFIED_CLIENT_TTL)
+        return response
+
+    async def __acall__(self, request):
+        limiter = limiters()[classify(request)]
+        wait = await limiter.atake_token(await self.aclient_key(request))
+        if wait:
+            return self.throttled(wait)
+        if not await limiter.aacquire():
+            return self.overloaded(limiter)
+        started = time.monotonic()
+        try:
+            response = await self.get_response(request)
+        finally:
+            limiter.release(time.monotonic() - started)
+        verified = self.verified_client(request)
+        if verified:
+            await cache.aset(*verified, VERIFIED_CLIENT_TTL)
+        return response
+
+    @staticmethod
+    def verified_key(digest):
+        return f'limiter-client:{digest}'
+
+    def client_key(self, request):
+        """Корзина пользователя, если его токен или сессия уже прошли
+        проверку, иначе - IP: случайный токен не даёт новой корзины."""
+        digest = credentials_digest(request)
+        user_id = digest and cache.get(self.verified_key(digest))
+        if user_id:
+            return f'user:{user_id}'
+        return self.address_key(request)
+
+    async def aclient_key(self, request):
+        digest = credentials_digest(request)
+        user_id = digest and await cache.aget(self.verified_key(digest))
+        if user_id:
+            return f'user:{user_id}'
+        return self.address_key(request)
+
+    @staticmethod
+    def address_key(request):
+        address = client_address(request)
+        return address and f'ip:{address}'
+
+    def verified_client(self, request):
+        """(ключ, id пользователя), если аутентификация в запросе прошла.
+
+        Ленивый request.user не вычисляется: в async-режиме это запрос
+        к БД из цикла событий.
+        """
+        digest = credentials_digest(request)
+        user = request.__dict__.get('user')
+        if isinstance(user, SimpleLazyObject):
+            user = None if user._wrapped is empty else user._wrapped
+        if not digest or user is None or not user.is_authenticated:
+            return None
+        return self.verified_key(digest), user.pk
+
+    @staticmethod
+    def throttled(wait):
+        response = JsonResponse(
+            {'detail': 'Слишком много запросов, повторите позже.'},
+            status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    @staticmethod
+    def overloaded(limiter):
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите позже.'}, status=503)
+        response['Retry-After'] = str(limiter.retry_after())
+        return response
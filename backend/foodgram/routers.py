@@ -0,0 +1,27 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Реплики читает только PrimaryPinningMiddleware - безопасные запросы без
+# недавней записи. Всё остальное (команды, воркеры очереди, потоки вне
+# запроса) видит свежие данные и читает с primary.
+use_primary = ContextVar('use_primary', default=True)
+
+
+class PrimaryReplicaRouter:
+    """Чтения - на случайную реплику, записи - на primary ('default')."""
+
+    def db_for_read(self, model, **hints):
+        if use_primary.get() or not settings.DATABASE_REPLICAS:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
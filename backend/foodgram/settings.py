@@ -1,3 +1,4 @@
+import copy
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -37,14 +38,21 @@ INSTALLED_APPS = [
     'users',
     'api',
     'recipes',
+    'jobs',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.middleware.SlowQueryMiddleware',
+    'foodgram.middleware.ConcurrencyLimitMiddleware',
+    'foodgram.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,6 +76,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+# 'wsgi' (синхронные воркеры gunicorn) или 'asgi' (воркеры uvicorn),
+# см. gunicorn.conf.py.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные версии нагруженных GET-эндпоинтов (api/async_views.py).
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', str(SERVER_MODE == 'asgi')) == 'True'
 
 
 # Database
@@ -92,6 +108,88 @@ else:
         }
     }
 
+# Соединения с БД.
+# 'persistent' - соединение живёт между запросами (CONN_MAX_AGE) и
+#                проверяется перед повторным использованием;
+# 'pool'       - пул psycopg 3 в процессе (только Postgres), по пулу на
+#                воркер, размер - по числу потоков воркера;
+# 'none'       - новое соединение на каждый запрос.
+# Под ASGI документация Django не советует persistent, поэтому по умолчанию
+# там пул; на SQLite пула нет, и остаётся persistent.
+DB_CONN_MODE = os.getenv(
+    'DB_CONN_MODE', 'pool' if SERVER_MODE == 'asgi' else 'persistent')
+if (DB_CONN_MODE == 'pool'
+        and not DATABASES['default']['ENGINE'].endswith('postgresql')):
+    DB_CONN_MODE = 'persistent'
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 1))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+
+if DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(
+                os.getenv('DB_POOL_MAX_SIZE', GUNICORN_THREADS)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Реплики для чтения. Чтение в безопасных запросах идёт на случайную
+# реплику, запись и чтение сразу после записи - в 'default'.
+# DB_REPLICA_HOSTS=host1,host2 для Postgres или SQLITE_REPLICA=путь, чтобы
+# локально подменить реплику вторым файлом SQLite.
+DATABASE_REPLICAS = []
+if DATABASES['default']['ENGINE'].endswith('postgresql'):
+    for number, host in enumerate(
+            filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+        alias = f'replica{number + 1}'
+        DATABASES[alias] = {
+            **copy.deepcopy(DATABASES['default']),
+            'HOST': host.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+elif os.getenv('SQLITE_REPLICA'):
+    DATABASES['replica1'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'NAME': os.getenv('SQLITE_REPLICA'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica1')
+
+DATABASE_ROUTERS = ['foodgram.routers.PrimaryReplicaRouter']
+# 'cookie' или 'cache' (кэш должен быть общим для воркеров).
+REPLICA_PIN_STORE = os.getenv('REPLICA_PIN_STORE', 'cookie')
+REPLICA_PIN_COOKIE = 'use_primary'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Кэши. Без REDIS_URL у каждого воркера свой кэш в памяти.
+CACHE_LOCATION = os.getenv('REDIS_URL')
+CACHE_BACKEND = (
+    'django.core.cache.backends.redis.RedisCache' if CACHE_LOCATION
+    else 'django.core.cache.backends.locmem.LocMemCache'
+)
+AUTH_TOKEN_CACHE = 'auth'
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION or 'default',
+    },
+    # Снимки токенов нужны в общем для воркеров кэше: в кэше процесса
+    # отозванный токен продолжал бы работать в остальных воркерах.
+    AUTH_TOKEN_CACHE: {
+        'BACKEND': (CACHE_BACKEND if CACHE_LOCATION
+                    else 'django.core.cache.backends.dummy.DummyCache'),
+        'LOCATION': CACHE_LOCATION or 'auth',
+        'KEY_PREFIX': 'auth',
+        'TIMEOUT': int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60)),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -115,14 +213,28 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Сначала токен: запросы с токеном не обращаются к сессии.
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
+    # Формат ответа выбирается по Accept (или ?format=): JSON на orjson,
+    # MessagePack для мобильных клиентов, browsable API для браузера.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'PAGE_SIZE': 6,
 }
 
@@ -130,9 +242,9 @@ DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
     'SERIALIZERS': {
-        'user': 'users.serializers.UserSerializer',
-        "current_user": "users.serializers.UserSerializer",
-        "user_create": "users.serializers.UserCreateSerializer",
+        'user': 'api.serializers.UserSerializer',
+        "current_user": "api.serializers.UserSerializer",
+        "user_create": "api.serializers.UserCreateSerializer",
     },
     'PERMISSIONS': {
         'user': ['djoser.permissions.CurrentUserOrAdminOrReadOnly'],
@@ -162,3 +274,153 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Лента подписок (recipes/feed.py): авторы с большим числом подписчиков
+# подмешиваются при чтении вместо раскладки по лентам.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 1000))
+FEED_MAX_ENTRIES = int(os.getenv('FEED_MAX_ENTRIES', 1000))
+
+# Похожие рецепты (build_similar_recipes).
+SIMILAR_RECIPES_TOP_K = int(os.getenv('SIMILAR_RECIPES_TOP_K', 10))
+
+# Копии справочников тегов и ингредиентов в процессе (recipes/catalogue.py)
+# устаревают не позже, чем через CATALOGUE_TTL секунд.
+CATALOGUE_TTL = int(os.getenv('CATALOGUE_TTL', 300))
+# Незнакомый слаг тега перечитывает справочник не чаще раза в
+# CATALOGUE_MISS_INTERVAL секунд.
+CATALOGUE_MISS_INTERVAL = float(os.getenv('CATALOGUE_MISS_INTERVAL', 5))
+
+# Поиск по ингредиентам (recipes/pantry.py). Журнал изменений индекса
+# нужен всем воркерам, поэтому нужен общий кэш (REDIS_URL).
+# PANTRY_MAX_RESULTS - предел выдачи после остальных фильтров.
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', 300))
+PANTRY_MAX_RESULTS = int(os.getenv('PANTRY_MAX_RESULTS', 500))
+
+# Рейтинг «в тренде» (recipes/trending.py): период полураспада веса
+# события и веса событий. renormalize_trending - не реже раза в месяц.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 72))
+TRENDING_WEIGHTS = {
+    'favorite': 1.0,
+    'cart': 0.5,
+}
+
+# Поиск пользователей: 'prefix' (по началу слова) или 'trigram'
+# (по подстроке), см. api.filters.UserSearchFilter.
+USER_SEARCH = os.getenv('USER_SEARCH', 'prefix')
+
+# Фоновые задачи (jobs): повторы с экспоненциальной паузой, задачи
+# зависших дольше JOBS_LOCK_TIMEOUT воркеров возвращаются в очередь.
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RETRY_BACKOFF = float(os.getenv('JOBS_RETRY_BACKOFF', 10))
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', 600))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', 4))
+# Собирать ли список покупок в воркере по умолчанию; запрос может
+# выбрать сам через ?async=0|1.
+SHOPPING_CART_ASYNC = os.getenv('SHOPPING_CART_ASYNC', 'False') == 'True'
+# Выгрузки воркера (списки покупок): вне MEDIA_ROOT, скачиваются через
+# /api/jobs/<id>/download/ и удаляются через EXPORTS_TTL секунд.
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'exports'))
+EXPORTS_TTL = int(os.getenv('EXPORTS_TTL', 3600))
+
+# Сброс нагрузки (foodgram/limiter.py). limit - одновременных запросов
+# класса на процесс (None - без ограничения), queue - сколько запросов
+# может ждать места queue_timeout секунд, target_latency - порог задержки
+# для подстройки лимита, rate/burst - корзина токенов клиента (запросов
+# в секунду и запас).
+LIMITER_ENABLED = os.getenv('LIMITER_ENABLED', 'True') == 'True'
+# Адреса и подсети прокси (через запятую), которым можно верить в
+# X-Real-IP. От остальных клиентов заголовок игнорируется: иначе каждый
+# запрос с новым значением получал бы свою корзину.
+LIMITER_TRUSTED_PROXIES = [
+    proxy.strip() for proxy in
+    os.getenv('LIMITER_TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+LIMITER_EXPENSIVE_PATHS = [
+    r'^/api/recipes/download_shopping_cart/$',
+    r'^/api/users/subscriptions/$',
+]
+# Сколько запросов процесс обслуживает одновременно.
+LIMITER_CONCURRENCY = int(os.getenv('LIMITER_CONCURRENCY', GUNICORN_THREADS))
+# Страницы списков дальше этой считаются дорогими.
+LIMITER_DEEP_PAGE = int(os.getenv('LIMITER_DEEP_PAGE', 20))
+LIMITER_CLASSES = {
+    'cheap': {
+        'rate': float(os.getenv('LIMITER_CHEAP_RATE', 20)),
+        'burst': int(os.getenv('LIMITER_CHEAP_BURST', 60)),
+    },
+    'expensive': {
+        'limit': max(1, LIMITER_CONCURRENCY // 2),
+        'queue': LIMITER_CONCURRENCY,
+        'queue_timeout': 2.0,
+        'target_latency': 2.0,
+        'rate': float(os.getenv('LIMITER_EXPENSIVE_RATE', 0.5)),
+        'burst': int(os.getenv('LIMITER_EXPENSIVE_BURST', 5)),
+    },
+    'write': {
+        'limit': LIMITER_CONCURRENCY,
+        'queue': LIMITER_CONCURRENCY,
+        'queue_timeout': 1.0,
+        'target_latency': 0.5,
+        'rate': float(os.getenv('LIMITER_WRITE_RATE', 5)),
+        'burst': int(os.getenv('LIMITER_WRITE_BURST', 20)),
+    },
+}
+
+# Профилирование запросов staff-пользователей (monitoring/profiler.py):
+# хранятся последние PROFILER_MAX_PROFILES профилей.
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'True') == 'True'
+PROFILER_DIR = Path(os.getenv('PROFILER_DIR', BASE_DIR / 'profiles'))
+PROFILER_MAX_PROFILES = int(os.getenv('PROFILER_MAX_PROFILES', 200))
+# Период сэмплирования стека в режиме sample, секунды.
+PROFILER_SAMPLE_INTERVAL = float(os.getenv('PROFILER_SAMPLE_INTERVAL', 0.005))
+
+# Журнал медленных SQL-запросов (monitoring/sqllog.py): запросы дольше
+# порога и доля SLOW_QUERY_SAMPLE_RATE остальных; хранятся последние
+# SLOW_QUERY_MAX_RECORDS записей. Сводка - manage.py slow_queries.
+SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', 'True') == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', 0.001))
+SLOW_QUERY_MAX_RECORDS = int(os.getenv('SLOW_QUERY_MAX_RECORDS', 50000))
+
+# Метрики Prometheus на /metrics (monitoring/metrics.py). Для нескольких
+# воркеров gunicorn задайте PROMETHEUS_MULTIPROC_DIR. Prometheus передаёт
+# METRICS_TOKEN как Bearer-токен; без токена /metrics отвечает 404.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Прогрев воркеров (foodgram/warmup.py, gunicorn.conf.py): модули,
+# которые импортируются лениво, но нужны почти каждому воркеру.
+WARMUP_IMPORTS = [
+    'PIL.Image',
+    'PIL.JpegImagePlugin',
+    'PIL.PngImagePlugin',
+]
+# Модули, которые не должны импортироваться при старте приложения
+# (проверяет manage.py import_audit).
+BOOT_LAZY_MODULES = ['PIL', 'numpy', 'scipy', 'cProfile', 'pstats']
+
+# Начиная с такой оценки числа строк (foodgram/estimates.py) админка и
+# список рецептов не выполняют точный COUNT(*); оценка кэшируется.
+ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('ESTIMATED_COUNT_THRESHOLD', 100000))
+ESTIMATED_COUNT_CACHE_TTL = int(os.getenv('ESTIMATED_COUNT_CACHE_TTL', 30))
+
+# Поток новых рецептов из подписок (api/streams.py, только SERVER_MODE=asgi)
+# и рассылка событий между процессами (foodgram/events.py). EVENTS_MAX_STREAMS
+# - открытых потоков на воркер, EVENTS_QUEUE_SIZE - событий, ждущих отправки
+# медленному клиенту, EVENTS_HEARTBEAT - секунд между пингами.
+EVENTS_BACKEND = os.getenv(
+    'EVENTS_BACKEND',
+    'foodgram.events.MemoryBackend' if GUNICORN_WORKERS == 1
+    else 'foodgram.events.SocketBackend')
+EVENTS_SOCKET_DIR = Path(os.getenv('EVENTS_SOCKET_DIR', '/tmp/foodgram-events'))
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 1000))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', 15))
+
+# Источники служебной статистики для /api/instrumentation/.
+INSTRUMENTATION_COLLECTORS = {
+    'db_pool': 'foodgram.db.pool_stats',
+    'limiter': 'foodgram.limiter.stats',
+    'events': 'foodgram.events.stats',
+}
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.tests.utils import make_tag
+from foodgram import estimates
+from recipes.models import Tag
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+class EstimatedCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        make_tag('breakfast')
+        make_tag('dinner')
+
+    def test_small_set_counted_exactly_and_decision_cached(self):
+        with mock.patch.object(estimates, 'planner_estimate',
+                               return_value=10) as planner:
+            self.assertEqual(estimates.estimated_count(Tag.objects.all()),
+                             (2, False))
+            make_tag('lunch')
+            self.assertEqual(estimates.estimated_count(Tag.objects.all()),
+                             (3, False))
+        planner.assert_called_once()
+
+    def test_large_set_estimate_cached(self):
+        with mock.patch.object(estimates, 'planner_estimate',
+                               return_value=5000.0) as planner:
+            for _ in range(2):
+                with self.assertNumQueries(0):
+                    self.assertEqual(
+                        estimates.estimated_count(Tag.objects.all()),
+                        (5000, True))
+        planner.assert_called_once()
+
+    def test_no_planner_counts_exactly(self):
+        with mock.patch.object(estimates, 'planner_estimate',
+                               return_value=None) as planner:
+            estimates.estimated_count(Tag.objects.all())
+            estimates.estimated_count(Tag.objects.all())
+        planner.assert_called_once()
+
+    def test_key_depends_on_filters(self):
+        self.assertNotEqual(
+            estimates.count_cache_key(Tag.objects.all()),
+            estimates.count_cache_key(Tag.objects.filter(slug='dinner')))
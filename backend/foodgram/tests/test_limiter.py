@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from api.tests.utils import auth_header, make_user
+from foodgram import limiter
+from foodgram.middleware import client_address
+
+TIGHT = {
+    'cheap': {'rate': 0.001, 'burst': 2},
+    'expensive': {'rate': 0.001, 'burst': 1},
+    'write': {'rate': 0.001, 'burst': 1},
+}
+
+
+class ClientAddressTests(TestCase):
+
+    def request(self, remote, forwarded):
+        return RequestFactory().get('/', REMOTE_ADDR=remote,
+                                    HTTP_X_REAL_IP=forwarded)
+
+    @override_settings(LIMITER_TRUSTED_PROXIES=[])
+    def test_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(
+            client_address(self.request('203.0.113.5', '10.0.0.1')),
+            '203.0.113.5')
+
+    @override_settings(LIMITER_TRUSTED_PROXIES=['172.16.0.0/12'])
+    def test_header_from_trusted_proxy(self):
+        self.assertEqual(
+            client_address(self.request('172.18.0.3', '198.51.100.7')),
+            '198.51.100.7')
+        self.assertEqual(
+            client_address(self.request('203.0.113.5', '198.51.100.7')),
+            '203.0.113.5')
+
+
+@override_settings(LIMITER_ENABLED=True, LIMITER_CLASSES=TIGHT)
+class LimiterMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        limiter.limiters.cache_clear()
+        self.addCleanup(limiter.limiters.cache_clear)
+
+    def statuses(self, count, **headers):
+        return [self.client.get('/api/tags/', **headers).status_code
+                for _ in range(count)]
+
+    def test_bucket_runs_out(self):
+        self.assertEqual(self.statuses(3), [200, 200, 429])
+        response = self.client.get('/api/tags/')
+        self.assertTrue(int(response['Retry-After']) >= 1)
+
+    @override_settings(LIMITER_TRUSTED_PROXIES=[])
+    def test_spoofed_header_shares_bucket(self):
+        statuses = [
+            self.client.get('/api/tags/',
+                            HTTP_X_REAL_IP=f'10.0.0.{number}').status_code
+            for number in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    @override_settings(LIMITER_TRUSTED_PROXIES=['127.0.0.1'])
+    def test_trusted_proxy_separates_clients(self):
+        self.assertEqual(self.statuses(2, HTTP_X_REAL_IP='10.0.0.1'),
+                         [200, 200])
+        self.assertEqual(self.statuses(1, HTTP_X_REAL_IP='10.0.0.2'), [200])
+
+    def test_bogus_token_uses_address_bucket(self):
+        headers = {'HTTP_AUTHORIZATION': 'Token bogus'}
+        self.statuses(2, **headers)
+        self.assertEqual(self.statuses(1), [429])
+
+    def test_verified_user_gets_own_bucket(self):
+        headers = auth_header(make_user('cook'))
+        self.assertEqual(self.statuses(2, **headers), [200, 200])
+        self.assertEqual(self.statuses(1), [200])
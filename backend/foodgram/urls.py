@@ -3,10 +3,12 @@ from django.urls import include, path
 from django.conf.urls.static import static
 
 from foodgram import settings
+from monitoring.views import metrics_view
 from .views import docks
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('docs/', docks, name='docs'),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
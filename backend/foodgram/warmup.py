@@ -0,0 +1,91 @@
+"""Прогрев процесса до приёма запросов (хуки в gunicorn.conf.py).
+
+В режиме WARM_START приложение загружается и прогревается в мастере
+gunicorn до fork: воркеры наследуют импортированные модули, URLconf и
+справочники. Соединения с БД и кэшами мастера перед fork закрываются.
+
+Прогрев не обязателен: упавший шаг логируется и пропускается, а
+справочники и индексы загрузятся в воркере при первом обращении.
+"""
+import importlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import close_caches
+from django.db import connections
+from django.urls import get_resolver
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+
+def step(timings, name, func):
+    """Выполняет шаг прогрева; у упавшего шага в timings - None."""
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        logger.exception('Шаг прогрева %s не выполнен', name)
+        timings[name] = None
+        return
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def import_modules():
+    for name in settings.WARMUP_IMPORTS:
+        importlib.import_module(name)
+
+
+def populate_urls():
+    # URLconf импортируется при первом запросе вместе со всеми
+    # представлениями и сериализаторами; reverse_dict заполняет и
+    # таблицы для reverse().
+    get_resolver().reverse_dict
+
+
+def load_translations():
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+
+
+def load_catalogues():
+    from recipes import catalogue
+    catalogue.tags.warm()
+    catalogue.ingredients.warm()
+
+
+def build_pantry_index():
+    from recipes.pantry import index
+    index.refresh()
+
+
+def connect():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def warm(connect_databases=True):
+    """Прогревает процесс; возвращает {шаг: мс}.
+
+    connect_databases=False - для мастера: соединения всё равно будут
+    закрыты перед fork.
+    """
+    timings = {}
+    step(timings, 'imports', import_modules)
+    step(timings, 'urls', populate_urls)
+    step(timings, 'translations', load_translations)
+    step(timings, 'catalogues', load_catalogues)
+    step(timings, 'pantry', build_pantry_index)
+    if connect_databases:
+        step(timings, 'connections', connect)
+    return timings
+
+
+def close_connections():
+    """Закрывает соединения и пулы, чтобы воркеры не делили сокеты."""
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+    close_caches()
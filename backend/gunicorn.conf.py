@@ -0,0 +1,60 @@
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+
+# SERVER_MODE=asgi: uvicorn-воркеры и асинхронные GET-эндпоинты,
+# иначе - классические синхронные (или gthread) воркеры.
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# WARM_START: приложение загружается и прогревается в мастере до fork
+# (foodgram/warmup.py), воркеры сразу готовы к запросам. Без него каждый
+# воркер прогревается сам, но тоже до приёма первого запроса.
+preload_app = os.getenv('WARM_START', 'True') == 'True'
+
+
+# Ошибка прогрева не должна останавливать мастер или воркер: то, что не
+# успело загрузиться, воркеры загрузят сами при первых запросах.
+def when_ready(server):
+    if preload_app:
+        from foodgram.warmup import close_connections, warm
+        try:
+            server.log.info('Прогрев мастера, мс: %s',
+                            warm(connect_databases=False))
+        except Exception:
+            server.log.exception('Прогрев мастера не удался')
+        finally:
+            close_connections()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from foodgram.warmup import warm
+        try:
+            worker.log.info('Прогрев воркера, мс: %s', warm())
+        except Exception:
+            worker.log.exception('Прогрев воркера не удался')
+
+
+# Метрики Prometheus из нескольких воркеров: каталог очищается при старте
+# мастера, файлы завершившихся воркеров помечаются как «мёртвые».
+METRICS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        for name in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+
+def child_exit(server, worker):
+    if METRICS_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at',
+                    'locked_by', 'finished_at']
+    list_filter = ['status', 'name']
+    raw_id_fields = ['user']
+
+
+admin.site.register(Job, JobAdmin)
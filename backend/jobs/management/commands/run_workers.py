@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+
+
+def run_threads(threads, poll_interval, burst):
+    """Запускает threads воркеров в текущем процессе до SIGTERM/SIGINT."""
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    workers = [
+        threading.Thread(target=work,
+                         args=(f'{prefix}:{number}', stop, poll_interval,
+                               burst))
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    # join с таймаутом, чтобы главный поток успевал обрабатывать сигналы.
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(timeout=0.5)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Число процессов')
+        parser.add_argument('--threads', type=int,
+                            default=settings.JOBS_WORKER_THREADS,
+                            help='Потоков-воркеров в каждом процессе')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL,
+                            help='Пауза при пустой очереди, с')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        args = (options['threads'], options['poll_interval'],
+                options['burst'])
+        if options['processes'] <= 1:
+            run_threads(*args)
+            return
+        # Соединения с БД не должны наследоваться дочерними процессами.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run_threads, args=args)
+                     for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                process.terminate()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
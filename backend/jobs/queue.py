@@ -0,0 +1,152 @@
+"""Очередь фоновых задач в БД без внешнего брокера.
+
+Задача объявляется декоратором task в модуле tasks.py приложения и ставится
+в очередь через enqueue. Воркеры (manage.py run_workers) забирают задачи
+через SELECT ... FOR UPDATE SKIP LOCKED, а на SQLite, где блокировок строк
+нет, - условным UPDATE по статусу.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Предельная пауза воркера после ошибок очереди подряд, секунды.
+MAX_ERROR_BACKOFF = 60
+
+# Имя задачи -> (функция, максимум попыток).
+registry = {}
+
+
+def task(name, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Функция получает payload задачи именованными аргументами и возвращает
+    результат, который можно сохранить в JSON.
+    """
+    def decorator(func):
+        registry[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def jobs():
+    """Менеджер Job на основной БД: очередь не читается с реплик."""
+    return Job.objects.using(router.db_for_write(Job))
+
+
+def enqueue(name, user=None, delay=0, **payload):
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    _, max_attempts = registry[name]
+    return jobs().create(
+        name=name,
+        payload=payload,
+        user=user,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(worker, limit=1):
+    """Забирает до limit готовых к запуску задач для воркера worker."""
+    now = timezone.now()
+    ready = (jobs().filter(status=Job.QUEUED, run_at__lte=now)
+             .order_by('run_at', 'id'))
+    taken = dict(status=Job.RUNNING, locked_by=worker, locked_at=now,
+                 attempts=F('attempts') + 1)
+    db = router.db_for_write(Job)
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            claimed = list(ready.select_for_update(skip_locked=True)[:limit])
+            jobs().filter(pk__in=[job.pk for job in claimed]).update(**taken)
+    else:
+        # Задачу получает тот, чей UPDATE первым сменил статус.
+        claimed = [
+            job for job in ready[:limit]
+            if jobs().filter(pk=job.pk, status=Job.QUEUED).update(**taken)
+        ]
+    for job in claimed:
+        job.status, job.locked_by, job.locked_at = Job.RUNNING, worker, now
+        job.attempts += 1
+    return claimed
+
+
+def backoff(attempts):
+    return timedelta(
+        seconds=settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def finish(job, **fields):
+    """Сохраняет итог задачи, если её ещё не забрал другой воркер."""
+    return jobs().filter(pk=job.pk, locked_by=job.locked_by).update(
+        locked_by='', locked_at=None, **fields)
+
+
+def execute(job):
+    func, _ = registry.get(job.name, (None, None))
+    try:
+        if func is None:
+            raise KeyError(f'Неизвестная задача: {job.name}')
+        result = func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            logger.warning('Задача %s упала, повтор: %s', job, error)
+            finish(job, status=Job.QUEUED, error=error,
+                   run_at=timezone.now() + backoff(job.attempts))
+        else:
+            logger.error('Задача %s упала: %s', job, error)
+            finish(job, status=Job.FAILED, error=error,
+                   finished_at=timezone.now())
+        return False
+    finish(job, status=Job.DONE, result=result, error='',
+           finished_at=timezone.now())
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, которые перестали отвечать."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = jobs().filter(status=Job.RUNNING, locked_at__lt=deadline)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_at=None,
+        error='Превышено время выполнения', finished_at=timezone.now())
+    return stale.update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def work(worker, stop, poll_interval, burst=False):
+    """Цикл воркера: до stop.set() или, при burst, до пустой очереди.
+
+    Ошибка БД (обрыв соединения, переключение primary, «database is
+    locked») не завершает поток: соединения закрываются, и после паузы,
+    растущей с каждой ошибкой подряд, цикл продолжается.
+    """
+    failures = 0
+    while not stop.is_set():
+        try:
+            close_old_connections()
+            claimed = claim(worker)
+            if not claimed:
+                requeue_stale()
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in claimed:
+                execute(job)
+        except Exception:
+            failures += 1
+            logger.exception('Воркер %s: ошибка очереди', worker)
+            connections.close_all()
+            stop.wait(min(poll_interval * 2 ** failures, MAX_ERROR_BACKOFF))
+        else:
+            failures = 0
+    connections.close_all()
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+
+def echo(**payload):
+    return payload
+
+
+def broken(**payload):
+    raise ValueError('сломалось')
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_BACKOFF=10,
+                   JOBS_LOCK_TIMEOUT=60)
+class QueueTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(queue.registry, {
+            'tests.echo': (echo, None), 'tests.broken': (broken, None)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(KeyError):
+            queue.enqueue('tests.missing')
+
+    def test_claim_in_run_at_order(self):
+        later = queue.enqueue('tests.echo', delay=3600)
+        first = queue.enqueue('tests.echo', value=1)
+        second = queue.enqueue('tests.echo', value=2)
+        claimed = queue.claim('worker-a', limit=5)
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claimed[0].locked_by, 'worker-a')
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+    def test_job_claimed_once(self):
+        queue.enqueue('tests.echo')
+        self.assertEqual(len(queue.claim('worker-a')), 1)
+        self.assertEqual(queue.claim('worker-b'), [])
+
+    def test_skip_locked_path(self):
+        job = queue.enqueue('tests.echo')
+        features = connection.features
+        with mock.patch.object(features, 'has_select_for_update_skip_locked',
+                               True, create=True):
+            claimed = queue.claim('worker-a')
+            self.assertEqual(queue.claim('worker-b'), [])
+        self.assertEqual([job.pk for job in claimed], [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts),
+                         (Job.RUNNING, 'worker-a', 1))
+
+    def test_execute_done(self):
+        queue.enqueue('tests.echo', value=1)
+        job, = queue.claim('worker-a')
+        self.assertTrue(queue.execute(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.locked_by),
+                         (Job.DONE, {'value': 1}, ''))
+
+    def test_execute_retries_then_fails(self):
+        queue.enqueue('tests.broken')
+        job, = queue.claim('worker-a')
+        before = timezone.now()
+        self.assertFalse(queue.execute(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job, = queue.claim('worker-a')
+        self.assertFalse(queue.execute(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('сломалось', job.error)
+
+    def test_finish_ignores_job_taken_by_other_worker(self):
+        queue.enqueue('tests.echo')
+        job, = queue.claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_by='worker-b')
+        self.assertEqual(queue.finish(job, status=Job.DONE), 0)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.RUNNING)
+
+    def test_requeue_stale(self):
+        queue.enqueue('tests.echo')
+        queue.enqueue('tests.echo')
+        retry, exhausted = queue.claim('worker-a', limit=2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        Job.objects.filter(pk=exhausted.pk).update(attempts=2)
+        self.assertEqual(queue.requeue_stale(), 1)
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual((retry.status, retry.locked_by), (Job.QUEUED, ''))
+        self.assertEqual(exhausted.status, Job.FAILED)
+
+    def test_fresh_running_job_not_requeued(self):
+        queue.enqueue('tests.echo')
+        queue.claim('worker-a')
+        self.assertEqual(queue.requeue_stale(), 0)
@@ -0,0 +1,98 @@
+from collections import Counter
+
+from django.contrib import admin
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import profiler
+from .models import Profile, QueryRecord
+
+
+def collapsed_response(stacks, file_name):
+    response = HttpResponse(
+        ''.join(f'{stack} {count}\n' for stack, count in stacks.items()),
+        content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ['id', 'method', 'path', 'status_code', 'duration_ms',
+                    'mode', 'user', 'created_at', 'downloads']
+    list_filter = ['mode', 'method']
+    search_fields = ['path']
+    raw_id_fields = ['user']
+    readonly_fields = ['method', 'path', 'user', 'mode', 'status_code',
+                       'duration_ms', 'created_at', 'downloads', 'report']
+    exclude = ['file_name']
+    actions = ['download_merged']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/',
+                 self.admin_site.admin_view(self.download),
+                 name='monitoring_profile_download'),
+        ] + super().get_urls()
+
+    @admin.display(description='Файлы')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">исходный</a> / <a href="{}">свёрнутые стеки</a>',
+            reverse('admin:monitoring_profile_download',
+                    args=(obj.pk, 'raw')),
+            reverse('admin:monitoring_profile_download',
+                    args=(obj.pk, 'collapsed')))
+
+    @admin.display(description='Отчёт')
+    def report(self, obj):
+        try:
+            text = profiler.report(obj)
+        except OSError:
+            text = 'Файл профиля не найден.'
+        return format_html('<pre>{}</pre>', text)
+
+    def download(self, request, pk, kind):
+        profile = get_object_or_404(Profile, pk=pk)
+        if kind == 'collapsed':
+            return collapsed_response(profiler.collapsed(profile),
+                                      f'profile-{pk}.folded')
+        return FileResponse(open(profile.file_path, 'rb'),
+                            as_attachment=True,
+                            filename=f'profile-{pk}.{profile.mode}')
+
+    @admin.action(description='Скачать суммарные свёрнутые стеки')
+    def download_merged(self, request, queryset):
+        stacks = Counter()
+        profiles = list(queryset)
+        for profile in profiles:
+            # cProfile - микросекунды, сэмплы - штуки: не смешиваем.
+            if profile.mode == profiles[0].mode:
+                stacks.update(profiler.collapsed(profile))
+        return collapsed_response(stacks, 'profiles.folded')
+
+
+admin.site.register(Profile, ProfileAdmin)
+
+
+class QueryRecordAdmin(admin.ModelAdmin):
+    list_display = ['id', 'duration_ms', 'sampled', 'view', 'call_site',
+                    'fingerprint_hash', 'created_at']
+    list_filter = ['sampled', 'alias']
+    search_fields = ['fingerprint_hash', 'view', 'call_site']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(QueryRecord, QueryRecordAdmin)
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from monitoring.models import QueryRecord
+from monitoring.sqllog import aggregate
+
+SORT_KEYS = {
+    'total': 'total_ms',
+    'count': 'count',
+    'p95': 'p95_ms',
+    'max': 'max_ms',
+}
+
+
+class Command(BaseCommand):
+    help = 'Выводит самые тяжёлые отпечатки SQL из журнала запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total')
+        parser.add_argument('--since', type=float,
+                            help='Только записи за последние N часов')
+        parser.add_argument('--view', help='Только записи представления '
+                                           '(например, "GET recipes-list")')
+        parser.add_argument('--clear', action='store_true',
+                            help='Очистить журнал после вывода')
+
+    def handle(self, *args, **options):
+        records = QueryRecord.objects.all()
+        if options['since']:
+            records = records.filter(created_at__gte=timezone.now()
+                                     - timedelta(hours=options['since']))
+        if options['view']:
+            records = records.filter(view=options['view'])
+        key = SORT_KEYS[options['sort']]
+        summary = sorted(aggregate(records), key=lambda item: item[key],
+                         reverse=True)[:options['top']]
+        for number, item in enumerate(summary, start=1):
+            self.stdout.write(self.style.SQL_KEYWORD(
+                f'#{number}  всего {item["total_ms"]:.1f} мс, '
+                f'запросов ~{item["count"]:.0f} (медленных {item["slow"]}), '
+                f'p50 {item["p50_ms"]:.1f} / p95 {item["p95_ms"]:.1f} / '
+                f'p99 {item["p99_ms"]:.1f} / max {item["max_ms"]:.1f} мс'))
+            self.stdout.write(f'    {item["fingerprint"]}')
+            for call_site in item['call_sites'][:3]:
+                self.stdout.write(f'    место вызова: {call_site or "-"}')
+            for view in item['views'][:3]:
+                self.stdout.write(f'    представление: {view or "-"}')
+        if options['clear']:
+            QueryRecord.objects.all().delete()
+        if not summary:
+            self.stdout.write('Журнал пуст.')
@@ -0,0 +1,90 @@
+"""Метрики Prometheus (эндпоинт /metrics).
+
+Под gunicorn с несколькими воркерами задайте PROMETHEUS_MULTIPROC_DIR:
+каждый процесс пишет значения в свои файлы в этом каталоге, а /metrics
+суммирует их (см. gunicorn.conf.py). Без переменной метрики хранятся
+в памяти процесса.
+"""
+import contextvars
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Длительность обработки запроса',
+    ['method', 'route'])
+RESPONSES = Counter(
+    'foodgram_http_responses_total',
+    'Ответы по маршрутам и статусам',
+    ['method', 'route', 'status'])
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total', 'SQL-запросы', ['alias'])
+DB_QUERY_LATENCY = Histogram(
+    'foodgram_db_query_duration_seconds', 'Длительность SQL-запроса',
+    ['alias'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1, 2.5))
+DB_QUERIES_PER_REQUEST = Histogram(
+    'foodgram_db_queries_per_request', 'SQL-запросов на один запрос',
+    ['route'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total', 'Обращения к кэшам',
+    ['cache', 'result'])
+IMAGE_PROCESSING = Histogram(
+    'foodgram_image_processing_seconds',
+    'Декодирование и проверка загруженного изображения', ['field'])
+IMAGE_SIZE = Histogram(
+    'foodgram_image_upload_bytes', 'Размер загруженного изображения',
+    ['field'], buckets=SIZE_BUCKETS)
+SHOPPING_LIST_SIZE = Histogram(
+    'foodgram_shopping_list_bytes', 'Размер выгруженного списка покупок',
+    buckets=SIZE_BUCKETS)
+
+# Счётчик SQL-запросов текущего HTTP-запроса (MetricsMiddleware).
+request_queries = contextvars.ContextVar('metrics_queries', default=None)
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.view_name or match.route
+
+
+def query_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        alias = context['connection'].alias
+        DB_QUERIES.labels(alias).inc()
+        DB_QUERY_LATENCY.labels(alias).observe(time.perf_counter() - started)
+        counter = request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def install(connection):
+    # Вызывается на каждый connection_created того же объекта соединения.
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def exposition():
+    """(тело, content type) для /metrics."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,186 @@
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import APIException
+
+from api.authentication import CachedTokenAuthentication
+from . import metrics, sqllog
+from .models import Profile
+from .profiler import RequestProfiler
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+
+
+def requested_mode(request):
+    """Режим профилирования из запроса или None (обычный запрос)."""
+    value = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+    if not value:
+        return None
+    return Profile.SAMPLE if value == Profile.SAMPLE else Profile.CPROFILE
+
+
+def staff_user(request):
+    """Staff-пользователь запроса (сессия или токен) или None."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = (CachedTokenAuthentication().authenticate(request)
+                       or (None, None))
+        except APIException:
+            return None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос staff-пользователя с X-Profile или ?_profile.
+
+    Остальные запросы проходят без накладных расходов: только проверка
+    заголовка и параметра. Ссылка на профиль - в заголовке X-Profile-Id.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        user = mode and staff_user(request)
+        if not user:
+            return self.get_response(request)
+        profiler = RequestProfiler(mode)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        profile = profiler.save(request, response, user,
+                                time.perf_counter() - started)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    async def __acall__(self, request):
+        mode = requested_mode(request)
+        user = mode and await sync_to_async(staff_user)(request)
+        if not user:
+            return await self.get_response(request)
+        # В async-режиме в профиль попадают и другие задачи цикла событий,
+        # выполнявшиеся одновременно с запросом.
+        profiler = RequestProfiler(mode)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        profile = await sync_to_async(profiler.save)(
+            request, response, user, time.perf_counter() - started)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+class MetricsMiddleware:
+    """Длительность, статусы и число SQL-запросов по маршрутам."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = [0]
+        token = metrics.request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started,
+                     queries[0])
+        return response
+
+    async def __acall__(self, request):
+        queries = [0]
+        token = metrics.request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started,
+                     queries[0])
+        return response
+
+    @staticmethod
+    def observe(request, response, duration, queries):
+        route = metrics.route(request)
+        metrics.REQUEST_LATENCY.labels(request.method, route).observe(
+            duration)
+        metrics.RESPONSES.labels(request.method, route,
+                                 response.status_code).inc()
+        metrics.DB_QUERIES_PER_REQUEST.labels(route).observe(queries)
+
+
+class SlowQueryMiddleware:
+    """Привязывает записи журнала SQL к представлению и сохраняет их
+    одним запросом после ответа (см. monitoring/sqllog.py).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = [request.path, []]
+        token = sqllog.request_state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            sqllog.request_state.reset(token)
+            sqllog.flush(state[1])
+
+    async def __acall__(self, request):
+        state = [request.path, []]
+        token = sqllog.request_state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            sqllog.request_state.reset(token)
+            if state[1]:
+                await sync_to_async(sqllog.flush)(state[1])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = sqllog.request_state.get()
+        if state is not None:
+            match = request.resolver_match
+            state[0] = (f'{request.method} '
+                        f'{match.view_name or match._func_path}')
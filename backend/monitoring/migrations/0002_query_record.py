@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint_hash', models.CharField(db_index=True, max_length=16, verbose_name='Хэш отпечатка')),
+                ('fingerprint', models.TextField(verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('sampled', models.BooleanField(default=False, help_text='Быстрый запрос, записанный для статистики', verbose_name='Из выборки')),
+                ('alias', models.CharField(max_length=50, verbose_name='БД')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('call_site', models.CharField(blank=True, max_length=300, verbose_name='Место вызова')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'SQL-запрос',
+                'verbose_name_plural': 'Журнал SQL-запросов',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import models
+
+from users.models import User
+
+
+class Profile(models.Model):
+    """Профиль одного запроса; данные - в файле в PROFILER_DIR."""
+
+    CPROFILE = 'cprofile'
+    SAMPLE = 'sample'
+    MODE_CHOICES = [
+        (CPROFILE, 'cProfile'),
+        (SAMPLE, 'Сэмплирование'),
+    ]
+
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=2000, verbose_name='Путь')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES,
+                            verbose_name='Режим')
+    status_code = models.PositiveSmallIntegerField(verbose_name='Статус')
+    duration_ms = models.FloatField(verbose_name='Длительность, мс')
+    file_name = models.CharField(max_length=100, verbose_name='Файл')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
+
+    @property
+    def file_path(self):
+        return settings.PROFILER_DIR / self.file_name
+
+
+class QueryRecord(models.Model):
+    """Медленный (или попавший в выборку) SQL-запрос."""
+
+    fingerprint_hash = models.CharField(max_length=16, db_index=True,
+                                        verbose_name='Хэш отпечатка')
+    fingerprint = models.TextField(verbose_name='Отпечаток')
+    sql = models.TextField(verbose_name='SQL')
+    duration_ms = models.FloatField(verbose_name='Длительность, мс')
+    sampled = models.BooleanField(
+        default=False, verbose_name='Из выборки',
+        help_text='Быстрый запрос, записанный для статистики')
+    alias = models.CharField(max_length=50, verbose_name='БД')
+    view = models.CharField(max_length=200, blank=True,
+                            verbose_name='Представление')
+    call_site = models.CharField(max_length=300, blank=True,
+                                 verbose_name='Место вызова')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True,
+                                      verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'SQL-запрос'
+        verbose_name_plural = 'Журнал SQL-запросов'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f'{self.duration_ms:.1f} мс: {self.fingerprint[:80]}'
@@ -0,0 +1,242 @@
+"""Профилирование отдельного запроса по запросу staff-пользователя.
+
+Запрос с заголовком X-Profile или параметром ?_profile (значение -
+cprofile или sample) проходит весь стек Django под профилировщиком.
+Результат сохраняется в PROFILER_DIR (не больше PROFILER_MAX_PROFILES
+последних) и смотрится в админке. Для флейм-графа оба режима дают
+свёрнутые стеки («a;b;c 42» - формат flamegraph.pl и speedscope).
+"""
+import marshal
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+from .models import Profile
+
+# Ограничение глубины разворота графа вызовов cProfile в стеки.
+MAX_DEPTH = 128
+
+
+def frame_name(code):
+    return (f'{getattr(code, "co_qualname", code.co_name)} '
+            f'({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+
+
+class Sampler:
+    """Сэмплирующий профилировщик потока: стек раз в interval секунд."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class RequestProfiler:
+
+    def __init__(self, mode):
+        self.mode = mode
+        if mode == Profile.SAMPLE:
+            self.profiler = Sampler(threading.get_ident(),
+                                    settings.PROFILER_SAMPLE_INTERVAL)
+        else:
+            # Импорт здесь: профилировщик нужен редко, а модуль загружается
+            # при старте каждого воркера (см. команду import_audit).
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        if self.mode == Profile.SAMPLE:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.mode == Profile.SAMPLE:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def save(self, request, response, user, duration):
+        directory = settings.PROFILER_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        file_name = f'{uuid.uuid4().hex}.{self.mode}'
+        if self.mode == Profile.SAMPLE:
+            (directory / file_name).write_text(
+                ''.join(f'{stack} {count}\n'
+                        for stack, count in self.profiler.stacks.items()))
+        else:
+            self.profiler.dump_stats(directory / file_name)
+        profile = Profile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            user=user,
+            mode=self.mode,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            file_name=file_name,
+        )
+        trim()
+        return profile
+
+
+def trim():
+    """Удаляет профили сверх PROFILER_MAX_PROFILES (файлы - сигналом)."""
+    stale = Profile.objects.order_by('-id')[settings.PROFILER_MAX_PROFILES:]
+    for profile in stale:
+        profile.delete()
+
+
+def collapsed(profile):
+    """Counter свёрнутых стеков профиля (для cProfile - в микросекундах)."""
+    if profile.mode == Profile.SAMPLE:
+        stacks = Counter()
+        for line in profile.file_path.read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            stacks[stack] += int(count)
+        return stacks
+    with open(profile.file_path, 'rb') as file:
+        return cprofile_stacks(marshal.load(file))
+
+
+def cprofile_stacks(stats):
+    """Разворачивает граф вызовов cProfile в свёрнутые стеки.
+
+    cProfile хранит только пары вызывающий-вызываемый, поэтому собственное
+    время функции делится между путями пропорционально времени вызовов
+    по каждому ребру - обычное приближение для флейм-графа из pstats.
+    """
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((function, cumulative))
+    stacks = Counter()
+
+    def name(function):
+        file_name, line, function_name = function
+        return f'{function_name} ({os.path.basename(file_name)}:{line})'
+
+    def walk(function, path, share, seen, depth):
+        _, _, own, cumulative, _ = stats[function]
+        # Ветви короче микросекунды во флейм-графе не видны.
+        if cumulative * share < 1e-6:
+            return
+        path = path + [name(function)]
+        if own * share >= 1e-6:
+            stacks[';'.join(path)] += round(own * share * 1e6)
+        if depth >= MAX_DEPTH:
+            return
+        for callee, edge in callees.get(function, ()):
+            if callee not in seen and callee in stats:
+                walk(callee, path, share * edge / (stats[callee][3] or 1),
+                     seen | {callee}, depth + 1)
+
+    for function in root_functions(stats, callees):
+        walk(function, [], 1.0, {function}, 0)
+    return stacks
+
+
+def root_functions(stats, callees):
+    """Корни графа вызовов: по одной функции из каждой компоненты сильной
+    связности, в которую не входят рёбра извне.
+
+    Кадры, открытые до включения профилировщика, вызывающими не
+    записываются, и верх стека запроса часто оказывается циклом
+    (middleware -> inner -> middleware); корнем цикла берётся функция
+    с наибольшим суммарным временем.
+    """
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    for start in stats:
+        if start in index:
+            continue
+        work = [(start, iter(callees.get(start, ())))]
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            function, edges = work[-1]
+            for callee, _ in edges:
+                if callee not in stats:
+                    continue
+                if callee not in index:
+                    index[callee] = low[callee] = len(index)
+                    stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(callees.get(callee, ()))))
+                    break
+                if callee in on_stack:
+                    low[function] = min(low[function], index[callee])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[function])
+                if low[function] == index[function]:
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component[member] = function
+                        if member == function:
+                            break
+    entered = {component[callee]
+               for function, edges in callees.items() if function in stats
+               for callee, _ in edges
+               if callee in stats
+               and component[callee] != component[function]}
+    roots = {}
+    for function, key in component.items():
+        if key not in entered and (
+                key not in roots
+                or stats[function][3] > stats[roots[key]][3]):
+            roots[key] = function
+    return roots.values()
+
+
+def report(profile, limit=40):
+    """Текстовая сводка для админки."""
+    if profile.mode == Profile.SAMPLE:
+        stacks = collapsed(profile)
+        total = sum(stacks.values()) or 1
+        own = Counter()
+        for stack, count in stacks.items():
+            own[stack.rsplit(';', 1)[-1]] += count
+        return '\n'.join(
+            f'{count * 100 / total:6.1f}%  {function}'
+            for function, count in own.most_common(limit))
+    import pstats
+    output = _Output()
+    stats = pstats.Stats(str(profile.file_path), stream=output)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+class _Output(list):
+
+    def write(self, text):
+        self.append(text)
+
+    def getvalue(self):
+        return ''.join(self)
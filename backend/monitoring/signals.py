@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import metrics, sqllog
+from .models import Profile
+
+
+@receiver(post_delete, sender=Profile)
+def delete_profile_file(sender, instance, **kwargs):
+    instance.file_path.unlink(missing_ok=True)
+
+
+@receiver(connection_created)
+def install_query_log(sender, connection, **kwargs):
+    sqllog.install(connection)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    if settings.METRICS_ENABLED:
+        metrics.install(connection)
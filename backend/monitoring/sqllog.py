@@ -0,0 +1,222 @@
+"""Журнал медленных SQL-запросов с нормализованными отпечатками.
+
+Каждый запрос дольше SLOW_QUERY_THRESHOLD_MS и доля SLOW_QUERY_SAMPLE_RATE
+остальных записываются в QueryRecord вместе с представлением и местом
+вызова в коде проекта. Записи копятся в памяти и сохраняются одним
+bulk_create в конце запроса (SlowQueryMiddleware), вне запросов - пачками.
+Сводку по отпечаткам строит aggregate() (команда slow_queries).
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import QuerySet
+from django.db.models.manager import BaseManager
+
+from .models import QueryRecord
+
+logger = logging.getLogger(__name__)
+
+# Сохранять записи вне запросов (команды, воркеры) пачками такого размера.
+FLUSH_SIZE = 100
+# Таблица журнала подрезается раз в столько новых записей.
+TRIM_EVERY = 1000
+
+# Состояние текущего запроса: [представление, записи].
+request_state = contextvars.ContextVar('slow_query_state', default=None)
+local = threading.local()
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.I)
+PLACEHOLDERS = re.compile(r'%s|\?|%\(\w+\)s')
+IN_LISTS = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+VALUES_LISTS = re.compile(r'\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*',
+                          re.I)
+OR_CHAINS = re.compile(r'([\w."]+ = \?)(?: OR \1)+')
+SPACES = re.compile(r'\s+')
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+# Местом вызова считается только код приложений: не manage.py,
+# не middleware проекта и не сам журнал.
+SKIPPED_DIRS = tuple(os.path.join(PROJECT_DIR, name) + os.sep
+                     for name in ('monitoring', 'foodgram'))
+
+
+def fingerprint(sql):
+    """SQL без литералов: значения -> ?, списки IN, VALUES и цепочки
+    одинаковых условий через OR свёрнуты.
+    """
+    sql = STRINGS.sub('?', sql)
+    sql = PLACEHOLDERS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    sql = VALUES_LISTS.sub('VALUES (...)', sql)
+    sql = OR_CHAINS.sub(r'\1 OR ...', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint_hash(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def project_file(file_name):
+    return (file_name.startswith(PROJECT_DIR)
+            and 'site-packages' not in file_name
+            and not file_name.startswith(SKIPPED_DIRS)
+            and os.sep in file_name[len(PROJECT_DIR):])
+
+
+def call_site():
+    """Ближайший к запросу кадр кода приложений: 'api/views.py:42 in f'.
+
+    Если queryset вычислен целиком в коде DRF/Django (list() вьюсета,
+    сериализатор), возвращается ближайший метод класса проекта (кроме
+    собственных QuerySet и менеджеров):
+    'RecipeViewSet.paginate_queryset (rest_framework/generics.py:171)'.
+    """
+    frame = sys._getframe(1)
+    fallback = ''
+    while frame is not None:
+        code = frame.f_code
+        if project_file(code.co_filename):
+            return (f'{code.co_filename[len(PROJECT_DIR):]}:'
+                    f'{frame.f_lineno} in {code.co_name}')
+        owner = frame.f_locals.get('self') if not fallback else None
+        if isinstance(owner, (QuerySet, BaseManager)):
+            owner = None
+        module = sys.modules.get(type(owner).__module__)
+        if owner is not None and project_file(
+                getattr(module, '__file__', None) or ''):
+            path = code.co_filename.rsplit('site-packages' + os.sep, 1)[-1]
+            fallback = (f'{type(owner).__name__}.{code.co_name} '
+                        f'({path}:{frame.f_lineno})')
+        frame = frame.f_back
+    return fallback
+
+
+def wrapper(execute, sql, params, many, context):
+    if getattr(local, 'flushing', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        slow = duration >= settings.SLOW_QUERY_THRESHOLD_MS
+        if slow or random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+            record(sql, duration, not slow, context['connection'].alias)
+
+
+def record(sql, duration, sampled, alias):
+    state = request_state.get()
+    text = fingerprint(sql)
+    entry = QueryRecord(
+        fingerprint_hash=fingerprint_hash(text),
+        fingerprint=text,
+        sql=sql,
+        duration_ms=duration,
+        sampled=sampled,
+        alias=alias,
+        view=state[0][:200] if state else '',
+        call_site=call_site()[:300],
+    )
+    if state:
+        state[1].append(entry)
+        return
+    pending = local.__dict__.setdefault('pending', [])
+    pending.append(entry)
+    using = router.db_for_write(QueryRecord)
+    if (len(pending) >= FLUSH_SIZE
+            and not connections[using].in_atomic_block):
+        local.pending = []
+        flush(pending)
+
+
+def install(connection):
+    """Подключает журнал к соединению (на каждый connection_created).
+
+    Django переиспользует объект соединения при переподключении, так что
+    обёртка уже может стоять.
+    """
+    if (settings.SLOW_QUERY_LOG_ENABLED
+            and wrapper not in connection.execute_wrappers):
+        connection.execute_wrappers.append(wrapper)
+
+
+def flush(entries):
+    """Сохраняет записи; запросы самого журнала не записываются.
+
+    Ошибка записи журнала только логируется: из-за неё не должен
+    пропасть уже готовый ответ или упасть команда.
+    """
+    if not entries:
+        return
+    local.flushing = True
+    try:
+        created = QueryRecord.objects.bulk_create(entries)
+        last = created[-1].pk
+        if last and (last - len(created)) // TRIM_EVERY != last // TRIM_EVERY:
+            QueryRecord.objects.filter(
+                pk__lte=last - settings.SLOW_QUERY_MAX_RECORDS).delete()
+    except Exception:
+        logger.exception('Не удалось сохранить журнал SQL-запросов')
+    finally:
+        local.flushing = False
+
+
+def percentile(durations, weights, share):
+    """Взвешенный перцентиль отсортированных durations."""
+    border = sum(weights) * share
+    total = 0
+    for duration, weight in zip(durations, weights):
+        total += weight
+        if total >= border:
+            return duration
+    return durations[-1] if durations else 0
+
+
+def aggregate(records):
+    """Сводка по отпечаткам из записей QueryRecord.
+
+    Сэмплированные быстрые запросы весят 1 / SLOW_QUERY_SAMPLE_RATE, так
+    что количество и суммарное время - оценка по всем запросам.
+    """
+    rate = settings.SLOW_QUERY_SAMPLE_RATE
+    groups = defaultdict(list)
+    for entry in records.values_list('fingerprint_hash', 'fingerprint',
+                                     'duration_ms', 'sampled', 'view',
+                                     'call_site').iterator():
+        groups[entry[0]].append(entry)
+    summary = []
+    for entries in groups.values():
+        entries.sort(key=lambda entry: entry[2])
+        durations = [entry[2] for entry in entries]
+        weights = [1 / rate if entry[3] and rate else 1
+                   for entry in entries]
+        sites, views = defaultdict(float), defaultdict(float)
+        for entry, weight in zip(entries, weights):
+            sites[entry[5]] += weight
+            views[entry[4]] += weight
+        summary.append({
+            'fingerprint': entries[0][1],
+            'count': sum(weights),
+            'slow': sum(1 for entry in entries if not entry[3]),
+            'total_ms': sum(duration * weight for duration, weight
+                            in zip(durations, weights)),
+            'p50_ms': percentile(durations, weights, 0.5),
+            'p95_ms': percentile(durations, weights, 0.95),
+            'p99_ms': percentile(durations, weights, 0.99),
+            'max_ms': durations[-1],
+            'call_sites': sorted(sites, key=sites.get, reverse=True),
+            'views': sorted(views, key=views.get, reverse=True),
+        })
+    return summary
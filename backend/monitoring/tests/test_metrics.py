@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from monitoring import metrics
+from monitoring.models import QueryRecord
+from .test_sqllog import reconnect
+
+
+def queries():
+    return REGISTRY.get_sample_value('foodgram_db_queries_total',
+                                     {'alias': 'default'}) or 0
+
+
+@override_settings(METRICS_ENABLED=True)
+class QueryMetricsTests(TestCase):
+
+    def test_reconnect_counts_each_query_once(self):
+        for _ in range(5):
+            reconnect()
+        self.assertEqual(
+            connection.execute_wrappers.count(metrics.query_wrapper), 1)
+        before = queries()
+        QueryRecord.objects.exists()
+        self.assertEqual(queries() - before, 1)
+
+
+class MetricsViewTests(TestCase):
+
+    def setUp(self):
+        # Корзины ограничителя живут в общем кэше всего прогона.
+        cache.clear()
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_hidden_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(
+            self.client.get('/metrics',
+                            HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            403)
+        response = self.client.get('/metrics',
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'foodgram_db_queries_total', response.content)
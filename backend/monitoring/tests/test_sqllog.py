@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+
+from monitoring import sqllog
+from monitoring.models import QueryRecord
+
+
+def reconnect():
+    """Как DatabaseWrapper.connect(): тот же объект, новый сигнал."""
+    connection_created.send(sender=type(connection), connection=connection)
+
+
+@override_settings(SLOW_QUERY_LOG_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0)
+class InstallTests(TestCase):
+
+    def test_wrapper_installed_once(self):
+        for _ in range(5):
+            reconnect()
+        self.assertEqual(connection.execute_wrappers.count(sqllog.wrapper),
+                         1)
+
+    def test_query_recorded_once(self):
+        for _ in range(3):
+            reconnect()
+        state = ['test', []]
+        token = sqllog.request_state.set(state)
+        try:
+            QueryRecord.objects.exists()
+        finally:
+            sqllog.request_state.reset(token)
+        self.assertEqual(len(state[1]), 1)
+
+
+class FlushTests(TestCase):
+
+    def test_flush_failure_is_logged(self):
+        entry = QueryRecord(fingerprint='SELECT ?', sql='SELECT 1',
+                            duration_ms=1, alias='default')
+        with mock.patch.object(QueryRecord.objects, 'bulk_create',
+                               side_effect=DatabaseError('gone')), \
+                self.assertLogs('monitoring.sqllog', 'ERROR'):
+            sqllog.flush([entry])
@@ -0,0 +1,22 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+from .metrics import exposition
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus.
+
+    Нужен заголовок Authorization: Bearer <METRICS_TOKEN>. Без
+    METRICS_TOKEN адреса нет.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    body, content_type = exposition()
+    return HttpResponse(body, content_type=content_type)
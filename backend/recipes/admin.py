@@ -1,22 +1,50 @@
 from django.contrib import admin
+
+from foodgram.estimates import EstimatedCountPaginator
 from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    search_fields = ['title', 'author__username']
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка большой таблицы: без COUNT(*) и сортировка по индексу.
+
+    Поиск по началу строки ('^') использует индексы из миграций
+    users.0002 и recipes.0010.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-id']
+
+
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ['name', 'author', 'cooking_time', 'favorites_count',
+                    'created_at']
+    list_select_related = ['author']
+    search_fields = ['^name', '^author__username']
     list_filter = ['tags']
+    raw_id_fields = ['author']
+    readonly_fields = ['favorites_count']
+    exclude = ['tags_mask', 'trending_score']
+    ordering = ['name', 'id']
 
 
 class IngredientAdmin(admin.ModelAdmin):
-    search_fields = ['name']
+    list_display = ['name', 'measurement_unit']
+    search_fields = ['^name']
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
-    search_fields = ['user__username', 'recipe__title']
+class ShoppingCartAdmin(LargeTableAdmin):
+    list_display = ['user', 'recipe', 'created_at']
+    list_select_related = ['user', 'recipe']
+    search_fields = ['^user__username', '^recipe__name']
+    raw_id_fields = ['user', 'recipe']
 
 
-class FavoritesAdmin(admin.ModelAdmin):
-    search_fields = ['user__username', 'recipe__title']
+class FavoritesAdmin(LargeTableAdmin):
+    list_display = ['user', 'recipe', 'created_at']
+    list_select_related = ['user', 'recipe']
+    search_fields = ['^user__username', '^recipe__name']
+    raw_id_fields = ['user', 'recipe']
 
 
 admin.site.register(Favorite, FavoritesAdmin)
@@ -0,0 +1,105 @@
+"""Кэш справочников (теги, ингредиенты) в памяти процесса.
+
+Объекты загружаются по мере надобности одним in_bulk на все промахи;
+запрос id, которого нет в копии, всегда идёт в БД. Любое изменение тега
+или ингредиента увеличивает версию в кэше (см. recipes/signals.py), и при
+следующем обращении копии сбрасываются. Без общего кэша версию видит
+только свой процесс, поэтому копия ещё и устаревает через CATALOGUE_TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from monitoring.metrics import cache_result
+from .models import Ingredient, Tag
+
+VERSION_KEY = 'catalogue:version'
+
+
+class Catalogue:
+
+    def __init__(self, model, preload=False):
+        self.model = model
+        # Маленькие справочники выгоднее загрузить целиком за раз.
+        self.preload = preload
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.complete = False
+        self.version = None
+        self.loaded_at = 0
+        self.reloaded_at = 0
+
+    def load(self, ids=None):
+        """Сбрасывает устаревшую копию и загружает недостающие объекты.
+
+        Возвращает True, если понадобился запрос к БД.
+        """
+        version = cache.get(VERSION_KEY, 0)
+        expired = time.monotonic() - self.loaded_at > settings.CATALOGUE_TTL
+        if version != self.version or expired:
+            self.objects = {}
+            self.complete = False
+            self.version = version
+            self.loaded_at = time.monotonic()
+        if ids is None:
+            if self.complete:
+                return False
+            self.objects = self.model.objects.in_bulk()
+            self.complete = True
+            return True
+        # Промах бывает и у полной копии: объект создан другим процессом.
+        missing = set(ids) - self.objects.keys()
+        if not missing:
+            return False
+        if self.preload:
+            self.objects = self.model.objects.in_bulk()
+            self.complete = True
+        else:
+            self.objects.update(self.model.objects.in_bulk(missing))
+        return True
+
+    def resolve(self, ids):
+        """{id: объект} для существующих id; не больше одного запроса."""
+        with self.lock:
+            cache_result(f'catalogue_{self.model._meta.model_name}',
+                         not self.load(ids))
+            objects = self.objects
+        return {pk: objects[pk] for pk in ids if pk in objects}
+
+    def all(self, reload=False):
+        """Весь справочник {id: объект} (для справочников с preload).
+
+        reload=True перечитывает его из БД, но не чаще, чем раз в
+        CATALOGUE_MISS_INTERVAL секунд: несуществующие значения из
+        запросов не должны читать БД на каждый запрос.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if reload and now - self.reloaded_at > (
+                    settings.CATALOGUE_MISS_INTERVAL):
+                self.reloaded_at = now
+                self.complete = False
+            self.load()
+            return dict(self.objects)
+
+    def warm(self):
+        """Загружает справочник целиком (прогрев воркера)."""
+        with self.lock:
+            self.version = cache.get(VERSION_KEY, 0)
+            self.loaded_at = time.monotonic()
+            self.objects = self.model.objects.in_bulk()
+            self.complete = True
+
+
+def invalidate():
+    if not cache.add(VERSION_KEY, 1, timeout=None):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, timeout=None)
+
+
+tags = Catalogue(Tag, preload=True)
+ingredients = Catalogue(Ingredient)
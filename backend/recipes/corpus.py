@@ -0,0 +1,77 @@
+"""Формат выгрузки корпуса рецептов (export_corpus / import_corpus).
+
+NDJSON: одна строка - один объект
+{"model": ..., "id": ..., "fields": {...}, "files": {...}}. Разделы идут
+в порядке SECTIONS, так что на момент загрузки строки все объекты, на
+которые она ссылается, уже загружены. files (по флагу --images) содержит
+содержимое файлов изображений в base64.
+"""
+import datetime
+import gzip
+import sys
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import FileField
+
+# Модель -> (естественный ключ для сопоставления с существующими
+# объектами при --remap, {поле внешнего ключа: модель}).
+SECTIONS = {
+    'users.user': (('email',), {}),
+    'recipes.tag': (('name',), {}),
+    'recipes.ingredient': (('name', 'measurement_unit'), {}),
+    'recipes.recipe': (None, {'author_id': 'users.user'}),
+    'recipes.recipe_tags': (None, {'recipe_id': 'recipes.recipe',
+                                   'tag_id': 'recipes.tag'}),
+    'recipes.recipeingredient': (
+        None, {'recipe_id': 'recipes.recipe',
+               'ingredient_id': 'recipes.ingredient'}),
+}
+
+
+def get_model(label):
+    return apps.get_model(label)
+
+
+# Производные поля: не выгружаются, а пересчитываются после загрузки.
+DERIVED = {
+    'users.user': {'followers_count'},
+    'recipes.tag': {'bit'},
+    'recipes.recipe': {'tags_mask', 'favorites_count', 'trending_score'},
+}
+
+
+class CorpusEncoder(DjangoJSONEncoder):
+    """Время - с микросекундами: DjangoJSONEncoder обрезает его до
+    миллисекунд, и порядок по created_at после загрузки менялся бы."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def concrete_fields(model):
+    """Поля строки без первичного ключа (он пишется отдельно в id)."""
+    derived = DERIVED.get(model._meta.label_lower, set())
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in derived]
+
+
+def file_fields(model):
+    return [field for field in concrete_fields(model)
+            if isinstance(field, FileField)]
+
+
+@contextmanager
+def open_corpus(path, mode):
+    """Файл корпуса: '-' - stdin/stdout, *.gz читается и пишется сжатым."""
+    if path == '-':
+        yield sys.stdout if mode == 'w' else sys.stdin
+    elif path.endswith('.gz'):
+        with gzip.open(path, mode + 't', encoding='utf-8') as file:
+            yield file
+    else:
+        with open(path, mode, encoding='utf-8') as file:
+            yield file
@@ -0,0 +1,196 @@
+"""Лента «рецепты авторов, на которых я подписан».
+
+Гибридная схема: новый рецепт раскладывается по лентам подписчиков
+(FeedEntry) при создании, кроме авторов с числом подписчиков больше
+FEED_FANOUT_MAX_FOLLOWERS - их рецепты подмешиваются при чтении. Число
+подписчиков хранится в User.followers_count; когда автор опускается до
+порога, его рецепты раскладываются по лентам подписчиков фоновой задачей.
+
+Открытые потоки подписчиков (api/streams.py) узнают о новых и
+изменённых рецептах из событий темы автора (foodgram/events.py).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from foodgram import events
+from jobs.queue import enqueue
+from users.models import Subscription, User
+from .models import FeedEntry, Recipe
+
+BATCH_SIZE = 1000
+
+
+def is_celebrity(author_id):
+    """Рецепты автора подмешиваются при чтении, а не раскладываются."""
+    return User.objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS).exists()
+
+
+def follower_ids(author_id):
+    """Подписчики автора или None, если автор слишком популярен.
+
+    Популярность определяется по User.followers_count, как и в
+    celebrity_ids: иначе рецепт автора на пороге не попал бы ни в ленты,
+    ни в подмешивание при чтении.
+    """
+    if is_celebrity(author_id):
+        return None
+    return list(Subscription.objects.filter(following_id=author_id)
+                .values_list('follower_id', flat=True))
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    followers = follower_ids(recipe.author_id)
+    if not followers:
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(follower_id=follower_id, recipe_id=recipe.pk,
+                   author_id=recipe.author_id)
+         for follower_id in followers],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def author_topic(author_id):
+    return f'author:{author_id}'
+
+
+def follower_topic(follower_id):
+    return f'follower:{follower_id}'
+
+
+def notify(recipe, created):
+    """Сообщает потокам подписчиков о рецепте после фиксации транзакции."""
+    event = {'type': 'recipe_created' if created else 'recipe_updated',
+             'recipe': recipe.pk, 'author': recipe.author_id,
+             'name': recipe.name}
+    transaction.on_commit(
+        lambda: events.publish(author_topic(recipe.author_id), event))
+
+
+def notify_subscription(follower_id, author_id, subscribed):
+    """Сообщает потокам подписчика, что набор авторов изменился."""
+    event = {'type': 'subscribed' if subscribed else 'unsubscribed',
+             'author': author_id}
+    transaction.on_commit(
+        lambda: events.publish(follower_topic(follower_id), event))
+
+
+def backfill(follower_id, author_id):
+    """Переносит последние рецепты автора в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return
+    recipe_ids = (
+        Recipe.objects.filter(author_id=author_id)
+        .order_by('-id')
+        .values_list('id', flat=True)[:settings.FEED_MAX_ENTRIES]
+    )
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(follower_id=follower_id, recipe_id=recipe_id,
+                   author_id=author_id)
+         for recipe_id in recipe_ids],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def drop(follower_id, author_id):
+    """Убирает рецепты автора из ленты отписавшегося."""
+    FeedEntry.objects.filter(follower_id=follower_id,
+                             author_id=author_id).delete()
+
+
+def trim(follower_id, keep=None):
+    """Оставляет в ленте только keep последних записей."""
+    keep = keep or settings.FEED_MAX_ENTRIES
+    cutoff = (
+        FeedEntry.objects.filter(follower_id=follower_id)
+        .order_by('-recipe_id')
+        .values_list('recipe_id', flat=True)[keep:keep + 1]
+    )
+    cutoff = list(cutoff)
+    if not cutoff:
+        return 0
+    deleted, _ = FeedEntry.objects.filter(
+        follower_id=follower_id, recipe_id__lte=cutoff[0]).delete()
+    return deleted
+
+
+def celebrity_ids(follower_id):
+    """Авторы из подписок, рецепты которых не раскладываются по лентам."""
+    return list(
+        Subscription.objects.filter(
+            follower_id=follower_id,
+            following__followers_count__gt=(
+                settings.FEED_FANOUT_MAX_FOLLOWERS))
+        .order_by()
+        .values_list('following_id', flat=True)
+    )
+
+
+def add_follower(author_id):
+    User.objects.filter(pk=author_id).update(
+        followers_count=F('followers_count') + 1)
+
+
+def remove_follower(author_id):
+    """Уменьшает счётчик подписчиков автора.
+
+    Если автор опустился до порога, рецепты, опубликованные, пока он был
+    популярным, раскладываются по лентам подписчиков (backfill_author).
+    """
+    User.objects.filter(pk=author_id, followers_count__gt=0).update(
+        followers_count=F('followers_count') - 1)
+    if User.objects.filter(
+            pk=author_id,
+            followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS).exists():
+        transaction.on_commit(lambda: enqueue(
+            'recipes.backfill_author_feed', author_id=author_id))
+
+
+def backfill_author(author_id):
+    """Переносит последние рецепты автора в ленты всех его подписчиков."""
+    followers = follower_ids(author_id)
+    if not followers:
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=author_id)
+        .order_by('-id')
+        .values_list('id', flat=True)[:settings.FEED_MAX_ENTRIES]
+    )
+    for follower_id in followers:
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(follower_id=follower_id, recipe_id=recipe_id,
+                       author_id=author_id)
+             for recipe_id in recipe_ids],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def read(follower_id, before=None, limit=10):
+    """id рецептов ленты по убыванию, строго меньше before (keyset).
+
+    Записи ленты читаются одним диапазоном по индексу (follower, recipe),
+    рецепты популярных авторов - по индексу (author, -id).
+    """
+    entries = FeedEntry.objects.filter(follower_id=follower_id)
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+    recipe_ids = list(
+        entries.order_by('-recipe_id')
+        .values_list('recipe_id', flat=True)[:limit]
+    )
+    authors = celebrity_ids(follower_id)
+    if authors:
+        recipes = Recipe.objects.filter(author_id__in=authors)
+        if before is not None:
+            recipes = recipes.filter(id__lt=before)
+        recipe_ids += recipes.order_by('-id').values_list(
+            'id', flat=True)[:limit]
+        recipe_ids = sorted(set(recipe_ids), reverse=True)[:limit]
+    return recipe_ids
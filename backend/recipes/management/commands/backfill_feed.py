@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes import feed
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписчиков последними рецептами авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='*',
+                            help='id подписчиков (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        subscriptions = Subscription.objects.order_by('id')
+        if options['user']:
+            subscriptions = subscriptions.filter(
+                follower_id__in=options['user'])
+        total = 0
+        for follower_id, author_id in subscriptions.values_list(
+                'follower_id', 'following_id').iterator():
+            feed.backfill(follower_id, author_id)
+            total += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано подписок: {total}'))
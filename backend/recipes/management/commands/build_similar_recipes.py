@@ -0,0 +1,269 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from scipy import sparse
+
+from recipes.models import (Recipe, RecipeIngredient, SimilarRecipe,
+                            SimilarRecipeRefresh)
+
+# Вес совпадения тега относительно совпадения ингредиента (для cosine).
+TAG_WEIGHT = 0.5
+# Отметок очереди в одном DELETE.
+DEQUEUE_BATCH_SIZE = 500
+
+# Матрица признаков в процессе-воркере, задаётся в init_worker.
+_matrix = None
+_sizes = None
+_metric = None
+
+
+def init_worker(matrix, sizes, metric):
+    global _matrix, _sizes, _metric
+    _matrix, _sizes, _metric = matrix, sizes, metric
+
+
+def scores(rows):
+    """Сходство рецептов rows со всеми рецептами матрицы.
+
+    Блок остаётся разреженным: в нём только пары с общими признаками, а
+    не len(rows) x число рецептов.
+    """
+    product = (_matrix[rows] @ _matrix.T).tocsr()
+    row_of = np.repeat(np.asarray(rows, dtype=np.int64),
+                       np.diff(product.indptr))
+    if _metric == 'jaccard':
+        union = _sizes[row_of] + _sizes[product.indices] - product.data
+        product.data = np.divide(product.data, union,
+                                 out=np.zeros_like(product.data),
+                                 where=union > 0)
+    # Рецепт не сосед сам себе.
+    product.data[product.indices == row_of] = 0
+    product.eliminate_zeros()
+    return product
+
+
+def rank(pair):
+    """Ключ сортировки (сосед, оценка): по убыванию оценки, затем по id."""
+    return -pair[1], pair[0]
+
+
+def top_k(task):
+    """Топ-K соседей для блока строк: [(строка, индексы, оценки)]."""
+    rows, k = task
+    block = scores(rows)
+    result = []
+    for position, row in enumerate(rows):
+        start, end = block.indptr[position], block.indptr[position + 1]
+        columns, values = block.indices[start:end], block.data[start:end]
+        if len(values) > k > 0:
+            # Все равные k-й оценке: из них берутся меньшие id, как и при
+            # слиянии в update.
+            kth = np.partition(values, len(values) - k)[len(values) - k]
+            columns, values = columns[values >= kth], values[values >= kth]
+        order = np.lexsort((columns, -values))[:max(k, 0)]
+        result.append((row, columns[order].tolist(),
+                       values[order].tolist()))
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Рассчитывает похожие рецепты по векторам ингредиентов и тегов '
+            'и сохраняет топ-K соседей каждого рецепта')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int,
+                            default=settings.SIMILAR_RECIPES_TOP_K)
+        parser.add_argument('--metric', choices=('cosine', 'jaccard'),
+                            default='cosine')
+        parser.add_argument('--block-size', type=int, default=512,
+                            help='Строк матрицы на одну задачу')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Размер пула процессов')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Пересчитать только изменённые рецепты '
+                                 'и тех, чьи списки они затрагивают')
+
+    def build_matrix(self, metric, recipe_ids=None):
+        """Матрица признаков всех рецептов или только recipe_ids."""
+        recipes = Recipe.objects.order_by('id')
+        ingredients = RecipeIngredient.objects.all()
+        tags = Recipe.tags.through.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+            tags = tags.filter(recipe_id__in=recipe_ids)
+        recipe_ids = np.fromiter(
+            recipes.values_list('id', flat=True).iterator(), dtype=np.int64)
+        index = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        rows, columns, weights = [], [], []
+        features = {}
+        pairs = [
+            (ingredients.values_list('recipe_id', 'ingredient_id'), 1.0),
+            (tags.values_list('recipe_id', 'tag_id'), TAG_WEIGHT),
+        ]
+        for number, (queryset, weight) in enumerate(pairs):
+            for recipe_id, feature in queryset.iterator(chunk_size=10000):
+                rows.append(index[recipe_id])
+                columns.append(features.setdefault((number, feature),
+                                                   len(features)))
+                weights.append(1.0 if metric == 'jaccard' else weight)
+        matrix = sparse.csr_matrix(
+            (np.array(weights, dtype=np.float32), (rows, columns)),
+            shape=(len(recipe_ids), max(len(features), 1)))
+        matrix.sum_duplicates()
+        sizes = np.asarray(matrix.getnnz(axis=1), dtype=np.float32)
+        if metric == 'cosine':
+            norms = np.sqrt(np.asarray(
+                matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            matrix = sparse.diags(1 / norms) @ matrix
+            matrix = matrix.tocsr()
+        return recipe_ids, index, matrix, sizes
+
+    @staticmethod
+    def neighbours(recipe_ids):
+        """Рецепты с общим ингредиентом или тегом с одним из recipe_ids:
+        сходство с остальными равно нулю.
+        """
+        through = Recipe.tags.through
+        shared = set(recipe_ids)
+        shared.update(RecipeIngredient.objects.filter(
+            ingredient_id__in=RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values('ingredient_id'),
+        ).values_list('recipe_id', flat=True).distinct())
+        shared.update(through.objects.filter(
+            tag_id__in=through.objects.filter(
+                recipe_id__in=recipe_ids).values('tag_id'),
+        ).values_list('recipe_id', flat=True).distinct())
+        return shared
+
+    @staticmethod
+    def save(results):
+        """Заменяет списки соседей: [(рецепт, [соседи], [оценки])]."""
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=[recipe_id for recipe_id, _, _ in results]
+            ).delete()
+            SimilarRecipe.objects.bulk_create(
+                [SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                               score=score, rank=rank)
+                 for recipe_id, similar_ids, values in results
+                 for rank, (similar_id, score) in enumerate(
+                     zip(similar_ids, values), start=1)],
+                batch_size=1000,
+            )
+
+    @staticmethod
+    def by_id(recipe_ids, results):
+        """Строки и столбцы результата top_k - в id рецептов."""
+        return [(int(recipe_ids[row]),
+                 [int(recipe_ids[column]) for column in columns], values)
+                for row, columns, values in results]
+
+    def rebuild(self, options):
+        """Полный расчёт по всем рецептам, блоками по block_size строк."""
+        recipe_ids, _, matrix, sizes = self.build_matrix(options['metric'])
+        init_worker(matrix, sizes, options['metric'])
+        block_size = options['block_size']
+        tasks = [(list(range(start, min(start + block_size,
+                                        len(recipe_ids)))),
+                  options['top_k'])
+                 for start in range(0, len(recipe_ids), block_size)]
+        if options['processes'] > 1:
+            with ProcessPoolExecutor(
+                    max_workers=options['processes'],
+                    initializer=init_worker,
+                    initargs=(matrix, sizes, options['metric'])) as pool:
+                for results in pool.map(top_k, tasks):
+                    self.save(self.by_id(recipe_ids, results))
+        else:
+            for results in map(top_k, tasks):
+                self.save(self.by_id(recipe_ids, results))
+        return len(recipe_ids)
+
+    def update(self, queued, options):
+        """Пересчёт только затронутых изменёнными рецептами queued.
+
+        Матрица строится по рецептам, у которых есть общие признаки с
+        пересчитываемыми. Списки изменённых рецептов и списки, где они
+        уже были, считаются заново целиком. Остальным соседям изменённых
+        достаточно слить свой список с новыми оценками: прочие пары не
+        изменились.
+        """
+        k = options['top_k']
+        queued = set(Recipe.objects.filter(id__in=queued)
+                     .values_list('id', flat=True))
+        if not queued:
+            return 0
+        recompute = queued | set(
+            SimilarRecipe.objects.filter(similar_id__in=queued)
+            .values_list('recipe_id', flat=True))
+        recipe_ids, index, matrix, sizes = self.build_matrix(
+            options['metric'], self.neighbours(recompute))
+        init_worker(matrix, sizes, options['metric'])
+        rows = sorted(index[recipe_id] for recipe_id in recompute
+                      if recipe_id in index)
+        block_size = options['block_size']
+        for start in range(0, len(rows), block_size):
+            self.save(self.by_id(
+                recipe_ids, top_k((rows[start:start + block_size], k))))
+
+        new_pairs = {}
+        queued = sorted(queued)
+        block = scores([index[recipe_id] for recipe_id in queued])
+        for position, recipe_id in enumerate(queued):
+            start, end = block.indptr[position], block.indptr[position + 1]
+            for column, score in zip(block.indices[start:end],
+                                     block.data[start:end]):
+                other = int(recipe_ids[column])
+                if other not in recompute:
+                    new_pairs.setdefault(other, []).append(
+                        (recipe_id, float(score)))
+        current = {}
+        for recipe_id, similar_id, score in (
+                SimilarRecipe.objects.filter(recipe_id__in=new_pairs)
+                .values_list('recipe_id', 'similar_id', 'score')):
+            current.setdefault(recipe_id, []).append((similar_id, score))
+        merged = []
+        for recipe_id, pairs in new_pairs.items():
+            listed = current.get(recipe_id, [])
+            if len(listed) >= k:
+                worst = rank(max(listed, key=rank))
+                pairs = [pair for pair in pairs if rank(pair) < worst]
+            if not pairs:
+                continue
+            best = sorted(listed + pairs, key=rank)[:k]
+            merged.append((recipe_id, [pair[0] for pair in best],
+                           [pair[1] for pair in best]))
+        self.save(merged)
+        return len(rows) + len(merged)
+
+    @staticmethod
+    def dequeue(marks):
+        """Снимает с очереди прочитанные отметки [(рецепт, время)].
+
+        Рецепт, отмеченный заново во время расчёта, остаётся в очереди:
+        его изменение могло не попасть в матрицу.
+        """
+        for start in range(0, len(marks), DEQUEUE_BATCH_SIZE):
+            condition = Q()
+            for recipe_id, marked_at in marks[
+                    start:start + DEQUEUE_BATCH_SIZE]:
+                condition |= Q(recipe_id=recipe_id, marked_at=marked_at)
+            SimilarRecipeRefresh.objects.filter(condition).delete()
+
+    def handle(self, *args, **options):
+        marks = list(SimilarRecipeRefresh.objects.values_list(
+            'recipe_id', 'marked_at'))
+        if options['incremental']:
+            total = self.update([recipe_id for recipe_id, _ in marks],
+                                options)
+        else:
+            total = self.rebuild(options)
+        self.dequeue(marks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {total}'))
@@ -0,0 +1,47 @@
+from base64 import b64encode
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.corpus import (SECTIONS, CorpusEncoder, concrete_fields,
+                            file_fields, get_model, open_corpus)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, теги, ингредиенты и рецепты в NDJSON '
+            'потоком, не загружая таблицы в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл (*.gz - со сжатием) или -')
+        parser.add_argument('--images', action='store_true',
+                            help='Включить файлы изображений в выгрузку')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Строк, читаемых из БД за раз')
+
+    def encode_files(self, model, row):
+        files = {}
+        for field in file_fields(model):
+            name = row[field.attname]
+            if name and default_storage.exists(name):
+                with default_storage.open(name, 'rb') as file:
+                    files[field.attname] = b64encode(file.read()).decode()
+        return files
+
+    def handle(self, *args, **options):
+        encoder = CorpusEncoder(ensure_ascii=False)
+        total = 0
+        with open_corpus(options['path'], 'w') as output:
+            for label in SECTIONS:
+                model = get_model(label)
+                attnames = [field.attname for field in concrete_fields(model)]
+                rows = (model.objects.order_by('pk')
+                        .values('pk', *attnames)
+                        .iterator(chunk_size=options['chunk_size']))
+                for row in rows:
+                    record = {'model': label, 'id': row.pop('pk'),
+                              'fields': row}
+                    if options['images'] and file_fields(model):
+                        record['files'] = self.encode_files(model, row)
+                    output.write(encoder.encode(record) + '\n')
+                    total += 1
+        self.stderr.write(self.style.SUCCESS(f'Выгружено объектов: {total}'))
@@ -0,0 +1,192 @@
+import json
+import os
+from base64 import b64decode
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from recipes import catalogue, pantry, tagmask
+from recipes.corpus import (SECTIONS, concrete_fields, file_fields,
+                            get_model, open_corpus)
+
+# Модели, на которые ссылаются другие разделы: только для них при --remap
+# хранится соответствие старых и новых id.
+REFERENCED = {label for _, references in SECTIONS.values()
+              for label in references.values()}
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_corpus пачками bulk_create. '
+            'После прерывания продолжает с последней сохранённой пачки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл (*.gz - со сжатием) или -')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--remap', action='store_true',
+                            help='Не сохранять id: выдать новые, а теги, '
+                                 'ингредиенты и пользователей сопоставить '
+                                 'с существующими по естественному ключу')
+        parser.add_argument('--checkpoint',
+                            help='Файл прогресса (по умолчанию <path>'
+                                 '.checkpoint)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать заново, игнорируя файл прогресса')
+
+    def load_checkpoint(self):
+        if self.restart or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint, encoding='utf-8') as file:
+            state = json.load(file)
+        self.maps = {
+            label: {int(old): new for old, new in mapping.items()}
+            for label, mapping in state['maps'].items()
+        }
+        return state['line']
+
+    def save_checkpoint(self, line):
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'line': line, 'maps': self.maps}, file)
+        os.replace(temporary, self.checkpoint)
+
+    def build(self, model, references, record):
+        obj = model(pk=record['id'])
+        for field in concrete_fields(model):
+            value = record['fields'].get(field.attname)
+            if field.attname in references and self.remap:
+                try:
+                    value = self.maps[references[field.attname]][value]
+                except KeyError:
+                    raise CommandError(
+                        f'{record["model"]} #{record["id"]}: нет объекта '
+                        f'{references[field.attname]} #{value}')
+            setattr(obj, field.attname, field.to_python(value))
+        return obj
+
+    def match(self, model, natural_key, objects):
+        """{естественный ключ: pk} уже существующих объектов."""
+        first = natural_key[0]
+        existing = model.objects.filter(**{
+            f'{first}__in': {getattr(obj, first) for obj in objects}
+        }).values_list('pk', *natural_key)
+        return {tuple(key): pk for pk, *key in existing}
+
+    @staticmethod
+    def restore_auto_now(model, objects, values):
+        """Возвращает выгруженные значения полей auto_now_add.
+
+        bulk_create заменяет их временем загрузки (pre_save), а по ним
+        работают сортировка ?ordering=newest, курсоры и тренды.
+        """
+        if not values or not objects:
+            return
+        for obj in objects:
+            for name, value in values[id(obj)].items():
+                setattr(obj, name, value)
+        model.objects.bulk_update(objects, list(values[id(objects[0])]),
+                                  batch_size=len(objects))
+
+    def insert(self, label, objects):
+        model = get_model(label)
+        auto_now = [field.attname for field in concrete_fields(model)
+                    if getattr(field, 'auto_now_add', False)]
+        # По id(obj): при --remap у новых объектов ещё нет pk.
+        values = {id(obj): {name: getattr(obj, name) for name in auto_now}
+                  for obj in objects} if auto_now else {}
+        if not self.remap:
+            # Повтор пачки после сбоя не должен падать на дубликатах.
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+            self.restore_auto_now(model, objects, values)
+            return
+        natural_key, _ = SECTIONS[label]
+        old_ids = [obj.pk for obj in objects]
+        existing = self.match(model, natural_key, objects) if natural_key \
+            else {}
+        new = []
+        for obj in objects:
+            key = tuple(getattr(obj, name) for name in natural_key or ())
+            obj.pk = existing.get(key) if natural_key else None
+            if obj.pk is None:
+                new.append(obj)
+        model.objects.bulk_create(new)
+        self.restore_auto_now(model, new, values)
+        if label in REFERENCED:
+            self.maps.setdefault(label, {}).update(
+                zip(old_ids, (obj.pk for obj in objects)))
+
+    def save_files(self, model, objects, records):
+        for obj, record in zip(objects, records):
+            for field in file_fields(model):
+                data = record.get('files', {}).get(field.attname)
+                name = getattr(obj, field.attname).name
+                if data and name and not default_storage.exists(name):
+                    default_storage.save(name, ContentFile(b64decode(data)))
+
+    def flush(self, label, records, line):
+        if not records:
+            return
+        model = get_model(label)
+        _, references = SECTIONS[label]
+        with transaction.atomic():
+            objects = [self.build(model, references, record)
+                       for record in records]
+            self.save_files(model, objects, records)
+            self.insert(label, objects)
+        self.save_checkpoint(line)
+        self.loaded += len(records)
+
+    def handle(self, *args, **options):
+        self.remap = options['remap']
+        self.restart = options['restart']
+        self.checkpoint = (options['checkpoint']
+                           or options['path'] + '.checkpoint')
+        self.maps = {}
+        self.loaded = 0
+        batch_size = options['batch_size']
+        done = self.load_checkpoint()
+        if done:
+            self.stderr.write(f'Продолжаю со строки {done + 1}')
+
+        # Как loaddata: проверки внешних ключей - один раз в конце.
+        with connection.constraint_checks_disabled():
+            label, records, line = None, [], done
+            with open_corpus(options['path'], 'r') as lines:
+                for number, text in enumerate(lines, start=1):
+                    if number <= done or not text.strip():
+                        continue
+                    try:
+                        record = json.loads(text)
+                    except ValueError as error:
+                        raise CommandError(f'Строка {number}: {error}')
+                    if record['model'] not in SECTIONS:
+                        raise CommandError(
+                            f'Строка {number}: неизвестная модель '
+                            f'{record["model"]}')
+                    if record['model'] != label or len(records) >= batch_size:
+                        self.flush(label, records, line)
+                        label, records = record['model'], []
+                    records.append(record)
+                    line = number
+                self.flush(label, records, line)
+        models = [get_model(label) for label in SECTIONS]
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in models])
+
+        if not self.remap:
+            # id загружены как есть: сдвигаем последовательности.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(),
+                                                             models):
+                    cursor.execute(sql)
+        tagmask.rebuild()
+        catalogue.invalidate()
+        pantry.invalidate()
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено объектов: {self.loaded}. Ленты подписок и похожие '
+            f'рецепты пересчитываются командами backfill_feed и '
+            f'build_similar_recipes.'))
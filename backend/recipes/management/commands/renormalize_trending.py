@@ -0,0 +1,35 @@
+import math
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes import trending
+from recipes.models import Recipe, TrendingEpoch
+
+
+class Command(BaseCommand):
+    help = ('Сдвигает точку отсчёта рейтинга «в тренде» на текущий момент, '
+            'чтобы рейтинги не переполнились. Запускать периодически')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать рейтинги с нуля по избранному '
+                                 'и спискам покупок')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        epoch, _ = TrendingEpoch.objects.select_for_update().get_or_create(
+            pk=1, defaults={'landmark': time.time()})
+        now = time.time()
+        if options['rebuild']:
+            total = trending.rebuild(now)
+        else:
+            factor = math.exp(-trending.rate() * (now - epoch.landmark))
+            total = Recipe.objects.filter(trending_score__gt=0).update(
+                trending_score=F('trending_score') * factor)
+        epoch.landmark = now
+        epoch.save(update_fields=['landmark'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рейтингов: {total}'))
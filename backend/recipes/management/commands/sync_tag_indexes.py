@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.models import Tag
+
+PREFIX = 'recipe_tag_bit_'
+
+
+class Command(BaseCommand):
+    help = ('Создаёт на Postgres частичный индекс для каждого бита маски '
+            'тегов и удаляет индексы освободившихся битов')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Частичные индексы нужны только на Postgres')
+            return
+        bits = set(Tag.objects.exclude(bit=None).values_list(
+            'bit', flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE tablename = 'recipes_recipe' AND indexname LIKE %s",
+                [PREFIX + '%'])
+            existing = {int(name[len(PREFIX):].split('_')[0])
+                        for name, in cursor.fetchall()}
+            for bit in sorted(bits - existing):
+                # Условие в той же форме, что строит tagmask.has_any.
+                cursor.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+                    f'{PREFIX}{bit}_idx ON recipes_recipe (name, id) '
+                    f'WHERE (tags_mask & {1 << bit}) > 0')
+            for bit in sorted(existing - bits):
+                cursor.execute(
+                    f'DROP INDEX CONCURRENTLY IF EXISTS {PREFIX}{bit}_idx')
+        self.stdout.write(self.style.SUCCESS(
+            f'Индексов создано: {len(bits - existing)}, '
+            f'удалено: {len(existing - bits)}'))
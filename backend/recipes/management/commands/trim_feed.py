@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from recipes import feed
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписчиков до последних N записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int,
+                            default=settings.FEED_MAX_ENTRIES,
+                            help='Сколько записей оставить в каждой ленте')
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        followers = (
+            FeedEntry.objects.values('follower_id')
+            .annotate(total=Count('id'))
+            .filter(total__gt=keep)
+            .values_list('follower_id', flat=True)
+        )
+        deleted = sum(feed.trim(follower_id, keep)
+                      for follower_id in followers.iterator())
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено записей ленты: {deleted}'))
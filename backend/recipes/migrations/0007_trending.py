@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:27
+
+import time
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_epoch(apps, schema_editor):
+    TrendingEpoch = apps.get_model('recipes', 'TrendingEpoch')
+    TrendingEpoch.objects.create(pk=1, landmark=time.time())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('landmark', models.FloatField(verbose_name='Точка отсчёта (unix-время)')),
+            ],
+            options={
+                'verbose_name': 'Точка отсчёта рейтинга',
+                'verbose_name_plural': 'Точка отсчёта рейтинга',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг популярности'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:31
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAG_BITS = 63
+
+
+def fill_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for bit, tag in enumerate(Tag.objects.order_by('id')[:TAG_BITS]):
+        tag.bit = bit
+        tag.save(update_fields=['bit'])
+    masks = defaultdict(int)
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+            tag__bit__isnull=False).values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, tags_mask=mask)
+         for recipe_id, mask in masks.items()],
+        ['tags_mask'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Бит в маске тегов'),
+        ),
+        migrations.RunPython(fill_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Поиск по началу названия в админке ('^name') сравнивает
+# UPPER(name::text) с шаблоном LIKE - нужен btree с text_pattern_ops.
+INDEXES = [
+    ('recipe_name_prefix_idx',
+     'recipes_recipe (UPPER(name::text) text_pattern_ops)'),
+    ('ingredient_name_prefix_idx',
+     'recipes_ingredient (UPPER(name::text) text_pattern_ops)'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0009_tags_mask'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
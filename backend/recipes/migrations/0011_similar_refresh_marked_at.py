@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='similarreciperefresh',
+            name='marked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Отмечен'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backdate_carts(apps, schema_editor):
+    """Покупкам, сделанным до 0007_trending, досталось время самой
+    миграции, и рейтинг считал бы их свежими. Точное время неизвестно,
+    поэтому берётся нижняя граница - дата регистрации пользователя: так
+    и вклад, и его вычитание при удалении остаются согласованными.
+    """
+    applied = (MigrationRecorder(schema_editor.connection).migration_qs
+               .filter(app='recipes', name='0007_trending')
+               .values_list('applied', flat=True).first())
+    if applied is None:
+        return
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    apps.get_model('recipes', 'ShoppingCart').objects.filter(
+        created_at__lte=applied,
+    ).update(created_at=Subquery(
+        User.objects.filter(pk=OuterRef('user_id')).values('date_joined')))
+
+
+def score_trending(apps, schema_editor):
+    """Рейтинг по уже существующим избранному и покупкам.
+
+    Повторяет recipes.trending.rebuild на исторических моделях.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TrendingEpoch = apps.get_model('recipes', 'TrendingEpoch')
+    landmark = TrendingEpoch.objects.get(pk=1).landmark
+    rate = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    scores = defaultdict(float)
+    for model_name, kind in (('Favorite', 'favorite'),
+                             ('ShoppingCart', 'cart')):
+        weight = settings.TRENDING_WEIGHTS[kind]
+        for recipe_id, created_at in (
+                apps.get_model('recipes', model_name).objects.order_by()
+                .values_list('recipe_id', 'created_at')
+                .iterator(chunk_size=10000)):
+            scores[recipe_id] += weight * math.exp(
+                rate * (created_at.timestamp() - landmark))
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, trending_score=score)
+         for recipe_id, score in scores.items()],
+        ['trending_score'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_similar_refresh_marked_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backdate_carts, migrations.RunPython.noop),
+        migrations.RunPython(score_trending, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 from django.core.validators import (RegexValidator, MinValueValidator,
                                     MaxValueValidator)
+from django.utils import timezone
 
 from api.constants import MAX_LENGTH, MAX_MEASUREMENT_UNIT
 from users.models import User
@@ -11,6 +13,8 @@ COOKING_TIME_MIN = 1
 COOKING_TIME_MAX = 32000
 AMOUNT_MIN = 1
 AMOUNT_MAX = 32000
+# Битов в Recipe.tags_mask (знаковый bigint, старший бит не используем).
+TAG_BITS = 63
 
 
 class Ingredient(models.Model):
@@ -41,6 +45,14 @@ class Tag(models.Model):
         blank=True,
         verbose_name='Слаг'
     )
+    # Номер бита тега в Recipe.tags_mask; None, если биты кончились.
+    bit = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='Бит в маске тегов'
+    )
 
     class Meta:
         ordering = ['name']
@@ -48,6 +60,49 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(Tag.objects.exclude(bit=None).values_list(
+                'bit', flat=True))
+            self.bit = next(
+                (bit for bit in range(TAG_BITS) if bit not in used), None)
+        super().save(*args, **kwargs)
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self, fields=None):
+        """Всё, что нужно RecipeSerializer, без запросов на каждый рецепт.
+
+        fields - поля ответа (None - все): связи остальных не загружаются.
+        """
+        queryset = self
+        if fields is None or 'author' in fields:
+            queryset = queryset.select_related('author')
+        return queryset.prefetch_related(*[
+            lookup for field, lookup in (
+                ('tags', 'tags'),
+                ('ingredients', 'recipeingredient_set__ingredient'))
+            if fields is None or field in fields])
+
+    def with_user_flags(self, user, fields=None):
+        """Аннотирует favorited и in_shopping_cart для пользователя.
+
+        Флаги, которых нет в полях ответа fields, не считаются.
+        """
+        flags = {
+            'favorited': ('is_favorited', Favorite),
+            'in_shopping_cart': ('is_in_shopping_cart', ShoppingCart),
+        }
+        annotations = {}
+        for name, (field, model) in flags.items():
+            if fields is not None and field not in fields:
+                continue
+            annotations[name] = (
+                Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+                if user.is_authenticated else Value(False))
+        return self.annotate(**annotations) if annotations else self
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -85,8 +140,52 @@ class Recipe(models.Model):
         verbose_name='Время приготовления'
     )
 
+    created_at = models.DateTimeField(
+        'Дата публикации',
+        auto_now_add=True
+    )
+    # Число добавлений в избранное (сортировка по популярности),
+    # поддерживается сигналами recipes/signals.py.
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    # Биты тегов рецепта (Tag.bit), см. recipes/tagmask.py.
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тегов'
+    )
+    # Сумма весов добавлений в избранное и покупки с экспоненциальным
+    # затуханием, см. recipes/trending.py.
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Рейтинг популярности'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Последние рецепты автора: лента, подписки.
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_idx'),
+            # Варианты ?ordering= (api/filters.py, RECIPE_ORDERINGS); id
+            # в конце - для keyset-пагинации.
+            models.Index(fields=['-trending_score', '-id'],
+                         name='recipe_trending_idx'),
+            models.Index(fields=['-created_at', '-id'],
+                         name='recipe_created_idx'),
+            models.Index(fields=['name', 'id'],
+                         name='recipe_name_idx'),
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -138,6 +237,10 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
 
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -184,3 +287,108 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user.username} добавил в избранное {self.recipe.name}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика (fan-out-on-write, см. recipes/feed.py)."""
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ['follower', '-recipe']
+        constraints = [
+            # Его индекс (follower, recipe) обслуживает чтение ленты.
+            models.UniqueConstraint(
+                fields=['follower', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['follower', 'author'],
+                         name='feed_follower_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.follower_id}'
+
+
+class SimilarRecipe(models.Model):
+    """Предрассчитанный сосед рецепта (build_similar_recipes)."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ['recipe', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'rank'], name='unique_similar_rank'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.similar_id} похож на {self.recipe_id}'
+
+
+class SimilarRecipeRefresh(models.Model):
+    """Рецепт, соседей которого нужно пересчитать."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+    # Время последней отметки: build_similar_recipes снимает с очереди
+    # только те отметки, которые прочитал.
+    marked_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Отмечен'
+    )
+
+    class Meta:
+        verbose_name = 'Пересчёт похожих рецептов'
+        verbose_name_plural = 'Пересчёт похожих рецептов'
+
+
+class TrendingEpoch(models.Model):
+    """Точка отсчёта затухания trending_score (одна строка).
+
+    Вклад события в рейтинг - вес * exp(rate * (время - landmark));
+    renormalize_trending сдвигает landmark, пересчитывая рейтинги.
+    """
+    landmark = models.FloatField(verbose_name='Точка отсчёта (unix-время)')
+
+    class Meta:
+        verbose_name = 'Точка отсчёта рейтинга'
+        verbose_name_plural = 'Точка отсчёта рейтинга'
@@ -0,0 +1,187 @@
+"""Поиск «что можно приготовить» по инвертированному индексу ингредиентов.
+
+Индекс (ингредиент -> отсортированный массив id рецептов) живёт в памяти
+процесса. Запись рецепта применяется к индексу своего процесса и
+публикуется в журнал в общем кэше: номер версии плюс само изменение
+(рецепт и разница в ингредиентах). Остальные воркеры догоняют версию,
+применяя изменения из журнала, и перестраивают индекс целиком, только
+если журнал неполон (массовая загрузка, вытеснение из кэша). Общий кэш -
+Redis из REDIS_URL (есть в infra/docker-compose.yml); без него журнал
+виден только своему процессу, и копии остальных воркеров отстают до
+перестройки раз в PANTRY_INDEX_TTL секунд.
+Полная перестройка читает БД вне блокировки: пока она идёт, поиски
+обслуживает прежняя копия.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RecipeIngredient
+
+VERSION_KEY = 'pantry-index:version'
+# Сколько хранится изменение в журнале и сколько изменений подряд
+# выгоднее применить, чем перестроить индекс.
+CHANGE_TTL = 3600
+MAX_CATCH_UP = 1000
+
+
+def change_key(version):
+    return f'pantry-index:change:{version}'
+
+
+def remove_sorted(values, value):
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Полную перестройку выполняет один поток процесса.
+        self.rebuilding = threading.Lock()
+        self.postings = {}
+        self.recipes = {}
+        self.version = None
+        self.built_at = 0
+
+    def current_version(self):
+        cache.add(VERSION_KEY, 1, timeout=None)
+        return cache.get(VERSION_KEY, 1)
+
+    def build(self):
+        """Новые postings и recipes по всей таблице RecipeIngredient."""
+        postings, recipes = {}, {}
+        for recipe_id, ingredient_id in (
+                RecipeIngredient.objects.order_by('recipe_id')
+                .values_list('recipe_id', 'ingredient_id')
+                .iterator(chunk_size=10000)):
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        return postings, recipes
+
+    def catch_up(self, version):
+        """Применяет изменения из журнала; False, если журнал неполон."""
+        if (self.version is None or version <= self.version
+                or version - self.version > MAX_CATCH_UP):
+            return False
+        keys = [change_key(number)
+                for number in range(self.version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        for key in keys:
+            self.update(*changes[key])
+        self.version = version
+        return True
+
+    def refresh(self):
+        """Приводит индекс к текущей версии."""
+        version = self.current_version()
+        with self.lock:
+            expired = (time.monotonic() - self.built_at
+                       > settings.PANTRY_INDEX_TTL)
+            if not expired and (version == self.version
+                                or self.catch_up(version)):
+                return
+            empty = self.version is None
+        # Если индекс уже строит другой поток, хватит прежней копии;
+        # ждать приходится только самой первой сборки.
+        if not self.rebuilding.acquire(blocking=empty):
+            return
+        try:
+            with self.lock:
+                # Пока ждали первую сборку, её мог закончить другой поток.
+                if empty and self.version is not None:
+                    return
+            postings, recipes = self.build()
+            with self.lock:
+                self.postings, self.recipes = postings, recipes
+                # Изменения, сделанные во время сборки, применятся из
+                # журнала при следующем обращении (update идемпотентен).
+                self.version = version
+                self.built_at = time.monotonic()
+        finally:
+            self.rebuilding.release()
+
+    def update(self, recipe_id, added=(), removed=(), drop=False):
+        """Меняет набор ингредиентов рецепта в индексе (под self.lock)."""
+        ingredients = self.recipes.pop(recipe_id, set())
+        removed = set(ingredients if drop else removed) & ingredients
+        added = set(added) - ingredients
+        for ingredient_id in removed:
+            remove_sorted(self.postings[ingredient_id], recipe_id)
+        for ingredient_id in added:
+            insort(self.postings.setdefault(ingredient_id, array('q')),
+                   recipe_id)
+        ingredients = (ingredients - removed) | added
+        if ingredients:
+            self.recipes[recipe_id] = ingredients
+
+    def apply(self, recipe_id, added=(), removed=(), drop=False):
+        """Применяет изменение рецепта и публикует его в журнал.
+
+        drop=True удаляет рецепт из индекса целиком.
+        """
+        change = (recipe_id, sorted(added), sorted(removed), drop)
+        with self.lock:
+            was_fresh = self.version == self.current_version()
+            self.update(*change)
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                return
+            cache.set(change_key(version), change, CHANGE_TTL)
+            # Иначе своё изменение вернётся из журнала при догоне.
+            if was_fresh:
+                self.version = version
+
+    def search(self, have, exclude=(), min_coverage=0):
+        """[(recipe_id, покрытие)] по убыванию покрытия.
+
+        Покрытие - доля ингредиентов рецепта, которые есть в have.
+        """
+        self.refresh()
+        with self.lock:
+            matches = Counter()
+            for ingredient_id in set(have):
+                matches.update(self.postings.get(ingredient_id, ()))
+            excluded = set()
+            for ingredient_id in set(exclude):
+                excluded.update(self.postings.get(ingredient_id, ()))
+            result = []
+            for recipe_id, count in matches.items():
+                if recipe_id in excluded:
+                    continue
+                coverage = count / len(self.recipes[recipe_id])
+                if coverage >= min_coverage:
+                    result.append((recipe_id, coverage))
+        result.sort(key=lambda item: (-item[1], item[0]))
+        return result
+
+
+index = PantryIndex()
+
+
+def invalidate():
+    """Сбрасывает копии индекса во всех процессах (массовая загрузка)."""
+    cache.add(VERSION_KEY, 1, timeout=None)
+    cache.incr(VERSION_KEY)
+
+
+def update_recipe(recipe_id, added=(), removed=()):
+    """Обновляет индекс после фиксации транзакции с записью рецепта."""
+    added, removed = set(added), set(removed)
+    transaction.on_commit(
+        lambda: index.apply(recipe_id, added=added, removed=removed))
+
+
+def remove_recipe(recipe_id):
+    transaction.on_commit(lambda: index.apply(recipe_id, drop=True))
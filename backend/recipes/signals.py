@@ -0,0 +1,129 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from users.models import Subscription, User
+from . import catalogue, feed, pantry, similarity, tagmask, trending
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+
+# Отправляется после записи ингредиентов рецепта с точным составом
+# изменений: recipe, added, removed, changed (множества id ингредиентов).
+recipe_ingredients_changed = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def notify_followers(sender, instance, created, **kwargs):
+    feed.notify(instance, created)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry(sender, instance, **kwargs):
+    pantry.remove_recipe(instance.pk)
+
+
+@receiver(recipe_ingredients_changed)
+def update_pantry(sender, recipe, added, removed, **kwargs):
+    if added or removed:
+        pantry.update_recipe(recipe.pk, added, removed)
+
+
+@receiver(recipe_ingredients_changed)
+def refresh_similar_by_ingredients(sender, recipe, added, removed, **kwargs):
+    # Количество не входит в векторы рецептов, только состав.
+    if added or removed:
+        similarity.mark_stale(recipe.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_similar_by_tags(sender, instance, action, reverse, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        similarity.mark_stale(instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        tagmask.refresh([instance.pk])
+    elif action == 'post_clear':
+        tagmask.drop_bit(instance.bit)
+    else:
+        tagmask.refresh(pk_set)
+
+
+@receiver(post_delete, sender=Tag)
+def drop_tag_bit(sender, instance, **kwargs):
+    tagmask.drop_bit(instance.bit)
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_favorite(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Recipe):
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=Greatest(F('favorites_count') - 1, 0))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_to_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.add(instance)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_trending(sender, instance, origin=None, **kwargs):
+    # Рецепт удаляется целиком - его рейтинг уже не нужен.
+    if not isinstance(origin, Recipe):
+        trending.remove(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalogue(sender, **kwargs):
+    catalogue.invalidate()
+
+
+@receiver(post_save, sender=Subscription)
+def count_follower(sender, instance, created, **kwargs):
+    if created:
+        feed.add_follower(instance.following_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def uncount_follower(sender, instance, origin=None, **kwargs):
+    # Автор удаляется целиком - его счётчик уже не нужен.
+    if not (isinstance(origin, User) and origin.pk == instance.following_id):
+        feed.remove_follower(instance.following_id)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.follower_id, instance.following_id)
+        feed.notify_subscription(instance.follower_id,
+                                 instance.following_id, True)
+
+
+@receiver(post_delete, sender=Subscription)
+def drop_from_feed(sender, instance, **kwargs):
+    feed.drop(instance.follower_id, instance.following_id)
+    feed.notify_subscription(instance.follower_id, instance.following_id,
+                             False)
@@ -0,0 +1,25 @@
+"""Похожие рецепты: чтение предрассчитанных соседей и учёт изменений.
+
+Сам расчёт выполняет команда build_similar_recipes (NumPy/SciPy), здесь
+только то, что нужно в обработчиках запросов.
+"""
+from django.utils import timezone
+
+from .models import Recipe, SimilarRecipeRefresh
+
+
+def mark_stale(recipe_id):
+    """Ставит рецепт в очередь на пересчёт (--incremental)."""
+    SimilarRecipeRefresh.objects.bulk_create(
+        [SimilarRecipeRefresh(recipe_id=recipe_id,
+                              marked_at=timezone.now())],
+        update_conflicts=True, unique_fields=['recipe'],
+        update_fields=['marked_at'])
+
+
+def similar_recipes(recipe_id):
+    """Соседи рецепта по убыванию сходства: один индексный запрос."""
+    return (
+        Recipe.objects.filter(similar_to__recipe_id=recipe_id)
+        .order_by('similar_to__rank')
+    )
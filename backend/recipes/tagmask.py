@@ -0,0 +1,94 @@
+"""Маска тегов рецепта: Recipe.tags_mask - OR битов Tag.bit его тегов.
+
+Фильтр по нескольким тегам становится условием на столбец рецепта без
+JOIN с recipes_recipe_tags и без DISTINCT. На Postgres для каждого бита
+есть частичный индекс (sync_tag_indexes), и условия по отдельным битам,
+объединённые OR, план читает через BitmapOr этих индексов.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q
+
+from . import catalogue
+from .models import Recipe, Tag
+
+BATCH_SIZE = 1000
+
+
+def mask(tags):
+    return sum(1 << tag.bit for tag in tags if tag.bit is not None)
+
+
+def slug_bits(slugs=()):
+    """{slug: бит} по кэшу справочника тегов.
+
+    Если какого-то из slugs нет в копии, справочник перечитывается: тег
+    мог создать другой процесс. Перечитывание ограничено
+    CATALOGUE_MISS_INTERVAL (Catalogue.all).
+    """
+    bits = {tag.slug: tag.bit for tag in catalogue.tags.all().values()}
+    if set(slugs) - bits.keys():
+        bits = {tag.slug: tag.bit
+                for tag in catalogue.tags.all(reload=True).values()}
+    return bits
+
+
+def has_any(slugs):
+    """Условие «у рецепта есть хотя бы один из тегов slugs».
+
+    Возвращает выражения битов для QuerySet.alias() и Q по ним.
+    """
+    bits = slug_bits()
+    aliases, condition = {}, Q()
+    unmasked = []
+    for slug in slugs:
+        bit = bits.get(slug)
+        if bit is None:
+            unmasked.append(slug)
+            continue
+        name = f'tag_bit_{bit}'
+        aliases[name] = F('tags_mask').bitand(1 << bit)
+        condition |= Q(**{f'{name}__gt': 0})
+    if unmasked:
+        # Тегам без бита - подзапрос, всё так же без дублей строк.
+        condition |= Q(id__in=Recipe.tags.through.objects.filter(
+            tag__slug__in=unmasked).values('recipe_id'))
+    return aliases, condition
+
+
+def refresh(recipe_ids):
+    """Пересчитывает маски рецептов по таблице связей."""
+    recipe_ids = set(recipe_ids)
+    bits = defaultdict(int)
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids, tag__bit__isnull=False).values_list(
+                'recipe_id', 'tag__bit'):
+        bits[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, tags_mask=bits[recipe_id])
+         for recipe_id in recipe_ids],
+        ['tags_mask'], batch_size=BATCH_SIZE)
+
+
+def drop_bit(bit):
+    """Убирает бит удалённого тега из всех масок."""
+    if bit is not None:
+        Recipe.objects.filter(tags_mask__gt=0).update(
+            tags_mask=F('tags_mask').bitand(~(1 << bit)))
+
+
+def rebuild():
+    """Назначает биты тегам без бита и пересчитывает все маски."""
+    for tag in Tag.objects.filter(bit=None).order_by('id'):
+        tag.save(update_fields=['bit'])
+    recipe_ids = Recipe.objects.values_list('id', flat=True).order_by('id')
+    total = 0
+    batch = []
+    for recipe_id in recipe_ids.iterator(chunk_size=BATCH_SIZE):
+        batch.append(recipe_id)
+        if len(batch) == BATCH_SIZE:
+            refresh(batch)
+            total += len(batch)
+            batch = []
+    refresh(batch)
+    return total + len(batch)
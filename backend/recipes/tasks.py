@@ -0,0 +1,52 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Sum
+
+from jobs.queue import enqueue, task
+from monitoring.metrics import SHOPPING_LIST_SIZE
+from . import feed
+from .models import RecipeIngredient
+
+
+def shopping_list(user_id):
+    """Текст списка покупок: ингредиенты из корзины с суммой количеств."""
+    ingredients = (
+        RecipeIngredient.objects
+        .filter(recipe__is_in_shopping_cart__user_id=user_id)
+        .values('ingredient__name')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name')
+    )
+    text = ''.join(
+        f"{item['ingredient__name']} — {item['total_amount']}\n"
+        for item in ingredients
+    )
+    SHOPPING_LIST_SIZE.observe(len(text.encode()))
+    return text
+
+
+def exports_storage():
+    """Выгрузки лежат вне MEDIA_ROOT: их отдаёт только JobDownloadView."""
+    return FileSystemStorage(location=settings.EXPORTS_ROOT)
+
+
+@task('recipes.export_shopping_cart')
+def export_shopping_cart(user_id):
+    name = exports_storage().save(
+        f'shopping_cart/{uuid4().hex}.txt',
+        ContentFile(shopping_list(user_id).encode()))
+    enqueue('recipes.delete_export', delay=settings.EXPORTS_TTL, path=name)
+    return {'file': name, 'filename': 'shopping_cart.txt'}
+
+
+@task('recipes.delete_export')
+def delete_export(path):
+    exports_storage().delete(path)
+
+
+@task('recipes.backfill_author_feed')
+def backfill_author_feed(author_id):
+    feed.backfill_author(author_id)
@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.tests.utils import (TempMediaMixin, make_ingredient, make_recipe,
+                             make_tag, make_user)
+from recipes.management.commands.import_corpus import Command as Import
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+
+def snapshot():
+    return sorted(
+        (recipe.name, recipe.author.email, recipe.created_at,
+         recipe.tags_mask > 0,
+         tuple(sorted(recipe.tags.values_list('slug', flat=True))),
+         tuple(sorted(recipe.recipeingredient_set.values_list(
+             'ingredient__name', 'amount'))))
+        for recipe in Recipe.objects.all())
+
+
+class CorpusTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cook, baker = make_user('cook'), make_user('baker')
+        soup, sweet = make_tag('soup'), make_tag('sweet')
+        salt, sugar = make_ingredient('Соль'), make_ingredient('Сахар')
+        make_recipe(cook, 'Суп', tags=[soup], ingredients=[(salt, 5)])
+        make_recipe(baker, 'Торт', tags=[sweet],
+                    ingredients=[(sugar, 200), (salt, 1)])
+        make_recipe(baker, 'Хлеб', ingredients=[(salt, 10)])
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'corpus.ndjson.gz')
+
+    def export(self):
+        call_command('export_corpus', self.path, stderr=StringIO())
+
+    def load(self, *args):
+        call_command('import_corpus', self.path, *args, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def wipe(self):
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_round_trip(self):
+        before = snapshot()
+        self.export()
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            models = [json.loads(line)['model'] for line in file]
+        self.assertEqual(models[0], 'users.user')
+        self.assertEqual(models[-1], 'recipes.recipeingredient')
+        self.wipe()
+        self.load()
+        self.assertEqual(snapshot(), before)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_remap_into_existing_catalogue(self):
+        before = snapshot()
+        self.export()
+        Recipe.objects.all().delete()
+        self.load('--remap')
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_resume_after_failure(self):
+        before = snapshot()
+        self.export()
+        self.wipe()
+        insert = Import.insert
+        calls = []
+
+        def failing(command, label, objects):
+            calls.append(label)
+            if label == 'recipes.recipe_tags':
+                raise RuntimeError('обрыв')
+            insert(command, label, objects)
+
+        with mock.patch.object(Import, 'insert', failing):
+            with self.assertRaises(RuntimeError):
+                self.load('--batch-size=1')
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertFalse(RecipeIngredient.objects.exists())
+        self.load('--batch-size=1')
+        self.assertEqual(snapshot(), before)
+
+    def test_bad_line(self):
+        with gzip.open(self.path, 'wt', encoding='utf-8') as file:
+            file.write('{"model": "auth.group", "id": 1, "fields": {}}\n')
+        with self.assertRaises(CommandError):
+            self.load()
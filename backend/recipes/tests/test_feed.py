@@ -0,0 +1,87 @@
+from django.test import TestCase, override_settings
+
+from api.tests.utils import make_recipe, make_user
+from recipes import feed
+from recipes.models import FeedEntry
+from users.models import Subscription, User
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=2, FEED_MAX_ENTRIES=3)
+class FeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.readers = [make_user(f'reader{number}') for number in range(3)]
+
+    def follow(self, reader, author=None):
+        Subscription.objects.create(follower=reader,
+                                    following=author or self.author)
+
+    def entries(self, reader):
+        return set(FeedEntry.objects.filter(follower=reader)
+                   .values_list('recipe_id', flat=True))
+
+    def test_fan_out_to_followers(self):
+        self.follow(self.readers[0])
+        self.follow(self.readers[1])
+        recipe = make_recipe(self.author)
+        self.assertEqual(self.entries(self.readers[0]), {recipe.pk})
+        self.assertEqual(self.entries(self.readers[1]), {recipe.pk})
+        self.assertEqual(self.entries(self.readers[2]), set())
+
+    def test_celebrity_recipes_merged_on_read(self):
+        for reader in self.readers:
+            self.follow(reader)
+        self.assertEqual(feed.celebrity_ids(self.readers[0].pk),
+                         [self.author.pk])
+        recipe = make_recipe(self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(feed.read(self.readers[0].pk), [recipe.pk])
+
+    def test_threshold_follows_followers_count(self):
+        # Счётчик, а не число строк подписок, решает, кто популярен.
+        self.follow(self.readers[0])
+        User.objects.filter(pk=self.author.pk).update(followers_count=5)
+        recipe = make_recipe(self.author)
+        self.assertEqual(self.entries(self.readers[0]), set())
+        self.assertEqual(feed.read(self.readers[0].pk), [recipe.pk])
+
+    def test_backfill_on_subscribe(self):
+        recipes = [make_recipe(self.author, f'Рецепт {number}')
+                   for number in range(4)]
+        self.follow(self.readers[0])
+        self.assertEqual(self.entries(self.readers[0]),
+                         {recipe.pk for recipe in recipes[1:]})
+
+    def test_unsubscribe_drops_entries(self):
+        self.follow(self.readers[0])
+        make_recipe(self.author)
+        Subscription.objects.filter(follower=self.readers[0]).delete()
+        self.assertEqual(self.entries(self.readers[0]), set())
+
+    def test_author_below_threshold_backfilled(self):
+        for reader in self.readers:
+            self.follow(reader)
+        recipe = make_recipe(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(follower=self.readers[2]).delete()
+        feed.backfill_author(self.author.pk)
+        self.assertEqual(self.entries(self.readers[0]), {recipe.pk})
+        self.assertEqual(feed.celebrity_ids(self.readers[0].pk), [])
+
+    def test_read_merges_entries_and_celebrities(self):
+        star = make_user('star')
+        User.objects.filter(pk=star.pk).update(followers_count=10)
+        reader = self.readers[0]
+        self.follow(reader)
+        self.follow(reader, star)
+        own = [make_recipe(self.author, f'Свой {number}').pk
+               for number in range(2)]
+        starred = [make_recipe(star, f'Звезда {number}').pk
+                   for number in range(2)]
+        expected = sorted(own + starred, reverse=True)
+        self.assertEqual(feed.read(reader.pk, limit=10), expected)
+        self.assertEqual(feed.read(reader.pk, limit=2), expected[:2])
+        self.assertEqual(feed.read(reader.pk, before=expected[1]),
+                         expected[2:])
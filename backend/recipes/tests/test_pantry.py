@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.tests.utils import make_ingredient, make_recipe, make_user
+from recipes.pantry import PantryIndex
+
+
+class PantryTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('cook')
+        cls.egg = make_ingredient('Яйцо')
+        cls.milk = make_ingredient('Молоко')
+        cls.flour = make_ingredient('Мука')
+        cls.nuts = make_ingredient('Орехи')
+        cls.omelette = make_recipe(
+            cls.author, 'Омлет', cooking_time=10,
+            ingredients=[(cls.egg, 2), (cls.milk, 100)])
+        cls.pancakes = make_recipe(
+            cls.author, 'Блины', cooking_time=40,
+            ingredients=[(cls.egg, 1), (cls.milk, 300), (cls.flour, 200)])
+        cls.cake = make_recipe(
+            cls.author, 'Торт', cooking_time=5,
+            ingredients=[(cls.egg, 3), (cls.flour, 300), (cls.nuts, 50)])
+
+    def setUp(self):
+        cache.clear()
+
+
+class PantryIndexTests(PantryTestMixin, TestCase):
+
+    def test_search_orders_by_coverage(self):
+        index = PantryIndex()
+        result = index.search([self.egg.pk, self.milk.pk])
+        self.assertEqual([recipe_id for recipe_id, _ in result],
+                         [self.omelette.pk, self.pancakes.pk, self.cake.pk])
+        self.assertEqual(result[0][1], 1)
+        self.assertAlmostEqual(result[1][1], 2 / 3)
+
+    def test_exclude_and_min_coverage(self):
+        index = PantryIndex()
+        result = index.search([self.egg.pk, self.milk.pk],
+                              exclude=[self.nuts.pk], min_coverage=0.5)
+        self.assertEqual([recipe_id for recipe_id, _ in result],
+                         [self.omelette.pk, self.pancakes.pk])
+
+    def test_other_process_replays_journal(self):
+        writer, reader = PantryIndex(), PantryIndex()
+        writer.search([self.egg.pk])
+        reader.search([self.egg.pk])
+        with mock.patch.object(reader, 'build') as build:
+            writer.apply(self.omelette.pk, added=[self.nuts.pk],
+                         removed=[self.milk.pk])
+            result = dict(reader.search([self.nuts.pk]))
+            writer.apply(self.cake.pk, drop=True)
+            self.assertNotIn(self.cake.pk, dict(reader.search([self.egg.pk])))
+        build.assert_not_called()
+        self.assertEqual(result[self.omelette.pk], 0.5)
+        self.assertEqual(reader.version, writer.version)
+
+    def test_lost_journal_rebuilds(self):
+        writer, reader = PantryIndex(), PantryIndex()
+        writer.search([self.egg.pk])
+        reader.search([self.egg.pk])
+        writer.apply(self.omelette.pk, added=[self.nuts.pk])
+        cache.delete(f'pantry-index:change:{writer.version}')
+        with mock.patch.object(reader, 'build',
+                               wraps=reader.build) as build:
+            reader.search([self.egg.pk])
+        build.assert_called_once()
+
+
+class HaveIngredientsFilterTests(PantryTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api.filters.pantry_index', PantryIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def names(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_ordered_by_coverage(self):
+        self.assertEqual(
+            self.names(f'have_ingredients={self.egg.pk},{self.milk.pk}'),
+            ['Омлет', 'Блины', 'Торт'])
+
+    @override_settings(PANTRY_MAX_RESULTS=1)
+    def test_limit_applies_after_other_filters(self):
+        self.assertEqual(
+            self.names(f'have_ingredients={self.egg.pk},{self.milk.pk}'
+                       '&cooking_time_min=20'),
+            ['Блины'])
+
+    def test_explicit_ordering_wins(self):
+        self.assertEqual(
+            self.names(f'have_ingredients={self.egg.pk},{self.milk.pk}'
+                       '&ordering=cooking_time'),
+            ['Торт', 'Омлет', 'Блины'])
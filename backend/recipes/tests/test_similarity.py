@@ -0,0 +1,86 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.utils import make_ingredient, make_recipe, make_tag, make_user
+from recipes.models import (RecipeIngredient, SimilarRecipe,
+                            SimilarRecipeRefresh)
+from recipes.similarity import mark_stale, similar_recipes
+
+
+class BuildSimilarRecipesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        author = make_user('cook')
+        cls.ingredients = [make_ingredient(f'Ингредиент {number}')
+                           for number in range(12)]
+        tags = [make_tag(f'tag{number}') for number in range(3)]
+        cls.recipes = [
+            make_recipe(
+                author, f'Рецепт {number}',
+                tags=rng.sample(tags, rng.randint(0, 2)),
+                ingredients=[(ingredient, 1) for ingredient in
+                             rng.sample(cls.ingredients, rng.randint(1, 4))])
+            for number in range(40)]
+
+    def build(self, *args):
+        call_command('build_similar_recipes', '--top-k=3', '--block-size=7',
+                     *args, stdout=StringIO())
+
+    def snapshot(self):
+        lists = {}
+        for recipe_id, similar_id, score in SimilarRecipe.objects.order_by(
+                'recipe_id', 'rank').values_list('recipe_id', 'similar_id',
+                                                 'score'):
+            lists.setdefault(recipe_id, []).append(
+                (similar_id, round(score, 5)))
+        return lists
+
+    def test_identical_recipes_are_neighbours(self):
+        first, second = self.recipes[:2]
+        for recipe in (first, second):
+            RecipeIngredient.objects.filter(recipe=recipe).delete()
+            recipe.tags.clear()
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredients[0], amount=1)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredients[1], amount=1)
+        self.build()
+        neighbours = list(similar_recipes(first.pk))
+        self.assertEqual(neighbours[0], second)
+        self.assertAlmostEqual(
+            SimilarRecipe.objects.get(recipe=first, rank=1).score, 1.0,
+            places=5)
+        self.assertNotIn(first, neighbours)
+
+    def test_jaccard(self):
+        self.build('--metric=jaccard')
+        for score in SimilarRecipe.objects.values_list('score', flat=True):
+            self.assertTrue(0 < score <= 1)
+
+    def test_incremental_matches_full_build(self):
+        for metric in ('cosine', 'jaccard'):
+            with self.subTest(metric=metric):
+                self.build(f'--metric={metric}')
+                changed = self.recipes[3:6]
+                for step, recipe in enumerate(changed):
+                    RecipeIngredient.objects.filter(recipe=recipe).delete()
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, amount=1,
+                        ingredient=self.ingredients[step])
+                    mark_stale(recipe.pk)
+                self.build(f'--metric={metric}', '--incremental')
+                incremental = self.snapshot()
+                self.assertFalse(SimilarRecipeRefresh.objects.exists())
+                self.build(f'--metric={metric}')
+                self.assertEqual(incremental, self.snapshot())
+
+    def test_processes_match_single_process(self):
+        self.build()
+        single = self.snapshot()
+        self.build('--processes=2')
+        self.assertEqual(single, self.snapshot())
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.tests.utils import make_recipe, make_tag, make_user
+from recipes import catalogue, tagmask
+from recipes.models import Recipe, Tag
+
+
+class TagMaskTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = make_user('cook')
+        cls.soup, cls.salad, cls.dessert = (
+            make_tag(slug) for slug in ('soup', 'salad', 'dessert'))
+        cls.recipes = {
+            'soup': make_recipe(author, 'Суп', tags=[cls.soup]),
+            'both': make_recipe(author, 'Обед',
+                                tags=[cls.soup, cls.salad]),
+            'dessert': make_recipe(author, 'Торт', tags=[cls.dessert]),
+            'none': make_recipe(author, 'Хлеб'),
+        }
+        tagmask.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        catalogue.tags.warm()
+        catalogue.tags.reloaded_at = 0
+
+    def matching(self, *slugs):
+        aliases, condition = tagmask.has_any(slugs)
+        return set(Recipe.objects.alias(**aliases).filter(condition)
+                   .values_list('name', flat=True))
+
+    def test_mask_matches_tags(self):
+        recipe = Recipe.objects.get(pk=self.recipes['both'].pk)
+        self.assertEqual(recipe.tags_mask,
+                         (1 << self.soup.bit) | (1 << self.salad.bit))
+
+    def test_has_any(self):
+        self.assertEqual(self.matching('soup'), {'Суп', 'Обед'})
+        self.assertEqual(self.matching('salad', 'dessert'), {'Обед', 'Торт'})
+        self.assertEqual(self.matching('bogus'), set())
+
+    def test_tag_without_bit(self):
+        Tag.objects.filter(pk=self.dessert.pk).update(bit=None)
+        catalogue.invalidate()
+        self.assertEqual(self.matching('dessert', 'salad'), {'Обед', 'Торт'})
+
+    def test_drop_bit(self):
+        tagmask.drop_bit(self.soup.bit)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipes['both'].pk).tags_mask,
+            1 << self.salad.bit)
+
+    @override_settings(CATALOGUE_MISS_INTERVAL=60)
+    def test_unknown_slug_reload_is_rate_limited(self):
+        with self.assertNumQueries(1):
+            self.assertNotIn('bogus', tagmask.slug_bits(['bogus']))
+        with self.assertNumQueries(0):
+            for slug in ('bogus', 'other', 'third'):
+                tagmask.slug_bits([slug])
+
+    @override_settings(CATALOGUE_MISS_INTERVAL=0)
+    def test_tag_from_other_process_found(self):
+        # bulk_create не шлёт сигналов: версия справочника не меняется.
+        Tag.objects.bulk_create([Tag(name='Новый', slug='new', bit=20)])
+        self.assertEqual(tagmask.slug_bits(['new'])['new'], 20)
+
+    def test_filter_by_tags(self):
+        response = self.client.get('/api/recipes/?tags=soup&tags=dessert')
+        self.assertEqual(
+            {recipe['name'] for recipe in response.json()['results']},
+            {'Суп', 'Обед', 'Торт'})
+        self.assertEqual(
+            self.client.get('/api/recipes/?tags=bogus').status_code, 400)
@@ -0,0 +1,88 @@
+import math
+import time
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.tests.utils import make_recipe, make_user
+from recipes import trending
+from recipes.models import Favorite, Recipe, ShoppingCart, TrendingEpoch
+
+HOUR = 3600
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1,
+                   TRENDING_WEIGHTS={'favorite': 1.0, 'cart': 0.5})
+class TrendingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('cook')
+        cls.recipe = make_recipe(cls.user)
+        # Час назад: перенормировка сдвинет точку отсчёта на час.
+        cls.landmark = time.time() - HOUR
+        TrendingEpoch.objects.update_or_create(
+            pk=1, defaults={'landmark': cls.landmark})
+
+    def moment(self, hours):
+        return datetime.fromtimestamp(self.landmark + hours * HOUR,
+                                      tz=timezone.utc)
+
+    def score(self):
+        return Recipe.objects.get(pk=self.recipe.pk).trending_score
+
+    def event(self, model, hours):
+        return model(user=self.user, recipe=self.recipe,
+                     created_at=self.moment(hours))
+
+    def test_weight_doubles_every_half_life(self):
+        trending.add(self.event(Favorite, 0))
+        self.assertAlmostEqual(self.score(), 1.0)
+        trending.add(self.event(Favorite, 1))
+        self.assertAlmostEqual(self.score(), 3.0)
+        trending.add(self.event(ShoppingCart, 2))
+        self.assertAlmostEqual(self.score(), 5.0)
+
+    def test_remove_subtracts_contribution(self):
+        trending.add(self.event(Favorite, 1))
+        trending.add(self.event(ShoppingCart, 3))
+        trending.remove(self.event(Favorite, 1))
+        self.assertAlmostEqual(self.score(), 4.0)
+        trending.remove(self.event(ShoppingCart, 3))
+        trending.remove(self.event(ShoppingCart, 3))
+        self.assertEqual(self.score(), 0)
+
+    def test_ancient_event(self):
+        trending.add(self.event(Favorite, -10 ** 6))
+        trending.remove(self.event(Favorite, -10 ** 6))
+        self.assertEqual(self.score(), 0)
+
+    def test_newer_event_outranks_older(self):
+        other = make_recipe(self.user, 'Другой')
+        trending.add(self.event(Favorite, 0))
+        trending.add(Favorite(user=self.user, recipe=other,
+                              created_at=self.moment(1.5)))
+        ranking = list(Recipe.objects.order_by('-trending_score')
+                       .values_list('pk', flat=True))
+        self.assertEqual(ranking, [other.pk, self.recipe.pk])
+
+    def test_renormalize_moves_landmark(self):
+        trending.add(self.event(Favorite, 2))
+        before = time.time()
+        call_command('renormalize_trending', stdout=StringIO())
+        landmark = TrendingEpoch.objects.get(pk=1).landmark
+        self.assertGreaterEqual(landmark, before)
+        expected = math.exp(trending.rate() * (
+            self.landmark + 2 * HOUR - landmark))
+        self.assertAlmostEqual(self.score() / expected, 1.0)
+
+    def test_rebuild_matches_incremental(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        other = make_user('guest')
+        ShoppingCart.objects.create(user=other, recipe=self.recipe)
+        for model, hours in ((Favorite, 1), (ShoppingCart, 2)):
+            model.objects.update(created_at=self.moment(hours))
+        self.assertEqual(trending.rebuild(self.landmark), 1)
+        self.assertAlmostEqual(self.score(), 2.0 + 2.0)
@@ -0,0 +1,76 @@
+"""Рейтинг «в тренде» с прямым (forward) экспоненциальным затуханием.
+
+Добавление в избранное или покупки прибавляет к Recipe.trending_score
+вес * exp(rate * (t - landmark)), где landmark - точка отсчёта из
+TrendingEpoch. Более новые события весят экспоненциально больше, и
+порядок рецептов по trending_score совпадает с порядком по сумме
+затухающих весов на текущий момент - без пересчёта на каждое чтение.
+Чтобы слагаемые не переполнили float, renormalize_trending периодически
+сдвигает landmark и умножает все рейтинги на exp(-rate * сдвиг).
+
+Вклад считается в SQL одним UPDATE по подзапросу к landmark, поэтому
+события не блокируют друг друга; событие, попавшее точно на момент
+перенормировки, может быть учтено с неточным весом.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Exp, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart, TrendingEpoch
+
+BATCH_SIZE = 1000
+# exp() PostgreSQL падает с underflow ниже ~-745: вклад очень старого
+# события (порядка 1e-304) от этого не меняется.
+MIN_EXPONENT = -700.0
+
+
+def rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def weight(model):
+    return settings.TRENDING_WEIGHTS[
+        'favorite' if model is Favorite else 'cart']
+
+
+def contribution(model, moment):
+    landmark = TrendingEpoch.objects.filter(pk=1).values('landmark')
+    return Value(weight(model)) * Exp(Greatest(
+        Value(rate()) * (Value(moment.timestamp()) - Subquery(landmark)),
+        Value(MIN_EXPONENT)))
+
+
+def add(event):
+    """Учитывает новое добавление в избранное или покупки."""
+    Recipe.objects.filter(pk=event.recipe_id).update(
+        trending_score=F('trending_score')
+        + contribution(type(event), event.created_at))
+
+
+def remove(event):
+    """Вычитает вклад удалённого события."""
+    Recipe.objects.filter(pk=event.recipe_id).update(
+        trending_score=Greatest(
+            F('trending_score') - contribution(type(event), event.created_at),
+            Value(0.0)))
+
+
+def rebuild(landmark):
+    """Пересчитывает все рейтинги с нуля относительно landmark."""
+    scores = defaultdict(float)
+    for model in (Favorite, ShoppingCart):
+        for recipe_id, created_at in (
+                model.objects.order_by().values_list('recipe_id', 'created_at')
+                .iterator(chunk_size=10000)):
+            scores[recipe_id] += weight(model) * math.exp(
+                rate() * (created_at.timestamp() - landmark))
+    Recipe.objects.exclude(pk__in=scores).exclude(
+        trending_score=0).update(trending_score=0)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, trending_score=score)
+         for recipe_id, score in scores.items()],
+        ['trending_score'], batch_size=BATCH_SIZE)
+    return len(scores)
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Поиск пользователей (api.filters.UserSearchFilter) сравнивает
+# UPPER(поле::text) с шаблоном LIKE: по началу строки работает btree
+# с text_pattern_ops, по подстроке - GIN с триграммами (pg_trgm).
+FIELDS = ('username', 'first_name', 'last_name')
+INDEXES = [
+    (f'user_{field}_prefix_idx',
+     f'users_user (UPPER({field}::text) text_pattern_ops)')
+    for field in FIELDS
+] + [
+    (f'user_{field}_trgm_idx',
+     f'users_user USING gin (UPPER({field}::text) gin_trgm_ops)')
+    for field in FIELDS
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_followers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    followers = (Subscription.objects.filter(following=OuterRef('pk'))
+                 .order_by().values('following')
+                 .annotate(total=Count('id')).values('total'))
+    User.objects.filter(following__isnull=False).update(
+        followers_count=Subquery(followers))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчики'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -22,6 +22,13 @@ class User(AbstractUser):
     is_subscribed = models.BooleanField(default=False)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Число подписчиков (лента подписок, recipes/feed.py),
+    # поддерживается сигналами recipes/signals.py.
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчики'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']